@@ -0,0 +1,138 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from exceptions import HTTPStatusException, MessageNotSent
+
+SUPPRESSION_WINDOW = 3600
+CLEAR_AFTER = 1200
+MAX_ENTRIES = 1024
+
+_VOLATILE = re.compile(r'0x[0-9a-fA-F]+|\d+')
+
+
+def normalize(message):
+    """Убирает из текста ошибки числа: таймстемпы, порты, id."""
+    return _VOLATILE.sub('N', message)
+
+
+def error_key(error):
+    return type(error).__name__, normalize(str(error))
+
+
+class AlertEntry:
+    __slots__ = ('first_seen', 'last_seen', 'last_sent', 'suppressed', 'total',
+                 'sources')
+
+    def __init__(self, now):
+        self.first_seen = now
+        self.last_seen = now
+        self.last_sent = now
+        self.suppressed = 0
+        self.total = 1
+        self.sources = set()
+
+
+class ErrorAlerts:
+    """Оповещения об ошибках без спама.
+
+    Одинаковые ошибки (класс и текст без чисел) сворачиваются: первая
+    отправляется сразу, остальные копятся и раз в `window` уходят
+    одной сводкой. Если ошибка не повторялась `clear_after` секунд,
+    `sweep` отправляет одно сообщение о восстановлении. Ошибка с
+    источником (студентом) закрывается, только когда все её источники
+    с тех пор опрошены успешно (`success`): студента с ошибкой
+    планировщик опрашивает всё реже, и тишина сама по себе ещё не
+    значит, что ошибка ушла. Записей не больше `max_size`, самые
+    давние вытесняются.
+    """
+
+    def __init__(self, send, window=SUPPRESSION_WINDOW,
+                 clear_after=CLEAR_AFTER, max_size=MAX_ENTRIES,
+                 clock=time.monotonic):
+        self.send = send
+        self.window = window
+        self.clear_after = clear_after
+        self.max_size = max_size
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._failing = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _notify(self, message):
+        try:
+            self.send(message)
+        except Exception as error:
+            logging.error(f'Failed to send alert: {error}')
+
+    def _message(self, error):
+        if isinstance(error, HTTPStatusException):
+            return f'Practicum API error: {error}'
+        return f'Program crash: {error}'
+
+    def record(self, error, source=None):
+        """Учитывает ошибку и, если пора, отправляет оповещение."""
+        if isinstance(error, MessageNotSent):
+            # Сообщить об этом через тг всё равно не выйдет
+            return
+        key = error_key(error)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if source is not None:
+                self._failing.setdefault(source, set()).add(key)
+            if entry is None:
+                entry = self._entries[key] = AlertEntry(now)
+                if source is not None:
+                    entry.sources.add(source)
+                if len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                message = self._message(error)
+            else:
+                if source is not None:
+                    entry.sources.add(source)
+                self._entries.move_to_end(key)
+                entry.last_seen = now
+                entry.total += 1
+                entry.suppressed += 1
+                if now - entry.last_sent < self.window:
+                    return
+                message = (
+                    f'Still failing, {entry.suppressed} occurrences: '
+                    f'{self._message(error)}'
+                )
+                entry.last_sent = now
+                entry.suppressed = 0
+        self._notify(message)
+
+    def success(self, source):
+        """Источник опрошен без ошибок: его ошибки могут закрыться."""
+        if source not in self._failing:
+            return
+        with self._lock:
+            for key in self._failing.pop(source, ()):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.sources.discard(source)
+
+    def sweep(self):
+        """Закрывает ошибки, которые давно не повторялись."""
+        now = self.clock()
+        with self._lock:
+            cleared = [
+                (key, entry) for key, entry in self._entries.items()
+                if now - entry.last_seen >= self.clear_after
+                and not entry.sources
+            ]
+            for key, _ in cleared:
+                del self._entries[key]
+        for (name, message), entry in cleared:
+            self._notify(
+                f'Recovered: {name}: {message} '
+                f'({entry.total} occurrences)'
+            )
@@ -0,0 +1,361 @@
+"""Сколько работы ждут ревью: отчёт по истории переходов статусов.
+
+    python analytics.py --db history.db
+    python analytics.py --db history.db --by homework --since-days 90
+    python analytics.py --db history.db --by week --json
+    python analytics.py --db history.shard*.db
+
+Переходы из `HistoryStore` загружаются колонками, из них получаются
+интервалы "статус -> следующий статус" одной работы. По интервалам
+`reviewing -> approved/rejected` считаются перцентили времени ревью и
+доля возвратов на доработку в разрезе когорт: недели (или другого
+периода) начала ревью, работы или студента. Расчёты векторные на
+numpy (он в requirements.txt); без него отчёт считается тем же
+алгоритмом на списках, но заметно медленнее.
+"""
+import argparse
+import copy
+import gc
+import json
+import sqlite3
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+REVIEWING, APPROVED, REJECTED, OTHER = range(4)
+STATES = ('reviewing', 'approved', 'rejected', 'other')
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+DAY = 86400
+PERIODS = {'day': 1, 'week': 7, 'month': 30}
+GROUPS = ('all', 'homework', 'tenant') + tuple(PERIODS)
+
+# Полный проход по таблице без ORDER BY: последовательное чтение
+# быстрее обхода индекса с выборкой строк вразнобой, а сортирует потом
+# numpy. Статус сразу приходит кодом, а время перехода - date_updated
+# из апи, если оно есть: seen_at точен только до интервала опроса.
+QUERY = """
+    SELECT tenant || char(31) || homework_id,
+           COALESCE(homework_name, CAST(homework_id AS TEXT)),
+           CASE status {cases} ELSE {other} END,
+           seen_at,
+           COALESCE(CAST(strftime('%s', date_updated) AS REAL), seen_at)
+    FROM transitions
+""".format(
+    cases=' '.join(
+        f"WHEN '{state}' THEN {code}"
+        for code, state in enumerate(STATES[:OTHER])
+    ),
+    other=OTHER,
+)
+
+
+class Columns:
+    """Набор колонок одной длины: массивы numpy или списки."""
+
+    def __init__(self, **columns):
+        self.__dict__.update(columns)
+        self.names = tuple(columns)
+
+    def __len__(self):
+        return len(getattr(self, self.names[0]))
+
+    def take(self, rows):
+        """Строки по номерам `rows` (с numpy - и по булевой маске)."""
+        taken = copy.copy(self)
+        for name in self.names:
+            column = getattr(self, name)
+            if np is None:
+                column = [column[i] for i in rows]
+            else:
+                column = column[rows]
+            setattr(taken, name, column)
+        return taken
+
+
+class Transitions(Columns):
+    """Переходы колонками `work, tenant, name, status, seen_at, at`.
+
+    Строковые поля закодированы номерами: `tenants[tenant]` и
+    `homeworks[name]` дают исходные значения. Строки отсортированы по
+    работам, внутри работы - по времени.
+    """
+
+    def __init__(self, tenants, homeworks, **columns):
+        super().__init__(**columns)
+        self.tenants = tenants
+        self.homeworks = homeworks
+
+
+def _factorize(values):
+    # Словарь быстрее np.unique: тот сортирует строки
+    uniques = list(dict.fromkeys(values))
+    codes = {value: code for code, value in enumerate(uniques)}
+    return list(map(codes.__getitem__, values)), uniques
+
+
+def _array(values, dtype):
+    return list(values) if np is None else np.array(values, dtype=dtype)
+
+
+def load(path, since=None, until=None):
+    """Переходы из базы истории за `[since, until)` по seen_at.
+
+    `path` - файл базы или список файлов, например всех шардов: строки
+    одной работы из разных файлов сливаются.
+    """
+    paths = [path] if isinstance(path, str) else list(path)
+    query, bounds = QUERY, []
+    if since is not None or until is not None:
+        query += ' WHERE seen_at >= ? AND seen_at < ?'
+        bounds = [
+            float('-inf') if since is None else since,
+            float('inf') if until is None else until,
+        ]
+    # Миллионы кортежей подряд: циклический сборщик тут только мешает
+    gc.disable()
+    try:
+        rows = []
+        for name in paths:
+            connection = sqlite3.connect(f'file:{name}?mode=ro', uri=True)
+            try:
+                rows.extend(connection.execute(query, bounds).fetchall())
+            finally:
+                connection.close()
+        works, names, status, seen_at, at = list(zip(*rows)) or [()] * 5
+        del rows
+        work, labels = _factorize(works)
+        owners, tenants = _factorize(
+            [label.split('\x1f', 1)[0] for label in labels]
+        )
+        name, homeworks = _factorize(names)
+    finally:
+        gc.enable()
+    owners = _array(owners, 'int64')
+    work = _array(work, 'int64')
+    if np is not None:
+        tenant = owners[work]
+        order = np.lexsort((np.array(seen_at), work))
+    else:
+        tenant = [owners[code] for code in work]
+        order = sorted(range(len(work)),
+                       key=lambda i: (work[i], seen_at[i]))
+    return Transitions(
+        tenants, homeworks,
+        work=work,
+        tenant=tenant,
+        name=_array(name, 'int64'),
+        status=_array(status, 'int8'),
+        seen_at=_array(seen_at, 'float64'),
+        at=_array(at, 'float64'),
+    ).take(order)
+
+
+def intervals(transitions):
+    """Сколько работа пробыла в каждом статусе до следующего.
+
+    Колонки: `tenant, name, state, next, start, duration`. Последний
+    статус работы интервала не даёт: он ещё не закончился.
+    """
+    t = transitions
+    if np is not None:
+        same = t.work[1:] == t.work[:-1]
+        return Columns(
+            tenant=t.tenant[:-1][same],
+            name=t.name[:-1][same],
+            state=t.status[:-1][same],
+            next=t.status[1:][same],
+            start=t.at[:-1][same],
+            duration=(t.at[1:] - t.at[:-1])[same],
+        )
+    pairs = [i for i in range(len(t) - 1) if t.work[i] == t.work[i + 1]]
+    return Columns(
+        tenant=[t.tenant[i] for i in pairs],
+        name=[t.name[i] for i in pairs],
+        state=[t.status[i] for i in pairs],
+        next=[t.status[i + 1] for i in pairs],
+        start=[t.at[i] for i in pairs],
+        duration=[t.at[i + 1] - t.at[i] for i in pairs],
+    )
+
+
+def reviews(spans):
+    """Интервалы ревью: из `reviewing` в принятую или возвращённую."""
+    if np is not None:
+        return spans.take((spans.state == REVIEWING) & (
+            (spans.next == APPROVED) | (spans.next == REJECTED)
+        ))
+    return spans.take([
+        i for i, (state, after) in enumerate(zip(spans.state, spans.next))
+        if state == REVIEWING and after in (APPROVED, REJECTED)
+    ])
+
+
+def cohorts(spans, by):
+    """Ключ когорты для каждого интервала."""
+    if by == 'all':
+        return [0] * len(spans) if np is None else np.zeros(len(spans))
+    if by == 'homework':
+        return spans.name
+    if by == 'tenant':
+        return spans.tenant
+    period = PERIODS[by] * DAY
+    if np is None:
+        return [start // period * period for start in spans.start]
+    return np.floor_divide(spans.start, period) * period
+
+
+def summarize(keys, durations, flags=None, quantiles=QUANTILES):
+    """Статистика длительностей по группам `keys`.
+
+    Для каждой группы: число интервалов, среднее, перцентили (ближайший
+    ранг снизу) и доля истинных `flags`, если они переданы. Группы
+    идут по возрастанию ключа.
+    """
+    if not len(keys):
+        return []
+    if np is None:
+        return _summarize_python(keys, durations, flags, quantiles)
+    labels, groups = np.unique(keys, return_inverse=True)
+    groups = groups.reshape(-1)
+    # Одна сортировка на все группы: по группе, внутри - по длительности
+    order = np.lexsort((durations, groups))
+    ordered = durations[order]
+    counts = np.bincount(groups, minlength=len(labels))
+    starts = np.cumsum(counts) - counts
+    means = np.bincount(groups, weights=durations) / counts
+    percentiles = [
+        ordered[starts + ((counts - 1) * q).astype(np.int64)]
+        for q in quantiles
+    ]
+    rates = None
+    if flags is not None:
+        rates = np.bincount(groups, weights=flags) / counts
+    return [
+        _row(labels[i].item(), int(counts[i]), float(means[i]),
+             [float(column[i]) for column in percentiles], quantiles,
+             None if rates is None else float(rates[i]))
+        for i in range(len(labels))
+    ]
+
+
+def _summarize_python(keys, durations, flags, quantiles):
+    grouped = {}
+    for i, key in enumerate(keys):
+        grouped.setdefault(key, []).append(i)
+    rows = []
+    for key in sorted(grouped):
+        members = grouped[key]
+        ordered = sorted(durations[i] for i in members)
+        count = len(ordered)
+        rows.append(_row(
+            key, count, sum(ordered) / count,
+            [ordered[int((count - 1) * q)] for q in quantiles], quantiles,
+            None if flags is None else sum(flags[i] for i in members) / count
+        ))
+    return rows
+
+
+def _row(key, count, mean, percentiles, quantiles, rate):
+    row = {'key': key, 'count': count, 'mean': mean}
+    for q, value in zip(quantiles, percentiles):
+        row[f'p{q * 100:g}'] = value
+    if rate is not None:
+        row['rejection_rate'] = rate
+    return row
+
+
+def _label(transitions, by, key):
+    if by == 'homework':
+        return transitions.homeworks[int(key)]
+    if by == 'tenant':
+        return transitions.tenants[int(key)]
+    if by in PERIODS:
+        return time.strftime('%Y-%m-%d', time.gmtime(key))
+    return 'all'
+
+
+def report(transitions, by='week', quantiles=QUANTILES):
+    """Время в каждом статусе и время ревью по когортам `by`."""
+    spans = intervals(transitions)
+    done = reviews(spans)
+    if np is not None:
+        rejected = (done.next == REJECTED).astype(np.float64)
+    else:
+        rejected = [after == REJECTED for after in done.next]
+    latency = summarize(cohorts(done, by), done.duration, rejected,
+                        quantiles)
+    for row in latency:
+        row['key'] = _label(transitions, by, row['key'])
+    states = summarize(spans.state, spans.duration, quantiles=quantiles)
+    for row in states:
+        row['key'] = STATES[row['key']]
+    return {
+        'transitions': len(transitions),
+        'by': by,
+        'time_in_state': states,
+        'review_latency': latency,
+    }
+
+
+def format_duration(seconds):
+    if seconds < 3600:
+        return f'{seconds / 60:.0f}m'
+    if seconds < 2 * DAY:
+        return f'{seconds / 3600:.1f}h'
+    return f'{seconds / DAY:.1f}d'
+
+
+def format_table(rows, title):
+    lines = [title]
+    for row in rows:
+        cells = [f'{row["key"]:<20}', f'{row["count"]:>8}']
+        cells += [
+            f'{name} {format_duration(value):>6}'
+            for name, value in row.items() if name.startswith('p')
+        ]
+        if 'rejection_rate' in row:
+            cells.append(f'rejected {row["rejection_rate"]:.1%}')
+        lines.append('  '.join(cells))
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', nargs='+', default=['history.db'],
+                        help='база HistoryStore или базы всех шардов')
+    parser.add_argument('--by', choices=GROUPS, default='week',
+                        help='когорты для времени ревью')
+    parser.add_argument('--since-days', type=float,
+                        help='только переходы за последние N дней')
+    parser.add_argument('--json', action='store_true',
+                        help='вывести отчёт в json')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    since = None
+    if args.since_days is not None:
+        since = time.time() - args.since_days * DAY
+    started = time.perf_counter()
+    result = report(load(args.db, since), args.by)
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    if args.json:
+        json.dump(result, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+        return
+    print(format_table(result['time_in_state'], 'Time in state'))
+    print()
+    print(format_table(result['review_latency'],
+                       f'Review latency by {args.by}'))
+    print(f'\n{result["transitions"]} transitions in '
+          f'{result["seconds"]:.2f}s'
+          f'{"" if np is not None else " (numpy not installed)"}')
+
+
+if __name__ == '__main__':
+    main()
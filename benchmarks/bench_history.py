@@ -0,0 +1,117 @@
+"""Запись и чтение истории переходов в SQLite.
+
+    python benchmarks/bench_history.py
+    python benchmarks/bench_history.py --rows 1000000 --tenants 10000
+
+Пишет `--rows` переходов по `--tenants` студентам через `record`, как
+это делает опрос, и меряет пропускную способность до полного сброса на
+диск. Затем меряет p50/p99 выборки последних переходов студента, в том
+числе пока фоновый поток продолжает писать, и время отчёта
+`analytics.py` по всей базе (с numpy, если он установлен).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import analytics  # noqa: E402
+from history import HistoryStore  # noqa: E402
+
+STATUSES = ('reviewing', 'rejected', 'approved')
+
+
+def fill(store, rows, tenants, seed=0):
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    for i in range(rows):
+        key = rng.randrange(tenants)
+        store.record(f'tenant{key}', {
+            'id': i % 50, 'homework_name': f'hw{i % 50}',
+            'status': STATUSES[i % 3],
+        }, seen_at=i)
+    # Ждём, пока фоновый поток всё запишет
+    while store.stats()['written'] < rows - store.stats()['dropped']:
+        time.sleep(0.01)
+    return time.perf_counter() - started
+
+
+def lookups(store, count, tenants, limit, seed=1):
+    rng = random.Random(seed)
+    timings = []
+    for _ in range(count):
+        tenant = f'tenant{rng.randrange(tenants)}'
+        started = time.perf_counter()
+        store.last(tenant, limit)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'p50_ms': round(statistics.median(timings), 4),
+        'p99_ms': round(timings[int(len(timings) * 0.99) - 1], 4),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--tenants', type=int, default=10000)
+    parser.add_argument('--lookups', type=int, default=10000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--out', help='куда записать json с результатами')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoryStore(os.path.join(directory, 'history.db'),
+                             max_buffer=args.rows).open()
+        seconds = fill(store, args.rows, args.tenants)
+        result = {
+            'rows': args.rows,
+            'insert_rows_per_sec': round(args.rows / seconds),
+            'last': lookups(store, args.lookups, args.tenants, args.limit),
+        }
+        writer = threading.Thread(
+            target=fill, args=(store, args.rows // 10, args.tenants, 2)
+        )
+        writer.start()
+        result['last_while_writing'] = lookups(
+            store, args.lookups, args.tenants, args.limit, seed=3
+        )
+        writer.join()
+        result['batches'] = store.stats()['batches']
+        store.close()
+        started = time.perf_counter()
+        analytics.report(
+            analytics.load(os.path.join(directory, 'history.db')), 'week'
+        )
+        result['analytics_seconds'] = round(
+            time.perf_counter() - started, 2
+        )
+        result['numpy'] = analytics.np is not None
+        result['file_mb'] = round(
+            os.path.getsize(os.path.join(directory, 'history.db')) / 2 ** 20,
+            1
+        )
+    print(f'insert: {result["insert_rows_per_sec"]} rows/s '
+          f'in {result["batches"]} batches, {result["file_mb"]} MB')
+    for name in ('last', 'last_while_writing'):
+        print(f'{name}: p50 {result[name]["p50_ms"]} ms, '
+              f'p99 {result[name]["p99_ms"]} ms')
+    print(f'analytics report: {result["analytics_seconds"]} s '
+          f'({"numpy" if result["numpy"] else "pure python"})')
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""Бенчмарки пайплайна опрос -> проверка -> разбор -> отправка.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_pipeline.py --out bench.json
+    python benchmarks/bench_pipeline.py --compare bench.json
+
+Результаты пишутся в json: ops/sec и p50/p95/p99 в миллисекундах по
+каждому бенчмарку. С `--compare` прогон сверяется с прошлым и
+завершается с ошибкой, если ops/sec упали больше чем на `--tolerance`.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from functools import partial
+from http import HTTPStatus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import homework  # noqa: E402
+from engine import PollingEngine, Tenant  # noqa: E402
+
+STATUSES = tuple(homework.HOMEWORK_STATUSES)
+
+
+def make_homeworks(count, seed=0):
+    """Синтетический список `homeworks` в формате апи."""
+    rng = random.Random(seed)
+    return [
+        {
+            'id': 100000 + i,
+            'status': rng.choice(STATUSES),
+            'homework_name': f'student__hw{i:05d}.zip',
+            'reviewer_comment': 'Всё нравится',
+            'date_updated': '2020-02-13T14:40:57Z',
+            'lesson_name': f'Спринт {i % 20}',
+        }
+        for i in range(count)
+    ]
+
+
+def summarize(samples, operations):
+    """ops/sec и перцентили по списку длительностей в секундах."""
+    ordered = sorted(samples)
+    total = sum(ordered)
+
+    def percentile(fraction):
+        index = min(len(ordered) - 1, int(fraction * len(ordered)))
+        return ordered[index] * 1000
+
+    return {
+        'runs': len(ordered),
+        'ops_per_sec': operations / total if total else 0.0,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+    }
+
+
+def measure(func, repeat, operations=1):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples, operations * repeat)
+
+
+def bench_check_response(size, repeat):
+    response = {'homeworks': make_homeworks(size), 'current_date': 0}
+    return measure(partial(homework.check_response, response), repeat)
+
+
+def bench_parse_status(size, repeat):
+    homeworks = make_homeworks(size)
+
+    def parse_all():
+        for record in homeworks:
+            homework.parse_status(record)
+
+    return measure(parse_all, repeat, operations=size)
+
+
+def bench_validate_batch(size, repeat):
+    """Проверка всего списка разом, каждая сотая запись испорчена."""
+    homeworks = make_homeworks(size)
+    for record in homeworks[::100]:
+        record['status'] = 'unknown'
+    validate = partial(homework.VALIDATOR.split, homeworks)
+    return measure(validate, repeat, operations=size)
+
+
+class FakeResponse:
+
+    def __init__(self, payload):
+        self.status_code = HTTPStatus.OK
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeHttp:
+    """Апи Практикума в памяти: на каждый опрос часть работ меняется."""
+
+    def __init__(self, size, latency, variants=4):
+        self.latency = latency
+        self._payloads = [
+            {'homeworks': make_homeworks(size, seed), 'current_date': 0}
+            for seed in range(variants)
+        ]
+        self._rng = random.Random(1)
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return FakeResponse(self._rng.choice(self._payloads))
+
+
+class FakeBot:
+
+    def __init__(self):
+        self.sent = 0
+
+    def send_message(self, chat_id, text, key=None):
+        self.sent += 1
+
+
+def bench_end_to_end(tenants, size, latency, max_in_flight, rounds):
+    """Полный цикл `poll_tenant` по всем студентам через движок."""
+    http = FakeHttp(size, latency)
+    bot = FakeBot()
+    samples = []
+
+    def poll(tenant):
+        started = time.perf_counter()
+        try:
+            return homework.poll_tenant(bot, tenant, http)
+        finally:
+            samples.append(time.perf_counter() - started)
+
+    engine = PollingEngine(
+        [Tenant(f'token{i}', i) for i in range(tenants)], poll,
+        interval=0, max_in_flight=max_in_flight
+    )
+
+    async def run_rounds():
+        for _ in range(rounds):
+            await engine.poll_once()
+
+    started = time.perf_counter()
+    asyncio.run(run_rounds())
+    elapsed = time.perf_counter() - started
+    result = summarize(samples, len(samples))
+    result['ops_per_sec'] = len(samples) / elapsed
+    result['messages'] = bot.sent
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Список регрессий ops/sec относительно прошлого прогона."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before or not before['ops_per_sec']:
+            continue
+        change = result['ops_per_sec'] / before['ops_per_sec'] - 1
+        if change < -tolerance:
+            regressions.append(f'{name}: {change:+.1%} ops/sec')
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=10000,
+                        help='работ в синтетическом ответе апи')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--tenant-size', type=int, default=20,
+                        help='работ в ответе апи одному студенту')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='задержка фейкового апи, секунды')
+    parser.add_argument('--max-in-flight', type=int, default=64)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--out', help='куда записать json с результатами')
+    parser.add_argument('--compare', help='json прошлого прогона')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.disable(logging.INFO)
+    results = {
+        'check_response': bench_check_response(args.size, args.repeat),
+        'parse_status': bench_parse_status(args.size, args.repeat),
+        'validate_batch': bench_validate_batch(args.size, args.repeat),
+        'end_to_end': bench_end_to_end(
+            args.tenants, args.tenant_size, args.latency,
+            args.max_in_flight, args.rounds
+        ),
+    }
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': vars(args),
+        'results': results,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            sys.exit('Regressions:\n' + '\n'.join(regressions))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""Локальные заглушки апи Практикума и Telegram Bot API.
+
+Для нагрузочных прогонов без настоящих сервисов:
+
+    python benchmarks/fake_servers.py --write-tenants tenants.json \\
+        --tenants 10000
+    python benchmarks/fake_servers.py --latency 0.05 --error-rate 0.01
+
+и бот, направленный на них:
+
+    PRACTICUM_ENDPOINT=http://127.0.0.1:8081/api/user_api/homework_statuses/ \\
+    TELEGRAM_API_URL=http://127.0.0.1:8082 TELEGRAM_TOKEN=1:fake \\
+    TENANTS_FILE=tenants.json python homework.py
+
+Практикум отдаёт каждому токену детерминированный набор работ, статусы
+которых сменяются раз в `--change-interval` секунд, и учитывает
+`from_date`; ETag ответа считается по списку работ, и на совпавший
+If-None-Match приходит 304 без тела. Telegram считает сообщения и
+отвечает 429 с `retry_after` при превышении лимитов на чат и общего,
+getUpdates всегда пуст. Счётчики - GET /stats.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from delivery import TokenBucket  # noqa: E402
+
+STATUSES = ('reviewing', 'rejected', 'reviewing', 'approved')
+
+
+class Behaviour:
+    """Общие настройки заглушки: задержка и доля ошибок."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        with self._lock:
+            extra = self._rng.uniform(-self.jitter, self.jitter)
+        pause = max(self.latency + extra, 0)
+        if pause:
+            time.sleep(pause)
+
+    def should_fail(self):
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+
+class Counters:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def add(self, name, value=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    behaviour = None
+    counters = None
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, payload, etag=None):
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if etag is not None:
+            self.send_header('ETag', etag)
+        accept = self.headers.get('Accept-Encoding', '')
+        if 'gzip' in accept and len(body) > 1024:
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.counters.add('bytes_sent', len(body))
+
+    def send_stats(self):
+        self.send_json(HTTPStatus.OK, self.counters.snapshot())
+
+
+class PracticumHandler(JsonHandler):
+    """GET homework_statuses с авторизацией OAuth и `from_date`."""
+
+    homeworks_per_student = 20
+    change_interval = 600
+
+    def homeworks(self, token, now):
+        seed = int(hashlib.sha256(token.encode()).hexdigest()[:8], 16)
+        records = []
+        for index in range(self.homeworks_per_student):
+            offset = (seed + index * 7919) % self.change_interval
+            step = int((now + offset) // self.change_interval)
+            records.append({
+                'id': seed % 10 ** 6 * 1000 + index,
+                'status': STATUSES[step % len(STATUSES)],
+                'homework_name': f'{token[:8]}__hw{index}.zip',
+                'reviewer_comment': 'Всё нравится',
+                'date_updated': step * self.change_interval - offset,
+                'lesson_name': f'Спринт {index}',
+            })
+        return records
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            return self.send_stats()
+        self.counters.add('requests')
+        self.behaviour.delay()
+        authorization = self.headers.get('Authorization', '')
+        if not authorization.startswith('OAuth '):
+            self.counters.add('unauthorized')
+            return self.send_json(HTTPStatus.UNAUTHORIZED, {
+                'code': 'not_authenticated',
+                'message': 'Учетные данные не были предоставлены.',
+            })
+        if self.behaviour.should_fail():
+            self.counters.add('errors')
+            return self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {})
+        try:
+            from_date = int(float(
+                parse_qs(url.query).get('from_date', ['0'])[0]
+            ))
+        except ValueError:
+            return self.send_json(HTTPStatus.BAD_REQUEST, {
+                'code': 'UnknownError',
+                'error': {'error': 'Wrong from_date format'},
+            })
+        now = int(time.time())
+        homeworks = [
+            record for record in self.homeworks(authorization[6:], now)
+            if record['date_updated'] >= from_date
+        ]
+        etag = 'W/"{}"'.format(hashlib.sha256(
+            json.dumps(homeworks).encode()
+        ).hexdigest()[:16])
+        if self.headers.get('If-None-Match') == etag:
+            self.counters.add('not_modified')
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.counters.add('homeworks', len(homeworks))
+        self.send_json(
+            HTTPStatus.OK, {'homeworks': homeworks, 'current_date': now},
+            etag
+        )
+
+
+class TelegramHandler(JsonHandler):
+    """POST sendMessage с лимитами тг на чат и общим."""
+
+    chat_rate = 1.0
+    global_rate = 30.0
+    _buckets = {}
+    _global = None
+    _lock = threading.Lock()
+
+    def throttle(self, chat_id):
+        with self._lock:
+            bucket = self._buckets.get(chat_id)
+            if bucket is None:
+                bucket = self._buckets[chat_id] = TokenBucket(
+                    self.chat_rate, 1
+                )
+            wait = max(bucket.try_acquire(), self._global.try_acquire())
+        return wait
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/stats':
+            return self.send_stats()
+        self.send_json(HTTPStatus.NOT_FOUND, {'ok': False})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if self.path.endswith('/getUpdates'):
+            # Входящих нет: держим long polling, но не дольше секунды
+            self.counters.add('get_updates')
+            time.sleep(min(float(payload.get('timeout', 0)), 1.0))
+            return self.send_json(HTTPStatus.OK, {'ok': True, 'result': []})
+        if not self.path.endswith('/sendMessage'):
+            return self.send_json(HTTPStatus.NOT_FOUND, {
+                'ok': False, 'error_code': 404, 'description': 'Not Found',
+            })
+        self.counters.add('requests')
+        self.behaviour.delay()
+        if self.behaviour.should_fail():
+            self.counters.add('errors')
+            return self.send_json(HTTPStatus.BAD_GATEWAY, {
+                'ok': False, 'error_code': 502, 'description': 'Bad Gateway',
+            })
+        wait = self.throttle(payload.get('chat_id'))
+        if wait > 0:
+            self.counters.add('throttled')
+            retry_after = max(int(wait + 0.999), 1)
+            return self.send_json(HTTPStatus.TOO_MANY_REQUESTS, {
+                'ok': False, 'error_code': 429,
+                'description': f'Too Many Requests: retry after {retry_after}',
+                'parameters': {'retry_after': retry_after},
+            })
+        self.counters.add('messages')
+        self.send_json(HTTPStatus.OK, {'ok': True, 'result': {
+            'message_id': random.randint(1, 10 ** 9),
+            'chat': {'id': payload.get('chat_id')},
+            'date': int(time.time()),
+            'text': payload.get('text'),
+        }})
+
+
+def make_server(handler, port, behaviour, host='127.0.0.1', **settings):
+    """Сервер с собственным подклассом обработчика и счётчиками."""
+    settings.update(behaviour=behaviour, counters=Counters())
+    if handler is TelegramHandler:
+        settings.update(_buckets={}, _global=TokenBucket(
+            settings.get('global_rate', handler.global_rate)
+        ))
+    handler_class = type(handler.__name__, (handler,), settings)
+    server = ThreadingHTTPServer((host, port), handler_class)
+    server.daemon_threads = True
+    return server
+
+
+def start(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+def write_tenants(path, count):
+    tenants = [
+        {'practicum_token': f'fake-token-{i:06d}', 'chat_id': 10 ** 6 + i}
+        for i in range(count)
+    ]
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(tenants, file)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--practicum-port', type=int, default=8081)
+    parser.add_argument('--telegram-port', type=int, default=8082)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--homeworks', type=int, default=20,
+                        help='работ у каждого студента')
+    parser.add_argument('--change-interval', type=int, default=600)
+    parser.add_argument('--chat-rate', type=float, default=1.0)
+    parser.add_argument('--global-rate', type=float, default=30.0)
+    parser.add_argument('--write-tenants', metavar='PATH',
+                        help='записать TENANTS_FILE и выйти')
+    parser.add_argument('--tenants', type=int, default=10000)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.write_tenants:
+        write_tenants(args.write_tenants, args.tenants)
+        return
+    behaviour = Behaviour(args.latency, args.jitter, args.error_rate)
+    practicum = make_server(
+        PracticumHandler, args.practicum_port, behaviour, args.host,
+        homeworks_per_student=args.homeworks,
+        change_interval=args.change_interval,
+    )
+    telegram = make_server(
+        TelegramHandler, args.telegram_port, behaviour, args.host,
+        chat_rate=args.chat_rate, global_rate=args.global_rate,
+    )
+    start(telegram)
+    print(f'Practicum: http://{args.host}:{args.practicum_port}'
+          '/api/user_api/homework_statuses/')
+    print(f'Telegram: http://{args.host}:{args.telegram_port}')
+    try:
+        practicum.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Стоимость холодного старта бота.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 5 --out startup.json
+
+Отчёт в духе `python -X importtime`: сколько занимает `import homework`
+и какие модули тянут больше всего. Затем бот несколько раз запускается
+против локальных заглушек из `fake_servers.py` и меряется время от
+старта процесса до первого запроса к апи Практикума.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_servers import (Behaviour, PracticumHandler,  # noqa: E402
+                          TelegramHandler, make_server, start, write_tenants)
+
+FIRST_POLL_TIMEOUT = 30.0
+
+
+def import_times(module='homework'):
+    """Строки -X importtime: `(модуль, своё мкс, с зависимостями мкс)`."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(own), int(cumulative)))
+    return rows
+
+
+def import_report(module='homework', top=15):
+    rows = import_times(module)
+    total = next(cum for name, _, cum in rows if name == module)
+    heaviest = sorted(rows, key=lambda row: row[2], reverse=True)
+    return {
+        'module': module,
+        'total_ms': total / 1000,
+        'modules': len(rows),
+        'top': [
+            {'module': name, 'self_ms': own / 1000,
+             'cumulative_ms': cum / 1000}
+            for name, own, cum in heaviest[1:top + 1]
+        ],
+    }
+
+
+def time_to_first_poll(practicum, telegram, workdir,
+                       timeout=FIRST_POLL_TIMEOUT):
+    """Секунды от запуска `homework.py` до первого запроса к апи."""
+    host, practicum_port = practicum.server_address
+    env = dict(
+        os.environ,
+        PRACTICUM_ENDPOINT=f'http://{host}:{practicum_port}/api/',
+        TELEGRAM_API_URL='http://{}:{}'.format(*telegram.server_address),
+        TELEGRAM_TOKEN='1:fake', TENANTS_FILE='tenants.json',
+        COMMANDS='0', LOG_LEVEL='INFO',
+    )
+    counters = practicum.RequestHandlerClass.counters
+    before = counters.snapshot().get('requests', 0)
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'homework.py')],
+        cwd=workdir, env=env
+    )
+    try:
+        while counters.snapshot().get('requests', 0) == before:
+            elapsed = time.perf_counter() - started
+            if elapsed > timeout or process.poll() is not None:
+                raise RuntimeError('Bot did not poll the API')
+            time.sleep(0.001)
+        return time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def first_poll_report(runs, timeout=FIRST_POLL_TIMEOUT):
+    behaviour = Behaviour()
+    practicum = make_server(PracticumHandler, 0, behaviour)
+    telegram = make_server(TelegramHandler, 0, behaviour)
+    for server in (practicum, telegram):
+        # Бот убивается посреди ответа - обрыв соединения тут не ошибка
+        server.handle_error = lambda request, address: None
+        start(server)
+    samples = []
+    with tempfile.TemporaryDirectory() as workdir:
+        write_tenants(os.path.join(workdir, 'tenants.json'), 1)
+        for _ in range(runs):
+            samples.append(time_to_first_poll(
+                practicum, telegram, workdir, timeout
+            ))
+    practicum.shutdown()
+    telegram.shutdown()
+    return {
+        'runs': runs,
+        'median_ms': statistics.median(samples) * 1000,
+        'min_ms': min(samples) * 1000,
+        'max_ms': max(samples) * 1000,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--module', default='homework')
+    parser.add_argument('--timeout', type=float, default=FIRST_POLL_TIMEOUT,
+                        help='сколько ждать первого опроса, секунды')
+    parser.add_argument('--out', help='куда записать json с результатами')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    imports = import_report(args.module, args.top)
+    print(f'import {imports["module"]}: {imports["total_ms"]:.1f} ms, '
+          f'{imports["modules"]} modules')
+    for row in imports['top']:
+        print(f'  {row["cumulative_ms"]:8.1f} ms  {row["self_ms"]:6.1f} ms  '
+              f'{row["module"]}')
+    first_poll = first_poll_report(args.runs, args.timeout)
+    print(f'start to first poll: median {first_poll["median_ms"]:.0f} ms, '
+          f'min {first_poll["min_ms"]:.0f} ms, '
+          f'max {first_poll["max_ms"]:.0f} ms')
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as file:
+            json.dump({'imports': imports, 'first_poll': first_poll}, file,
+                      indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from http import HTTPStatus
+
+import metrics
+from exceptions import CircuitOpenException
+
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30.0
+MAX_RESET_TIMEOUT = 600.0
+HALF_OPEN_PROBES = 1
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+TRANSITIONS = metrics.counter(
+    'homework_circuit_transitions_total', 'Circuit breaker state changes',
+    ('circuit', 'state')
+)
+REJECTED = metrics.counter(
+    'homework_circuit_rejected_total', 'Calls skipped by an open circuit',
+    ('circuit',)
+)
+
+
+def endpoint_failed(response):
+    """Ответ говорит о проблеме апи, а не конкретного студента."""
+    return (
+        response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+        or response.status_code == HTTPStatus.NOT_FOUND
+    )
+
+
+class CircuitBreaker:
+    """Размыкатель цепи для одного внешнего апи.
+
+    После `failure_threshold` ошибок подряд цепь размыкается, и вызовы
+    отклоняются сразу, без запроса. Через `reset_timeout` пропускается
+    не больше `probes` пробных вызовов: если они прошли, цепь снова
+    замкнута, если нет - снова разомкнута, а пауза удваивается до
+    `max_reset_timeout`.
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD,
+                 reset_timeout=RESET_TIMEOUT,
+                 max_reset_timeout=MAX_RESET_TIMEOUT,
+                 probes=HALF_OPEN_PROBES, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.probes = probes
+        self.clock = clock
+        self.state = CLOSED
+        self._failures = 0
+        self._timeout = reset_timeout
+        self._opened_at = 0.0
+        self._in_probe = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        metrics.gauge(
+            'homework_circuit_state',
+            'Circuit state: 0 closed, 1 half-open, 2 open', ('circuit',),
+            callback=lambda: {(self.name,): STATE_VALUES[self.state]}
+        )
+
+    def _move(self, state):
+        previous, self.state = self.state, state
+        TRANSITIONS.inc(circuit=self.name, state=state)
+        if state == OPEN:
+            self._opened_at = self.clock()
+            logging.warning(
+                f'Circuit {self.name} opened after {self._failures} '
+                f'failures, retry in {self._timeout:.0f}s',
+                extra={'circuit': self.name, 'state': state}
+            )
+        else:
+            logging.info(
+                f'Circuit {self.name}: {previous} -> {state}',
+                extra={'circuit': self.name, 'state': state}
+            )
+
+    def allow(self):
+        """Можно ли сейчас звать апи; в полуоткрытом - как пробу."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self.clock() - self._opened_at < self._timeout:
+                    REJECTED.inc(circuit=self.name)
+                    return False
+                self._in_probe = 0
+                self._probe_successes = 0
+                self._move(HALF_OPEN)
+            if self._in_probe >= self.probes:
+                REJECTED.inc(circuit=self.name)
+                return False
+            self._in_probe += 1
+            return True
+
+    def retry_after(self):
+        """Через сколько секунд цепь снова пропустит вызов."""
+        with self._lock:
+            if self.state == OPEN:
+                return max(self._opened_at + self._timeout - self.clock(), 0.0)
+            if self.state == HALF_OPEN:
+                # Проба уже в полёте; раньше минимальной паузы её итог
+                # повторно проверять незачем
+                return self.reset_timeout
+            return 0.0
+
+    def record(self, success):
+        """Итог разрешённого вызова."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                # Ответ мог прийти на вызов, начатый ещё до размыкания
+                self._in_probe = max(self._in_probe - 1, 0)
+                if not success:
+                    self._timeout = min(
+                        self._timeout * 2, self.max_reset_timeout
+                    )
+                    self._move(OPEN)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.probes:
+                    self._failures = 0
+                    self._timeout = self.reset_timeout
+                    self._move(CLOSED)
+                return
+            if success:
+                self._failures = 0
+                return
+            self._failures += 1
+            if self.state == CLOSED and (
+                    self._failures >= self.failure_threshold):
+                self._move(OPEN)
+
+    def guard(self, http, failed=endpoint_failed):
+        return GuardedHttp(http, self, failed)
+
+
+class GuardedHttp:
+    """http-клиент, запросы которого идут через размыкатель цепи."""
+
+    def __init__(self, http, breaker, failed=endpoint_failed):
+        self.http = http
+        self.breaker = breaker
+        self.failed = failed
+
+    def get(self, url, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenException(
+                f'Circuit {self.breaker.name} is open, request skipped',
+                self.breaker.retry_after()
+            )
+        try:
+            response = self.http.get(url, **kwargs)
+        except Exception:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(not self.failed(response))
+        return response
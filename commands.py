@@ -0,0 +1,179 @@
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+LONG_POLL_TIMEOUT = 30
+ERROR_PAUSE = 5
+HISTORY_LIMIT = 10
+# Больше строк не влезет в одно сообщение Telegram
+MAX_HISTORY = 100
+
+HELP = (
+    'Команды:\n'
+    '/status - текущие статусы работ\n'
+    '/history [N] - последние N смен статуса\n'
+    '/last - последняя смена статуса'
+)
+
+
+def format_time(seen_at):
+    return time.strftime('%d.%m %H:%M', time.localtime(seen_at))
+
+
+class CommandHandler:
+    """Ответы на команды студентов из состояния в памяти.
+
+    Статусы и история переходов берутся из `Tenant`, который
+    обновляет опрос, так что команда не делает запросов к апи. Если
+    передан `store` (`HistoryStore`), /history читает его и видит
+    переходы глубже кольцевого буфера в памяти. Сообщения из чатов,
+    которых нет среди студентов, игнорируются.
+    """
+
+    def __init__(self, tenants, verdicts, store=None):
+        self.verdicts = verdicts
+        self.store = store
+        self._by_chat = {}
+        for tenant in tenants:
+            self._by_chat.setdefault(str(tenant.chat_id), []).append(tenant)
+        self.commands = {
+            '/start': self.help,
+            '/help': self.help,
+            '/status': self.status,
+            '/history': self.history,
+            '/last': self.last,
+        }
+
+    def handle(self, chat_id, text):
+        """Текст ответа на сообщение или None, если отвечать не нужно."""
+        tenants = self._by_chat.get(str(chat_id))
+        if not tenants or not text.startswith('/'):
+            return None
+        command, _, argument = text.partition(' ')
+        # В группах команда приходит как /status@имя_бота
+        command = command.split('@')[0].lower()
+        handler = self.commands.get(command)
+        if handler is None:
+            return f'Неизвестная команда.\n{HELP}'
+        return handler(tenants, argument.strip())
+
+    def _verdict(self, status):
+        return self.verdicts.get(status, status)
+
+    def _recent(self, tenants):
+        entries = []
+        for tenant in tenants:
+            entries.extend(tenant.recent())
+        entries.sort(key=lambda entry: entry[0])
+        return entries
+
+    def help(self, tenants, argument):
+        return HELP
+
+    def status(self, tenants, argument):
+        names = {}
+        for _, key, name, _ in self._recent(tenants):
+            names[key] = name
+        lines = []
+        for tenant in tenants:
+            for key, status in tenant.statuses.snapshot():
+                name = names.get(key) or f'#{key}'
+                lines.append(f'"{name}": {self._verdict(status)}')
+        if not lines:
+            return 'Работ на проверке пока нет.'
+        return '\n'.join(lines)
+
+    def _stored(self, tenants, limit):
+        entries = []
+        for tenant in tenants:
+            entries.extend(self.store.last(tenant.key, limit))
+        entries.sort(key=lambda entry: entry[0])
+        return entries
+
+    def history(self, tenants, argument):
+        limit = int(argument) if argument.isdigit() else HISTORY_LIMIT
+        limit = min(limit, MAX_HISTORY)
+        if not limit:
+            entries = []
+        elif self.store is not None:
+            entries = self._stored(tenants, limit)[-limit:]
+        else:
+            entries = self._recent(tenants)[-limit:]
+        if not entries:
+            return 'Статусы работ ещё не менялись.'
+        return '\n'.join(
+            f'{format_time(seen_at)} "{name or key}": '
+            f'{self._verdict(status)}'
+            for seen_at, key, name, status in reversed(entries)
+        )
+
+    def last(self, tenants, argument):
+        entries = self._recent(tenants)
+        if not entries:
+            return 'Статусы работ ещё не менялись.'
+        seen_at, key, name, status = entries[-1]
+        return (
+            f'{format_time(seen_at)} "{name or key}": '
+            f'{self._verdict(status)}'
+        )
+
+
+class PipeUpdates:
+    """Источник входящих для воркера шарда: json на строку из потока."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def get_updates(self, offset=None, timeout=0):
+        line = self.stream.readline()
+        if not line:
+            raise EOFError('Update pipe is closed')
+        return [json.loads(line)]
+
+
+class CommandPoller:
+    """Принимает команды через getUpdates рядом с опросом Практикума.
+
+    Long polling идёт в своём потоке, поэтому ни ожидание тг, ни
+    ответы не задерживают цикл событий движка; ответы уходят через
+    `reply` - обычно очередь доставки с её лимитами.
+    """
+
+    def __init__(self, client, handler, reply, timeout=LONG_POLL_TIMEOUT):
+        self.client = client
+        self.handler = handler
+        self.reply = reply
+        self.timeout = timeout
+        self.offset = None
+        self.received = 0
+        self.answered = 0
+        self._executor = ThreadPoolExecutor(1)
+
+    def poll(self):
+        """Один запрос getUpdates; возвращает число полученных сообщений."""
+        updates = self.client.get_updates(self.offset, self.timeout)
+        for update in updates:
+            self.offset = update['update_id'] + 1
+            message = update.get('message') or {}
+            text = message.get('text')
+            chat_id = message.get('chat', {}).get('id')
+            if text is None or chat_id is None:
+                continue
+            self.received += 1
+            answer = self.handler.handle(chat_id, text)
+            if answer is not None:
+                logging.info(f'Answering command {text.split()[0]}')
+                self.reply(chat_id, answer)
+                self.answered += 1
+        return len(updates)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(self._executor, self.poll)
+            except Exception as error:
+                logging.error(f'Failed to get Telegram updates: {error}')
+                await asyncio.sleep(ERROR_PAUSE)
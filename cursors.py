@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+import tempfile
+
+
+class CursorStore:
+    """Курсоры `from_date` и последние статусы работ по студентам.
+
+    Весь снимок читается одним файлом при старте, а пишется атомарно:
+    во временный файл рядом, fsync и os.replace, так что после падения
+    на диске остаётся либо старый, либо новый снимок целиком. `dirty`
+    говорит, сдвинулся ли чей-то курсор с прошлой записи.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dirty = False
+        self._state = {}
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                self._state = json.load(file)
+        except FileNotFoundError:
+            self._state = {}
+        except ValueError as error:
+            logging.error(f'Cursor file {self.path} is corrupted: {error}')
+            self._state = {}
+        self.dirty = False
+        return self
+
+    def restore(self, tenant):
+        """Подставляет сохранённый курсор и статусы; False, если их нет."""
+        state = self._state.get(tenant.key)
+        if state is None:
+            return False
+        tenant.timestamp = state['current_date']
+        tenant.statuses.load(state.get('statuses', []))
+        tenant.load_history(state.get('history', []))
+        return True
+
+    def current_date(self, key):
+        """Сохранённый курсор студента; None, если его нет."""
+        state = self._state.get(key)
+        return None if state is None else state['current_date']
+
+    def retain(self, keys):
+        """Забывает студентов не из `keys`, например ушедших в другой шард."""
+        keys = set(keys)
+        dropped = [key for key in self._state if key not in keys]
+        for key in dropped:
+            del self._state[key]
+        if dropped:
+            self.dirty = True
+
+    def update(self, tenant):
+        state = {
+            'current_date': tenant.timestamp,
+            'statuses': tenant.statuses.snapshot(),
+            'history': tenant.recent(),
+        }
+        if self._state.get(tenant.key) != state:
+            self._state[tenant.key] = state
+            self.dirty = True
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(self._state, file, separators=(',', ':'))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
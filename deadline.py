@@ -0,0 +1,63 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+from exceptions import DeadlineExceeded
+
+# Бюджет текущего цикла опроса; шаги пайплайна сверяются с ним, не
+# получая его параметром
+CURRENT = contextvars.ContextVar('deadline', default=None)
+
+
+class Deadline:
+    """Момент, к которому цикл опроса должен уложиться целиком."""
+
+    __slots__ = ('expires_at', 'clock')
+
+    def __init__(self, budget, clock=time.monotonic):
+        self.clock = clock
+        self.expires_at = clock() + budget
+
+    def remaining(self):
+        return self.expires_at - self.clock()
+
+    def check(self, stage):
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(f'Poll deadline exceeded at {stage}')
+
+
+@contextmanager
+def deadline_scope(budget, clock=time.monotonic):
+    """Ставит бюджет на время блока; с пустым `budget` ничего не делает."""
+    if not budget:
+        yield None
+        return
+    deadline = Deadline(budget, clock)
+    token = CURRENT.set(deadline)
+    try:
+        yield deadline
+    finally:
+        CURRENT.reset(token)
+
+
+def check(stage):
+    """Бросает DeadlineExceeded, если бюджет цикла исчерпан."""
+    deadline = CURRENT.get()
+    if deadline is not None:
+        deadline.check(stage)
+
+
+def remaining():
+    """Сколько осталось от бюджета цикла, None - без ограничения."""
+    deadline = CURRENT.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def bounded_timeout(connect, read, stage='request'):
+    """Таймауты requests, урезанные остатком бюджета."""
+    left = remaining()
+    if left is None:
+        return connect, read
+    if left <= 0:
+        raise DeadlineExceeded(f'Poll deadline exceeded at {stage}')
+    return min(connect, left), min(read, left)
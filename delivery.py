@@ -0,0 +1,349 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from exceptions import (FloodControlException, HTTPStatusException,
+                        MessageNotSent)
+
+MESSAGE_LIMIT = 4096
+MAX_ATTEMPTS = 5
+# Пауза перед повтором неотправленной пачки: удваивается до предела
+RETRY_DELAY = 5.0
+MAX_RETRY_DELAY = 300.0
+# Столько неудачных попыток подряд, и чат ждёт перезапуска бота
+MAX_RETRIES = 12
+
+
+class TokenBucket:
+    """Token bucket с резервированием: отдаёт, сколько ждать до токена."""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def reserve(self):
+        """Забирает токен (возможно, в долг) и возвращает паузу."""
+        self._refill()
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    def try_acquire(self):
+        """Забирает токен, если он есть; иначе возвращает паузу до него."""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def pause(self, seconds):
+        """Опустошает ведро на время `retry_after` от тг."""
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+def is_permanent(error):
+    """Тг отказал насовсем: бот заблокирован, чата нет, плохой запрос.
+
+    Такие ответы - 4xx, кроме 429: повтор не поможет.
+    """
+    code = getattr(error, 'error_code', None)
+    return (isinstance(error, HTTPStatusException) and code is not None
+            and 400 <= code < 500 and code != 429)
+
+
+def pack_messages(texts, limit=MESSAGE_LIMIT):
+    """Склеивает сообщения одного чата в как можно меньше кусков."""
+    return [chunk for chunk, _ in _pack(texts, limit)]
+
+
+def _pack(texts, limit):
+    # Кусок и сколько сообщений уходят целиком, когда он отправлен
+    chunks = []
+    current = ''
+    done = 0
+    for text in texts:
+        for start in range(0, len(text), limit):
+            part = text[start:start + limit]
+            if current and len(current) + 2 + len(part) <= limit:
+                current = f'{current}\n\n{part}'
+            else:
+                if current:
+                    chunks.append((current, done))
+                current = part
+        done += 1
+    if current:
+        chunks.append((current, done))
+    return chunks
+
+
+class Delivery:
+    """Отправка в тг с объединением сообщений и лимитами скорости.
+
+    Опрос и отправка разделены ограниченным outbox: `send_message`
+    можно звать из любого потока, сообщение кладётся в очередь своего
+    чата, а если в outbox уже `capacity` сообщений, поток опроса ждёт.
+    Через `window` секунд после первого сообщения чат попадает к одному
+    из `workers` отправителей, который склеивает накопленное и шлёт с
+    учётом token bucket на чат и общего; flood control от тг
+    выдерживает `retry_after`. После успешной отправки ключи сообщений
+    передаются в `on_delivered`. Если отправка не удалась, сообщения с
+    ключом возвращаются в начало очереди чата и уходят снова через
+    `retry_delay` секунд, пауза удваивается до `max_retry_delay`;
+    сообщения без ключа (оповещения) теряются. После `max_retries`
+    неудач подряд сообщения чата выбрасываются из очереди (в журнале
+    outbox они остаются до перезапуска). Окончательный отказ тг
+    (`is_permanent`) не повторяется: сообщения тоже передаются в
+    `on_delivered`, чтобы журнал не повторял их при каждом старте.
+    """
+
+    def __init__(self, send, window=1.0, chat_rate=1.0, global_rate=30.0,
+                 workers=4, capacity=10000, clock=time.monotonic,
+                 on_delivered=None, retry_delay=RETRY_DELAY,
+                 max_retry_delay=MAX_RETRY_DELAY, max_retries=MAX_RETRIES):
+        self.send = send
+        self.on_delivered = on_delivered
+        self.window = window
+        self.chat_rate = chat_rate
+        self.workers = workers
+        self.capacity = capacity
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_retries = max_retries
+        self.clock = clock
+        self._global = TokenBucket(global_rate, clock=clock)
+        self._chats = {}
+        self._pending = {}
+        self._size = 0
+        self._busy = set()
+        self._failures = {}
+        self._retry_at = {}
+        self._not_full = threading.Condition()
+        self._executor = ThreadPoolExecutor(workers)
+        self._loop = None
+        self._loop_thread = None
+        self._ready = None
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self.throttle_wait = 0.0
+        self.backpressure_wait = 0.0
+        self.send_time = 0.0
+        self._last_stats = (clock(), 0)
+
+    def send_message(self, chat_id, text, key=None, block=True):
+        """Кладёт сообщение в outbox; ждёт места, если `block`."""
+        in_loop = threading.get_ident() == self._loop_thread
+        with self._not_full:
+            # Поток цикла событий ждать не может - он и освобождает место
+            if self._size >= self.capacity and block and not in_loop:
+                started = time.monotonic()
+                while self._size >= self.capacity:
+                    self._not_full.wait()
+                self.backpressure_wait += time.monotonic() - started
+            items = self._pending.get(chat_id)
+            if items is None:
+                self._pending[chat_id] = [(text, key)]
+            else:
+                items.append((text, key))
+            self._size += 1
+        if items is None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._schedule, chat_id)
+
+    def _schedule(self, chat_id, delay=None):
+        if delay is None:
+            delay = self.window
+        self._loop.call_later(delay, self._ready.put_nowait, chat_id)
+
+    @property
+    def queue_depth(self):
+        with self._not_full:
+            return self._size
+
+    def _bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(
+                self.chat_rate, 1, clock=self.clock
+            )
+        return bucket
+
+    async def _throttle(self, chat_id):
+        wait = max(self._bucket(chat_id).reserve(), self._global.reserve())
+        if wait > 0:
+            self.throttle_wait += wait
+            await asyncio.sleep(wait)
+
+    async def _send(self, chat_id, text):
+        loop = asyncio.get_running_loop()
+        for _ in range(MAX_ATTEMPTS):
+            await self._throttle(chat_id)
+            started = time.monotonic()
+            try:
+                await loop.run_in_executor(
+                    self._executor, self.send, chat_id, text
+                )
+            except FloodControlException as error:
+                logging.warning(
+                    f'Flood control for chat {chat_id}, '
+                    f'retry after {error.retry_after}s'
+                )
+                self._bucket(chat_id).pause(error.retry_after)
+            else:
+                self.sent += 1
+                return
+            finally:
+                elapsed = time.monotonic() - started
+                self.send_time += elapsed
+                metrics.STAGE_SECONDS.observe(elapsed, stage='telegram_send')
+        raise MessageNotSent(f'Flood control did not clear for {chat_id}')
+
+    async def _deliver(self, chat_id, items):
+        sent = 0
+        done = []
+        retry = []
+        try:
+            for text, count in _pack([text for text, _ in items],
+                                     MESSAGE_LIMIT):
+                await self._send(chat_id, text)
+                sent = count
+            if items:
+                self._reset(chat_id)
+        except Exception as error:
+            self.failed += 1
+            # Ушедшие куски не повторяем, остальное ждёт новой попытки
+            retry = self._failed(chat_id, items[sent:], error, done)
+        finally:
+            with self._not_full:
+                if retry:
+                    self._pending[chat_id] = (
+                        retry + self._pending.get(chat_id, [])
+                    )
+                self._size -= len(items) - len(retry)
+                self._not_full.notify_all()
+        if retry:
+            self._retry_later(chat_id)
+        keys = [key for _, key in items[:sent] + done if key is not None]
+        if keys and self.on_delivered is not None:
+            self.on_delivered(keys)
+
+    def _failed(self, chat_id, rest, error, done):
+        """Что из неотправленного `rest` повторить; отвергнутое - в `done`."""
+        if is_permanent(error):
+            self.rejected += len(rest)
+            self._reset(chat_id)
+            done.extend(rest)
+            logging.error(
+                f'Telegram rejected {len(rest)} messages to {chat_id}, '
+                f'dropping them: {error}'
+            )
+            return []
+        if self._failures.get(chat_id, 0) + 1 >= self.max_retries:
+            self.abandoned += len(rest)
+            self._reset(chat_id)
+            logging.error(
+                f'Giving up on {len(rest)} messages to {chat_id} after '
+                f'{self.max_retries} attempts, they wait for a restart: '
+                f'{error}'
+            )
+            return []
+        retry = [item for item in rest if item[1] is not None]
+        logging.error(
+            f'Failed to send message to {chat_id}: {error}; '
+            f'retrying {len(retry)} of {len(rest)}'
+        )
+        return retry
+
+    def _reset(self, chat_id):
+        self._failures.pop(chat_id, None)
+        self._retry_at.pop(chat_id, None)
+
+    def _retry_later(self, chat_id):
+        failures = self._failures[chat_id] = (
+            self._failures.get(chat_id, 0) + 1
+        )
+        delay = min(self.retry_delay * 2 ** (failures - 1),
+                    self.max_retry_delay)
+        self._retry_at[chat_id] = self.clock() + delay
+        self.retried += 1
+        if self._loop is not None:
+            self._schedule(chat_id, delay)
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            if chat_id in self._busy:
+                # Порядок внутри чата важнее: ждём предыдущую пачку
+                self._schedule(chat_id)
+                continue
+            wait = self._retry_at.get(chat_id, 0) - self.clock()
+            if wait > 0:
+                # Новые сообщения чата ждут повтора вместе с неотправленными
+                self._schedule(chat_id, wait)
+                continue
+            with self._not_full:
+                items = self._pending.pop(chat_id, [])
+            self._busy.add(chat_id)
+            try:
+                await self._deliver(chat_id, items)
+            finally:
+                self._busy.discard(chat_id)
+
+    async def flush(self):
+        """Отправляет всё накопленное к этому моменту."""
+        with self._not_full:
+            pending, self._pending = self._pending, {}
+        await asyncio.gather(*(
+            self._deliver(chat_id, items) for chat_id, items in pending.items()
+        ))
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._ready = asyncio.Queue()
+        with self._not_full:
+            waiting = list(self._pending)
+        for chat_id in waiting:
+            self._schedule(chat_id)
+        try:
+            await asyncio.gather(
+                *(self._worker() for _ in range(self.workers))
+            )
+        finally:
+            self._loop = None
+
+    def stats(self):
+        """Метрики доставки; скорость считается с прошлого вызова."""
+        now = self.clock()
+        since, sent_before = self._last_stats
+        self._last_stats = (now, self.sent)
+        elapsed = now - since
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'rejected': self.rejected,
+            'abandoned': self.abandoned,
+            'sends_per_second': (
+                (self.sent - sent_before) / elapsed if elapsed > 0 else 0.0
+            ),
+            'send_latency': self.send_time / self.sent if self.sent else 0.0,
+            'queue_depth': self.queue_depth,
+            'throttle_wait': self.throttle_wait,
+            'backpressure_wait': self.backpressure_wait,
+        }
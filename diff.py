@@ -0,0 +1,89 @@
+import threading
+
+# Статусы интернируются в маленькие int, общие для всех таблиц:
+# int до 256 в CPython - синглтоны и не занимают памяти на запись.
+_STATUS_CODES = {}
+_STATUS_NAMES = []
+_lock = threading.Lock()
+
+
+def status_code(status):
+    """Код статуса; новый статус получает следующий свободный код."""
+    code = _STATUS_CODES.get(status)
+    if code is None:
+        with _lock:
+            code = _STATUS_CODES.get(status)
+            if code is None:
+                code = len(_STATUS_NAMES)
+                _STATUS_NAMES.append(status)
+                _STATUS_CODES[status] = code
+    return code
+
+
+def homework_key(homework):
+    """Ключ работы: id, а если его нет - название."""
+    key = homework.get('id')
+    if key is None:
+        return homework.get('homework_name')
+    return key
+
+
+class StatusTable:
+    """Последний отправленный статус по каждой работе студента.
+
+    Хранит только `ключ работы -> код статуса` в одном dict: около
+    70 байт на работу при целочисленном id, без объекта на запись.
+    """
+
+    __slots__ = ('_codes',)
+
+    def __init__(self):
+        self._codes = {}
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __contains__(self, key):
+        return key in self._codes
+
+    def has(self, status):
+        """Есть ли работа в статусе `status`."""
+        code = _STATUS_CODES.get(status)
+        return code is not None and code in self._codes.values()
+
+    def get(self, key):
+        code = self._codes.get(key)
+        return None if code is None else _STATUS_NAMES[code]
+
+    def iter_changes(self, homeworks):
+        """Переходы статусов из `homeworks`, по мере чтения списка.
+
+        Отдаёт `(ключ, код, запись)` только для изменившихся работ;
+        таблица не меняется, пока переход не подтверждён через commit.
+        """
+        codes = self._codes
+        for homework in homeworks:
+            key = homework_key(homework)
+            code = status_code(homework.get('status'))
+            if codes.get(key) != code:
+                yield key, code, homework
+
+    def diff(self, homeworks):
+        """Все переходы статусов из списка `homeworks` разом."""
+        return list(self.iter_changes(homeworks))
+
+    def commit(self, key, code):
+        self._codes[key] = code
+
+    def snapshot(self):
+        """Пары `[ключ, статус]`: в json ключ сохраняет свой тип."""
+        # list() копирует dict за один шаг: опрос может писать параллельно
+        return [
+            [key, _STATUS_NAMES[code]]
+            for key, code in list(self._codes.items())
+        ]
+
+    def load(self, snapshot):
+        self._codes = {
+            key: status_code(status) for key, status in snapshot
+        }
@@ -0,0 +1,245 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from diff import StatusTable, homework_key
+from exceptions import CircuitOpenException
+from logs import TENANT
+from scheduler import Scheduler
+
+# Сколько последних переходов статусов помнить по студенту
+HISTORY_SIZE = 20
+# Сколько ждать начатые опросы при остановке, секунды: супервизор
+# убивает воркер через 10, а ещё нужно сохранить состояние
+STOP_TIMEOUT = 5.0
+
+
+def tenant_key(practicum_token):
+    """Стабильный ключ студента, не раскрывающий токен."""
+    token = str(practicum_token).encode()
+    return hashlib.sha256(token).hexdigest()[:16]
+
+
+class Tenant:
+    """Пара (токен Практикума, чат в тг) и её курсор опроса."""
+
+    __slots__ = (
+        'practicum_token', 'chat_id', 'timestamp', 'statuses', 'history'
+    )
+
+    def __init__(self, practicum_token, chat_id, timestamp=None):
+        self.practicum_token = practicum_token
+        self.chat_id = chat_id
+        if timestamp is None:
+            timestamp = int(time.time())
+        self.timestamp = timestamp
+        self.statuses = StatusTable()
+        # Заводится при первом переходе: у большинства студентов пусто
+        self.history = None
+
+    def remember(self, homework, seen_at=None):
+        """Запоминает переход статуса для команд /history и /last."""
+        if seen_at is None:
+            seen_at = time.time()
+        if self.history is None:
+            self.history = deque(maxlen=HISTORY_SIZE)
+        self.history.append((
+            seen_at, homework_key(homework), homework.get('homework_name'),
+            homework.get('status')
+        ))
+
+    def recent(self):
+        """Переходы от старых к новым, копией."""
+        return list(self.history or ())
+
+    def load_history(self, entries):
+        self.history = None
+        for seen_at, key, name, status in entries:
+            self.remember(
+                {'id': key, 'homework_name': name, 'status': status}, seen_at
+            )
+
+    @property
+    def headers(self):
+        return {'Authorization': f'OAuth {self.practicum_token}'}
+
+    @property
+    def key(self):
+        return tenant_key(self.practicum_token)
+
+    def __repr__(self):
+        return f'Tenant({self.key}, chat_id={self.chat_id})'
+
+
+def load_tenants(path):
+    """Читает список студентов из json-файла."""
+    with open(path, encoding='utf-8') as file:
+        records = json.load(file)
+    return [
+        Tenant(record['practicum_token'], record['chat_id'])
+        for record in records
+    ]
+
+
+async def every(interval, func):
+    """Вызывает `func` раз в `interval` секунд; годится в `tasks` движка."""
+    while True:
+        await asyncio.sleep(interval)
+        func()
+
+
+class PollingEngine:
+    """Опрашивает всех студентов конкурентно в одном процессе.
+
+    Шаги пайплайна синхронные (requests), поэтому выполняются в пуле
+    потоков, а семафор ограничивает число запросов в полёте. Когда
+    опрашивать студента, решает `Scheduler`; `after_round` вызывается
+    раз в `interval` секунд для сохранения состояния и метрик.
+    """
+
+    def __init__(self, tenants, poll, interval, max_in_flight=64,
+                 after_round=None, tasks=(), scheduler=None, on_error=None,
+                 on_success=None):
+        self.tenants = list(tenants)
+        self.poll = poll
+        self.interval = interval
+        self.max_in_flight = max_in_flight
+        self.after_round = after_round
+        self.tasks = tasks
+        if scheduler is None:
+            scheduler = Scheduler(base_interval=interval)
+        self.scheduler = scheduler
+        self.on_error = on_error
+        self.on_success = on_success
+        self._executor = None
+        self._semaphore = None
+        self._in_flight = set()
+        self._stopping = threading.Event()
+        self.polls = 0
+        self.poll_time = 0.0
+        self.last_success = {}
+
+    def _start(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._executor = ThreadPoolExecutor(self.max_in_flight)
+
+    async def _poll_tenant(self, tenant):
+        """Опрашивает студента; возвращает (были ли переходы, ошибка)."""
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            started = time.monotonic()
+            # Контекст с ключом студента едет в поток вместе с опросом
+            context = contextvars.copy_context()
+            context.run(TENANT.set, tenant.key)
+            try:
+                changed = await loop.run_in_executor(
+                    self._executor, context.run, self.poll, tenant
+                )
+            except CircuitOpenException as error:
+                # Апи недоступно целиком, ошибкой студента это не считаем:
+                # размыкание цепи уже залогировано самим размыкателем
+                logging.debug(
+                    f'Poll skipped: {error}', extra={'tenant': tenant.key}
+                )
+                return False, error
+            except Exception as error:
+                logging.error(
+                    f'Program crash: {error}', extra={'tenant': tenant.key}
+                )
+                if self.on_error is not None:
+                    self.on_error(error, tenant.key)
+                return False, error
+            finally:
+                elapsed = time.monotonic() - started
+                self.polls += 1
+                self.poll_time += elapsed
+                metrics.STAGE_SECONDS.observe(elapsed, stage='iteration')
+            self.last_success[tenant.key] = time.time()
+            if self.on_success is not None:
+                self.on_success(tenant.key)
+            return bool(changed), None
+
+    async def _dispatch(self, tenant):
+        changed, error = await self._poll_tenant(tenant)
+        if isinstance(error, CircuitOpenException):
+            # Опросим, когда цепь снова пропустит вызов
+            self.scheduler.defer(tenant, error.retry_after)
+        else:
+            self.scheduler.reschedule(tenant, changed, error is not None)
+
+    async def poll_once(self):
+        """Один проход по всем студентам."""
+        self._start()
+        await asyncio.gather(
+            *(self._poll_tenant(tenant) for tenant in self.tenants)
+        )
+
+    @property
+    def in_flight(self):
+        """Сколько опросов запущено и ещё не закончилось."""
+        return len(self._in_flight)
+
+    def poll_ages(self):
+        """Сколько секунд назад каждый студент опрошен успешно."""
+        now = time.time()
+        return {
+            (key,): now - last for key, last in self.last_success.items()
+        }
+
+    async def _ticker(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            latency = self.poll_time / self.polls if self.polls else 0.0
+            logging.info(
+                f'Polls: {self.polls}, avg poll latency: {latency:.3f}s'
+            )
+            self.after_round()
+
+    def stop(self, *args):
+        """Просит движок закончить работу; годится как обработчик сигнала.
+
+        Новые опросы не запускаются, начатые дожидаются не дольше
+        `STOP_TIMEOUT`, а `after_round` вызывается напоследок ещё раз.
+        """
+        self._stopping.set()
+
+    async def run(self):
+        self._start()
+        logging.info(f'Polling {len(self.tenants)} tenants')
+        for tenant in self.tenants:
+            self.scheduler.add(tenant)
+        tasks = list(self.tasks)
+        if self.after_round is not None:
+            tasks.append(self._ticker)
+        # Ссылки держим, иначе фоновые задачи может собрать gc
+        background = [asyncio.create_task(task()) for task in tasks]
+        try:
+            while not self._stopping.is_set():
+                tenant, wait = self.scheduler.next_due()
+                if tenant is None:
+                    # Не дольше секунды: пока спим, студенты возвращаются
+                    await asyncio.sleep(min(wait, 1.0))
+                    continue
+                task = asyncio.create_task(self._dispatch(tenant))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+            logging.info('Stopping: waiting for polls in flight')
+            if self._in_flight:
+                await asyncio.wait(self._in_flight, timeout=STOP_TIMEOUT)
+            if self.after_round is not None:
+                self.after_round()
+        finally:
+            for task in background:
+                task.cancel()
+            self._executor.shutdown(wait=False)
+
+    def run_forever(self):
+        asyncio.run(self.run())
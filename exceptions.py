@@ -3,7 +3,9 @@ class StatusException(Exception):
 
 
 class HTTPStatusException(Exception):
-    pass
+    def __init__(self, message='', error_code=None):
+        super().__init__(message)
+        self.error_code = error_code
 
 
 class ListException(Exception):
@@ -12,3 +14,19 @@ class ListException(Exception):
 
 class MessageNotSent(Exception):
     pass
+
+
+class FloodControlException(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenException(HTTPStatusException):
+    def __init__(self, message, retry_after=0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    pass
@@ -0,0 +1,154 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import deadline
+import metrics
+from exceptions import DeadlineExceeded
+
+WINDOW = 500
+QUANTILE = 0.95
+MIN_SAMPLES = 50
+MIN_DELAY = 0.05
+MAX_RATIO = 0.05
+
+HEDGED = metrics.counter(
+    'homework_hedged_requests_total', 'Second requests sent after p95'
+)
+HEDGE_WINS = metrics.counter(
+    'homework_hedge_wins_total', 'Hedged requests that answered first'
+)
+
+
+class LatencyTracker:
+    """Перцентиль задержки по последним `window` успешным запросам."""
+
+    def __init__(self, window=WINDOW, quantile=QUANTILE,
+                 min_samples=MIN_SAMPLES):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._threshold = None
+        self._stale = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._stale += 1
+
+    def threshold(self):
+        """Текущий перцентиль; None, пока замеров мало."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            # Сортировка окна раз в десять замеров, а не на каждый запрос
+            if self._threshold is None or self._stale >= 10:
+                ordered = sorted(self._samples)
+                index = min(int(self.quantile * len(ordered)),
+                            len(ordered) - 1)
+                self._threshold = ordered[index]
+                self._stale = 0
+            return self._threshold
+
+
+def _close(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class HedgedHttp:
+    """GET с подстраховкой: медленный запрос дублируется вторым.
+
+    Если ответа нет дольше p95 недавних запросов, отправляется второй
+    такой же, и берётся тот, что ответит раньше; ответ проигравшего
+    закрывается. Дублей не больше `max_ratio` от всех запросов, так
+    что нагрузка на апи растёт на проценты, а не вдвое. Ожидание
+    ограничено бюджетом текущего цикла опроса.
+    """
+
+    def __init__(self, http, workers, tracker=None, max_ratio=MAX_RATIO,
+                 min_delay=MIN_DELAY):
+        self.http = http
+        self.tracker = tracker or LatencyTracker()
+        self.max_ratio = max_ratio
+        self.min_delay = min_delay
+        self.requests = 0
+        self.hedged = 0
+        self.wins = 0
+        self._executor = ThreadPoolExecutor(workers)
+        self._lock = threading.Lock()
+
+    def _timed_get(self, url, kwargs):
+        started = time.monotonic()
+        response = self.http.get(url, **kwargs)
+        self.tracker.observe(time.monotonic() - started)
+        return response
+
+    def _submit(self, url, kwargs):
+        # Бюджет цикла живёт в contextvar: без копии контекста поток
+        # пула не увидит его, и клиент повторял бы запрос без оглядки
+        context = contextvars.copy_context()
+        return self._executor.submit(
+            context.run, self._timed_get, url, kwargs
+        )
+
+    def _may_hedge(self):
+        with self._lock:
+            if self.hedged + 1 > self.max_ratio * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def get(self, url, **kwargs):
+        with self._lock:
+            self.requests += 1
+        delay = self.tracker.threshold()
+        if delay is None or not self.max_ratio:
+            return self._timed_get(url, kwargs)
+        delay = max(delay, self.min_delay)
+        left = deadline.remaining()
+        first = self._submit(url, kwargs)
+        done, _ = wait(
+            [first], delay if left is None else max(min(delay, left), 0)
+        )
+        if done or not self._may_hedge():
+            return self._first_success({first}).result()
+        HEDGED.inc()
+        logging.debug(f'Hedging request after {delay:.3f}s')
+        second = self._submit(url, kwargs)
+        winner = self._first_success({first, second})
+        if winner is second:
+            self.wins += 1
+            HEDGE_WINS.inc()
+        return winner.result()
+
+    def _first_success(self, pending):
+        """Первый успешный запрос; остальные закроются, когда придут."""
+        error = None
+        while pending:
+            done, pending = wait(
+                pending, deadline.remaining(), return_when=FIRST_COMPLETED
+            )
+            if not done:
+                for future in pending:
+                    future.add_done_callback(_close)
+                raise DeadlineExceeded('Poll deadline exceeded at request')
+            for future in done:
+                if future.exception() is None:
+                    for other in pending | (done - {future}):
+                        other.add_done_callback(_close)
+                    return future
+                error = error or future.exception()
+        raise error
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'hedged': self.hedged,
+            'wins': self.wins,
+            'threshold': self.tracker.threshold(),
+        }
@@ -0,0 +1,233 @@
+import logging
+import sqlite3
+import threading
+import time
+
+from diff import homework_key
+
+FLUSH_INTERVAL = 1.0
+BATCH_SIZE = 1000
+MAX_BUFFER = 100000
+RETENTION_DAYS = 365
+PRUNE_INTERVAL = 3600
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS transitions (
+        tenant TEXT NOT NULL,
+        homework_id NOT NULL,
+        homework_name TEXT,
+        status TEXT NOT NULL,
+        seen_at REAL NOT NULL,
+        date_updated
+    )""",
+    # Последние переходы студента и история одной работы - без сортировки
+    """CREATE INDEX IF NOT EXISTS transitions_tenant
+        ON transitions (tenant, seen_at)""",
+    """CREATE INDEX IF NOT EXISTS transitions_homework
+        ON transitions (tenant, homework_id, seen_at)""",
+    # Для удаления старых строк по сроку хранения
+    """CREATE INDEX IF NOT EXISTS transitions_seen_at
+        ON transitions (seen_at)""",
+)
+
+
+class HistoryStore:
+    """История переходов статусов в SQLite.
+
+    `record` только кладёт строку в буфер; фоновый поток раз в
+    `flush_interval` или по `batch_size` строк пишет буфер одной
+    транзакцией. База в режиме WAL, поэтому чтения (`last`,
+    `homework`) идут параллельно с записью и не ждут её. Строки
+    старше `retention_days` раз в `prune_interval` удаляются, а
+    освободившиеся страницы возвращаются файловой системе.
+
+    `siblings` - базы других шардов: чтения объединяют их строки со
+    своими, так что история переехавшего студента не теряется.
+    """
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL,
+                 batch_size=BATCH_SIZE, max_buffer=MAX_BUFFER,
+                 retention_days=RETENTION_DAYS, prune_interval=PRUNE_INTERVAL,
+                 clock=time.time, siblings=()):
+        self.path = path
+        self.siblings = list(siblings)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        self.clock = clock
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._writer = None
+        self._thread = None
+        self._closed = False
+        self._last_prune = clock()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.pruned = 0
+
+    def _connect(self, auto_vacuum=False):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        if auto_vacuum:
+            # Действует, только пока база пуста: до перехода в WAL, который
+            # уже пишет заголовок файла
+            connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            if connection.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                # База создана без него: включается полным VACUUM
+                logging.info(f'Enabling incremental vacuum in {self.path}')
+                connection.execute('VACUUM')
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def _reader(self):
+        # sqlite3-соединение на поток: читатели не делят одно на всех
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _siblings(self):
+        opened = getattr(self._local, 'siblings', None)
+        if opened is None:
+            opened = self._local.siblings = {}
+        for path in self.siblings:
+            connection = opened.get(path)
+            if connection is None:
+                try:
+                    connection = sqlite3.connect(
+                        f'file:{path}?mode=ro', uri=True,
+                        check_same_thread=False
+                    )
+                except sqlite3.OperationalError:
+                    # Шард ещё не создал свою базу
+                    continue
+                opened[path] = connection
+            yield connection
+
+    def _select(self, query, args):
+        rows = self._reader().execute(query, args).fetchall()
+        for connection in self._siblings():
+            try:
+                rows.extend(connection.execute(query, args).fetchall())
+            except sqlite3.Error as error:
+                logging.warning(f'Failed to read shard history: {error}')
+        return rows
+
+    def open(self):
+        connection = self._connect(auto_vacuum=True)
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+        self._writer = connection
+        self._thread = threading.Thread(
+            target=self._run, name='history', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def record(self, tenant, homework, seen_at=None):
+        """Ставит переход в очередь на запись; никогда не ждёт диск."""
+        row = (
+            tenant, homework_key(homework), homework.get('homework_name'),
+            homework.get('status'),
+            self.clock() if seen_at is None else seen_at,
+            homework.get('date_updated'),
+        )
+        with self._cond:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self):
+        """Пишет всё накопленное одной транзакцией."""
+        with self._cond:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        with self._writer:
+            self._writer.executemany(
+                'INSERT INTO transitions VALUES (?, ?, ?, ?, ?, ?)', rows
+            )
+        with self._cond:
+            self.written += len(rows)
+            self.batches += 1
+        return len(rows)
+
+    def prune(self):
+        """Удаляет строки старше срока хранения и сжимает файл."""
+        cutoff = self.clock() - self.retention_days * 86400
+        with self._writer:
+            removed = self._writer.execute(
+                'DELETE FROM transitions WHERE seen_at < ?', (cutoff,)
+            ).rowcount
+        if removed:
+            # Прагма освобождает страницу за шаг, а execute делает один
+            # шаг; executescript доводит её до конца
+            self._writer.executescript('PRAGMA incremental_vacuum')
+            self._writer.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            logging.info(f'Pruned {removed} history rows')
+        self.pruned += removed
+        self._last_prune = self.clock()
+        return removed
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+                if self.clock() - self._last_prune >= self.prune_interval:
+                    self.prune()
+            except sqlite3.Error as error:
+                logging.error(f'Failed to write history: {error}')
+            if closed:
+                return
+
+    def last(self, tenant, limit=10):
+        """Последние `limit` переходов студента, от новых к старым."""
+        rows = self._select(
+            'SELECT seen_at, homework_id, homework_name, status '
+            'FROM transitions WHERE tenant = ? '
+            'ORDER BY seen_at DESC LIMIT ?', (tenant, limit)
+        )
+        if self.siblings:
+            rows.sort(key=lambda row: row[0], reverse=True)
+        return rows[:limit]
+
+    def homework(self, tenant, homework_id):
+        """Все переходы одной работы, от старых к новым."""
+        rows = self._select(
+            'SELECT seen_at, homework_id, homework_name, status '
+            'FROM transitions WHERE tenant = ? AND homework_id = ? '
+            'ORDER BY seen_at', (tenant, homework_id)
+        )
+        if self.siblings:
+            rows.sort(key=lambda row: row[0])
+        return rows
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._writer.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'written': self.written,
+                'pending': len(self._buffer),
+                'dropped': self.dropped,
+                'batches': self.batches,
+                'pruned': self.pruned,
+            }
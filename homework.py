@@ -1,14 +1,35 @@
+import atexit
 import logging
+import signal
 import sys
 import os
-import time
+import threading
+from functools import partial
 from http import HTTPStatus
 
-import requests
 from dotenv import load_dotenv
-from telegram import Bot
 
+from alerts import ErrorAlerts
+from breaker import CircuitBreaker
+from commands import CommandHandler, CommandPoller, PipeUpdates
+from cursors import CursorStore
+import deadline
+from delivery import Delivery
+from diff import homework_key
+from engine import PollingEngine, Tenant, every, load_tenants
 from exceptions import HTTPStatusException, MessageNotSent
+from hedging import HedgedHttp
+from history import HistoryStore
+from http_client import CONNECT_TIMEOUT, READ_TIMEOUT, HttpClient
+from logs import setup_logging
+import metrics
+from outbox_log import DurableOutbox, OutboxLog
+from profiling import CPROFILE, Profiler
+from response_cache import ResponseCache, current_date
+from scheduler import Scheduler
+from streaming import iter_response, loads
+from telegram_client import TelegramClient
+from validation import HomeworkValidator
 
 load_dotenv()
 dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
@@ -16,45 +37,148 @@ dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+# Куда слать оповещения об ошибках, по умолчанию - в чат студента
+ALERT_CHAT_ID = os.getenv('ALERT_CHAT_ID', TELEGRAM_CHAT_ID)
 
 RETRY_TIME = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+# Опрос чаще, пока работа на ревью, и реже у неактивных студентов
+REVIEWING_RETRY_TIME = int(os.getenv('REVIEWING_RETRY_TIME', 60))
+MAX_RETRY_TIME = int(os.getenv('MAX_RETRY_TIME', 3600))
+REQUESTS_PER_MINUTE = int(os.getenv('REQUESTS_PER_MINUTE', 600))
+ENDPOINT = os.getenv(
+    'PRACTICUM_ENDPOINT',
+    'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+# json-список {"practicum_token": ..., "chat_id": ...} для многих студентов
+TENANTS_FILE = os.getenv('TENANTS_FILE')
+MAX_IN_FLIGHT = int(os.getenv('MAX_IN_FLIGHT', 64))
+CURSOR_FILE = os.getenv('CURSOR_FILE', 'cursors.json')
+# Как часто сохранять сдвинувшиеся курсоры, секунды
+CURSOR_SAVE_INTERVAL = float(os.getenv('CURSOR_SAVE_INTERVAL', 30))
+OUTBOX_FILE = os.getenv('OUTBOX_FILE', 'outbox.log')
+# Разбирать большие ответы апи потоком, не загружая целиком
+STREAMING = os.getenv('STREAMING', '').lower() in ('1', 'true', 'yes')
+# Отвечать на /status, /history и /last через getUpdates
+COMMANDS = os.getenv('COMMANDS', '1').lower() in ('1', 'true', 'yes')
+# Размыкатель цепи апи Практикума: ошибок подряд до размыкания, пауза
+# до пробного запроса и число проб, секунды
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', 5))
+BREAKER_RESET = float(os.getenv('BREAKER_RESET', 30))
+BREAKER_PROBES = int(os.getenv('BREAKER_PROBES', 1))
+# Бюджет одного цикла опроса студента (запрос, разбор, отправка) и доля
+# запросов, которые можно продублировать после p95 задержки; 0 - выкл.
+POLL_DEADLINE = float(os.getenv('POLL_DEADLINE', 30))
+HEDGE_RATIO = float(os.getenv('HEDGE_RATIO', 0))
+# История переходов статусов в SQLite; пустое имя - не вести
+HISTORY_FILE = os.getenv('HISTORY_FILE', 'history.db')
+HISTORY_RETENTION_DAYS = float(os.getenv('HISTORY_RETENTION_DAYS', 365))
+# Профилирование опросов: cprofile или sample сразу после старта;
+# без PROFILE сеанс запускается сигналом SIGUSR2
+PROFILE = os.getenv('PROFILE', '').lower()
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_POLLS = int(os.getenv('PROFILE_POLLS', 100))
+PROFILE_TENANT = os.getenv('PROFILE_TENANT')
+PROFILE_TRACEMALLOC = os.getenv(
+    'PROFILE_TRACEMALLOC', ''
+).lower() in ('1', 'true', 'yes')
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 20))
+# Писать ответы апи для replay.py; пустое имя - не писать
+RECORD_FILE = os.getenv('RECORD_FILE')
+# Условные запросы к апи: число студентов в кеше (0 - выключен) и файл
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 100000))
+RESPONSE_CACHE_FILE = os.getenv('RESPONSE_CACHE_FILE')
+# Лог в json с ротацией по размеру и по времени, DEBUG - с выборкой
+LOG_FILE = os.getenv('LOG_FILE', 'program.log')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', 'midnight')
+LOG_BACKUPS = int(os.getenv('LOG_BACKUPS', 7))
+LOG_DEBUG_SAMPLE = int(os.getenv('LOG_DEBUG_SAMPLE', 10))
+# Число процессов-шардов (auto - по числу ядер); SHARD_INDEX и
+# SHARD_COUNT супервизор выставляет своим воркерам
+WORKERS = os.getenv('WORKERS', '1')
+WORKERS = (os.cpu_count() or 1) if WORKERS == 'auto' else int(WORKERS)
+SHARD_INDEX = os.getenv('SHARD_INDEX')
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', 1))
+# Порт /metrics в формате Prometheus, 0 - не поднимать
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+# Окно склейки сообщений одного чата и лимиты тг, сообщений в секунду
+DELIVERY_WINDOW = float(os.getenv('DELIVERY_WINDOW', 1))
+CHAT_RATE = float(os.getenv('CHAT_RATE', 1))
+GLOBAL_RATE = float(os.getenv('GLOBAL_RATE', 30))
+# Число отправителей и размер outbox, при переполнении опрос ждёт
+SENDER_WORKERS = int(os.getenv('SENDER_WORKERS', 4))
+OUTBOX_SIZE = int(os.getenv('OUTBOX_SIZE', 10000))
 
 HOMEWORK_STATUSES = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
-
-logging.basicConfig(
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='program.log',
-    level=logging.DEBUG)
+VALIDATOR = HomeworkValidator(HOMEWORK_STATUSES)
+INVALID_RECORDS = metrics.counter(
+    'homework_invalid_records_total', 'Homework records failing validation'
+)
 
 
 def send_message(bot, message):
     """Отправляет сообщение в тг."""
+    deliver_message(bot, TELEGRAM_CHAT_ID, message)
+
+
+@metrics.timed('send_message')
+def deliver_message(bot, chat_id, message, key=None):
+    """Отправляет сообщение в конкретный чат.
+
+    По `key` журнал outbox отличает уже отправленные переходы.
+    """
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
         logging.info('Sending message..')
-    except Exception('Failed to send message'):
-        raise MessageNotSent('Failed to send message')
+        if key is None:
+            bot.send_message(chat_id, message)
+        else:
+            bot.send_message(chat_id, message, key)
+    except Exception as error:
+        raise MessageNotSent('Failed to send message') from error
     else:
         logging.info('Message sent successfully.')
 
 
 def get_api_answer(current_timestamp):
     """Получает ответ от апи."""
+    return fetch_statuses(HEADERS, current_timestamp)
+
+
+def fetch_statuses(headers, current_timestamp, http=None):
+    """Получает ответ от апи с заголовками конкретного студента."""
+    return request_statuses(headers, current_timestamp, http).json()
+
+
+@metrics.timed('get_api_answer')
+def request_statuses(headers, current_timestamp, http=None, **kwargs):
+    """Запрос к апи с проверкой кода ответа; тело ещё не прочитано.
+
+    304 на условный запрос - не ошибка, его разбирает кеш ответов.
+    """
+    if http is None:
+        # requests грузится дольше всего остального: только к запросу
+        import requests as http
     timestamp = current_timestamp
     params = {'from_date': timestamp}
     logging.info('Requesting API access')
-    response = requests.get(ENDPOINT, headers=HEADERS, params=params)
+    response = http.get(
+        ENDPOINT, headers=headers, params=params,
+        timeout=deadline.bounded_timeout(CONNECT_TIMEOUT, READ_TIMEOUT),
+        **kwargs
+    )
     if response.status_code == HTTPStatus.NOT_FOUND:
         raise HTTPStatusException('Endpoint is not avalible')
-    elif response.status_code != HTTPStatus.OK:
+    elif response.status_code not in (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED):
         raise HTTPStatusException('Endpoint not responding')
-    return response.json()
+    return response
 # В общем, заработало если я ставлю timestamp=0
 # С текущим временем
 # рейзится исключение на 56 строчке
@@ -63,6 +187,7 @@ def get_api_answer(current_timestamp):
 # я еще что-то налажал с кодировками...
 
 
+@metrics.timed('check_response')
 def check_response(response):
     """Проверяет тип данных и возвращает нашу домашнюю работу."""
     if not isinstance(response, dict):
@@ -75,6 +200,7 @@ def check_response(response):
     return homework
 
 
+@metrics.timed('parse_status')
 def parse_status(homework):
     """Извлекает информацию о конкретной домашней работе."""
     homework_name = homework.get('homework_name')
@@ -92,29 +218,484 @@ def check_tokens():
     return all([PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID])
 
 
+def transition_key(tenant, homework):
+    """Ключ идемпотентности уведомления о переходе статуса."""
+    return ':'.join((
+        tenant.key,
+        str(homework_key(homework)),
+        str(homework.get('status')),
+        str(homework.get('date_updated')),
+    ))
+
+
+def check_stream(stream, records):
+    """Лениво отдаёт работы из потока и проверяет ответ целиком в конце."""
+    yield from records
+    check_response(stream.fields)
+
+
+def report_invalid(bad):
+    """Пишет в лог работы, не прошедшие проверку схемы."""
+    for record, reason in bad:
+        INVALID_RECORDS.inc()
+        homework_id = record.get('id') if isinstance(record, dict) else None
+        logging.warning(
+            f'Skipping invalid homework: {reason}',
+            extra={'homework_id': homework_id}
+        )
+
+
+def notify_changes(bot, tenant, homework, history=None):
+    """Отправляет переходы статусов по мере их появления в `homework`.
+
+    Некорректные записи пропускаются и не мешают остальным; отправленные
+    переходы пишутся в `history`, если она есть.
+    """
+    changed = 0
+    bad = []
+    valid = VALIDATOR.iter_valid(homework, bad)
+    for key, code, record in tenant.statuses.iter_changes(valid):
+        logging.info(
+            'Homework status changed',
+            extra={'homework_id': key, 'status': record.get('status')}
+        )
+        deadline.check('send')
+        message = parse_status(record)
+        deliver_message(
+            bot, tenant.chat_id, message, transition_key(tenant, record)
+        )
+        tenant.statuses.commit(key, code)
+        tenant.remember(record)
+        if history is not None:
+            history.record(tenant.key, record)
+        changed += 1
+    report_invalid(bad)
+    return changed
+
+
+def conditional_headers(tenant, cache):
+    """Заголовки студента с валидаторами из кеша, если он есть."""
+    if cache is None:
+        return tenant.headers
+    return {**tenant.headers, **cache.conditional(tenant.key)}
+
+
+def poll_cached(bot, tenant, cache, http=None, history=None):
+    """Опрос с условным запросом: прежний ответ не разбирается."""
+    response = request_statuses(
+        conditional_headers(tenant, cache), tenant.timestamp, http
+    )
+    body = response.content
+    entry = cache.match(tenant.key, response, body)
+    if entry is None:
+        # Тело то же, кроме времени ответа: курсор двигается как обычно
+        tenant.timestamp = current_date(body, tenant.timestamp)
+        return 0
+    deadline.check('parse')
+    data = loads(body)
+    changed = notify_changes(bot, tenant, check_response(data), history)
+    tenant.timestamp = data.get('current_date', tenant.timestamp)
+    cache.store(tenant.key, entry)
+    return changed
+
+
+def poll_streaming(bot, tenant, http=None, cache=None, history=None):
+    """Опрос с разбором тела по мере чтения."""
+    response = request_statuses(
+        conditional_headers(tenant, cache), tenant.timestamp, http,
+        stream=True
+    )
+    with response:
+        entry = None
+        if cache is not None:
+            entry = cache.match(tenant.key, response)
+            if entry is None:
+                return 0
+        stream, records = iter_response(response)
+        changed = notify_changes(
+            bot, tenant, check_stream(stream, records), history
+        )
+    tenant.timestamp = stream.fields.get('current_date', tenant.timestamp)
+    if entry is not None:
+        cache.store(tenant.key, entry)
+    return changed
+
+
+def poll_tenant(bot, tenant, http=None, streaming=False, cache=None,
+                budget=None, history=None):
+    """Один цикл опроса для одного студента.
+
+    В потоковом режиме большой ответ не загружается в память целиком:
+    работы разбираются и отправляются по мере чтения тела. С `cache`
+    запрос условный, а неизменившийся ответ не разбирается вовсе. На
+    весь цикл даётся `budget` секунд: таймауты запроса урезаются до
+    остатка, а после его исчерпания неотправленные переходы ждут
+    следующего опроса.
+    """
+    with deadline.deadline_scope(budget):
+        if streaming:
+            return poll_streaming(bot, tenant, http, cache, history)
+        if cache is not None:
+            return poll_cached(bot, tenant, cache, http, history)
+        response = fetch_statuses(tenant.headers, tenant.timestamp, http)
+        changed = notify_changes(
+            bot, tenant, check_response(response), history
+        )
+        tenant.timestamp = response.get('current_date', tenant.timestamp)
+        return changed
+
+
+def log_http_stats(http):
+    """Пишет в лог, сколько запросов обошлись без нового соединения."""
+    stats = http.stats()
+    logging.info(
+        f'HTTP requests: {stats["requests"]}, '
+        f'new connections: {stats["connections"]}, '
+        f'reused: {stats["reused"]}'
+    )
+
+
+def log_delivery_stats(delivery):
+    """Пишет в лог метрики доставки сообщений."""
+    stats = delivery.stats()
+    logging.info(
+        f'Sent: {stats["sent"]}, failed: {stats["failed"]}, '
+        f'retried: {stats["retried"]}, '
+        f'rejected: {stats["rejected"]}, '
+        f'abandoned: {stats["abandoned"]}, '
+        f'sends/s: {stats["sends_per_second"]:.2f}, '
+        f'avg send latency: {stats["send_latency"]:.3f}s, '
+        f'queue depth: {stats["queue_depth"]}, '
+        f'throttle wait: {stats["throttle_wait"]:.1f}s, '
+        f'backpressure wait: {stats["backpressure_wait"]:.1f}s'
+    )
+
+
+def log_cache_stats(cache):
+    """Пишет в лог, сколько ответов апи не пришлось разбирать."""
+    stats = cache.stats()
+    logging.info(
+        f'API cache hit ratio: {stats["hit_ratio"]:.2%}, '
+        f'not modified: {stats["not_modified"]}, '
+        f'unchanged bodies: {stats["unchanged"]}, '
+        f'bytes saved: {stats["bytes_saved"]}, '
+        f'bytes not parsed: {stats["bytes_skipped"]}'
+    )
+
+
+def save_cursors(store, tenants):
+    """Сохраняет курсоры, если какой-то сдвинулся с прошлой записи."""
+    for tenant in tenants:
+        store.update(tenant)
+    if store.dirty:
+        store.save()
+
+
+def finish_round(http, delivery, alerts, store, tenants, cache=None):
+    """Сохраняет курсоры после прохода по всем студентам."""
+    log_http_stats(http)
+    log_delivery_stats(delivery)
+    alerts.sweep()
+    save_cursors(store, tenants)
+    if cache is not None:
+        log_cache_stats(cache)
+        cache.save()
+
+
+def register_metrics(engine, delivery, log, cache=None, history=None):
+    """Метрики очередей и доставки, считаемые при каждом сборе."""
+    if history is not None:
+        metrics.counter(
+            'homework_history_rows_total', 'Status transitions in history',
+            ('result',),
+            callback=lambda: {
+                ('written',): history.written,
+                ('dropped',): history.dropped,
+            }
+        )
+    if cache is not None:
+        metrics.counter(
+            'homework_api_cache_hits_total',
+            'API responses not parsed: 304 or unchanged body', ('reason',),
+            callback=lambda: {
+                ('not_modified',): cache.not_modified,
+                ('unchanged',): cache.unchanged,
+            }
+        )
+        metrics.counter(
+            'homework_api_cache_lookups_total', 'Conditional API polls',
+            callback=lambda: cache.lookups
+        )
+        metrics.counter(
+            'homework_api_cache_bytes_saved_total',
+            'Response bytes not downloaded thanks to 304',
+            callback=lambda: cache.bytes_saved
+        )
+    metrics.gauge(
+        'homework_last_poll_age_seconds',
+        'Seconds since the last successful poll', ('tenant',),
+        callback=engine.poll_ages
+    )
+    metrics.gauge(
+        'homework_polls_in_flight', 'Polls dispatched and not finished',
+        callback=lambda: engine.in_flight
+    )
+    metrics.gauge(
+        'homework_scheduled_tenants', 'Tenants waiting for their next poll',
+        callback=lambda: len(engine.scheduler)
+    )
+    metrics.gauge(
+        'homework_delivery_queue_depth', 'Messages waiting in the outbox',
+        callback=lambda: delivery.queue_depth
+    )
+    metrics.gauge(
+        'homework_outbox_log_pending', 'Journaled messages without ack',
+        callback=lambda: log.stats()['pending']
+    )
+    metrics.counter(
+        'homework_messages_sent_total', 'Telegram messages sent',
+        callback=lambda: delivery.sent
+    )
+    metrics.counter(
+        'homework_messages_failed_total', 'Failed Telegram sends',
+        callback=lambda: delivery.failed
+    )
+    metrics.counter(
+        'homework_messages_retried_total',
+        'Failed sends queued for another attempt',
+        callback=lambda: delivery.retried
+    )
+    metrics.counter(
+        'homework_messages_dropped_total',
+        'Messages dropped: rejected by Telegram or out of retries',
+        ('reason',),
+        callback=lambda: {
+            ('rejected',): delivery.rejected,
+            ('abandoned',): delivery.abandoned,
+        }
+    )
+    metrics.counter(
+        'homework_throttle_wait_seconds_total',
+        'Time spent waiting for rate limit tokens',
+        callback=lambda: delivery.throttle_wait
+    )
+
+
+def all_tenants():
+    """Список студентов: из TENANTS_FILE или из переменных среды."""
+    if TENANTS_FILE:
+        return load_tenants(TENANTS_FILE)
+    return [Tenant(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)]
+
+
+def get_tenants():
+    """Студенты этого процесса: в режиме шардов - только свои."""
+    tenants = all_tenants()
+    if SHARD_COUNT > 1:
+        from sharding import HashRing
+        ring = HashRing(range(SHARD_COUNT))
+        index = int(SHARD_INDEX)
+        tenants = [
+            tenant for tenant in tenants if ring.node_for(tenant.key) == index
+        ]
+    return tenants
+
+
+def restore_cursors(tenants):
+    """Курсоры студентов; в режиме шардов - самые свежие из всех файлов.
+
+    Студент мог переехать между шардами и обратно, так что в файлах
+    соседей бывает его курсор новее собственного. Чужих студентов
+    из своего файла забываем, чтобы не писать их обратно.
+    """
+    store = CursorStore(CURSOR_FILE).load()
+    if SHARD_COUNT <= 1:
+        for tenant in tenants:
+            store.restore(tenant)
+        return store
+    from sharding import sibling_paths
+    stores = [store] + [
+        CursorStore(path).load()
+        for path in sibling_paths(CURSOR_FILE, SHARD_COUNT)
+    ]
+    for tenant in tenants:
+        # При равенстве max оставляет первый, то есть собственный файл
+        newest = max(
+            (other for other in stores
+             if other.current_date(tenant.key) is not None),
+            key=lambda other: other.current_date(tenant.key), default=None
+        )
+        if newest is not None:
+            newest.restore(tenant)
+    store.retain(tenant.key for tenant in tenants)
+    return store
+
+
+def worker_env(index, count):
+    """Окружение воркера: свой шард, свои файлы и порт метрик."""
+    from sharding import shard_path
+    env = dict(
+        os.environ, SHARD_INDEX=str(index), SHARD_COUNT=str(count),
+        CURSOR_FILE=shard_path(CURSOR_FILE, index),
+        OUTBOX_FILE=shard_path(OUTBOX_FILE, index),
+        LOG_FILE=shard_path(LOG_FILE, index),
+        METRICS_PORT=str(METRICS_PORT + 1 + index if METRICS_PORT else 0),
+    )
+    if RESPONSE_CACHE_FILE:
+        env['RESPONSE_CACHE_FILE'] = shard_path(RESPONSE_CACHE_FILE, index)
+    if HISTORY_FILE:
+        env['HISTORY_FILE'] = shard_path(HISTORY_FILE, index)
+    if RECORD_FILE:
+        env['RECORD_FILE'] = shard_path(RECORD_FILE, index)
+    return env
+
+
+def supervise(count):
+    """Режим супервизора: `count` воркеров, по шарду студентов на каждый."""
+    from sharding import AggregatedRegistry, HashRing, Supervisor
+    ring = HashRing(range(count))
+    chats = {}
+    for tenant in all_tenants():
+        chats.setdefault(str(tenant.chat_id), set()).add(
+            ring.node_for(tenant.key)
+        )
+    supervisor = Supervisor(
+        [sys.executable, os.path.abspath(__file__)],
+        [worker_env(index, count) for index in range(count)],
+        route=lambda chat_id: chats.get(str(chat_id), ())
+    )
+    if COMMANDS:
+        client = TelegramClient(
+            TELEGRAM_TOKEN, HttpClient(pool_size=1), TELEGRAM_API_URL
+        )
+        threading.Thread(
+            target=supervisor.relay_updates, args=(client,),
+            name='updates', daemon=True
+        ).start()
+    if METRICS_PORT:
+        metrics.serve_metrics(METRICS_PORT, METRICS_HOST, AggregatedRegistry([
+            f'http://{METRICS_HOST}:{METRICS_PORT + 1 + index}/metrics'
+            for index in range(count)
+        ]))
+    if hasattr(signal, 'SIGUSR2'):
+        signal.signal(signal.SIGUSR2, supervisor.broadcast)
+    logging.info(f'Supervising {count} workers')
+    supervisor.run()
+
+
+def open_history():
+    """История переходов; у воркера шарда читает и базы соседей."""
+    if not HISTORY_FILE:
+        return None
+    siblings = ()
+    if SHARD_COUNT > 1:
+        from sharding import sibling_paths
+        siblings = sibling_paths(HISTORY_FILE, SHARD_COUNT)
+    history = HistoryStore(
+        HISTORY_FILE, retention_days=HISTORY_RETENTION_DAYS,
+        siblings=siblings
+    ).open()
+    atexit.register(history.close)
+    return history
+
+
+def practicum_client(http):
+    """HTTP-клиент для апи Практикума: с записью и подстраховкой."""
+    if RECORD_FILE:
+        from replay import Recorder
+        recorder = Recorder(RECORD_FILE).open()
+        atexit.register(recorder.close)
+        http = recorder.wrap(http)
+    if HEDGE_RATIO:
+        http = HedgedHttp(http, 2 * MAX_IN_FLIGHT, max_ratio=HEDGE_RATIO)
+    return http
+
+
+def make_profiler():
+    """Профилировщик опросов; взведён сразу, если задан PROFILE."""
+    profiler = Profiler(
+        PROFILE_DIR, PROFILE or CPROFILE, PROFILE_POLLS, PROFILE_TENANT,
+        PROFILE_TRACEMALLOC, PROFILE_KEEP
+    )
+    profiler.install_signal()
+    if PROFILE:
+        profiler.arm()
+    return profiler
+
+
 def main():
     """Основная логика работы бота."""
-    if not check_tokens():
+    listener = setup_logging(
+        LOG_FILE, LOG_LEVEL, LOG_MAX_BYTES, LOG_ROTATE_WHEN, LOG_BACKUPS,
+        LOG_DEBUG_SAMPLE
+    )
+    atexit.register(listener.stop)
+    if not (TELEGRAM_TOKEN and TENANTS_FILE) and not check_tokens():
         logging.critical('Environment variables error')
         sys.exit('Environment variables error')
-    bot = Bot(token=TELEGRAM_TOKEN)
-    while True:
-        try:
-            current_timestamp = time.time()
-            response = get_api_answer(current_timestamp)
-            homework = check_response(response)
-            message = parse_status(homework[0])
-            send_message(bot, message)
-            current_timestamp = response.get('current_date')
-
-        except Exception as error:
-            message = f'Program crash: {error}'
-            logging.error(message)
-            message_error = message
-            if message_error != message:
-                send_message(bot, message)
-        finally:
-            time.sleep(RETRY_TIME)
+    if WORKERS > 1 and SHARD_INDEX is None:
+        return supervise(WORKERS)
+    http = HttpClient(pool_size=MAX_IN_FLIGHT)
+    bot = TelegramClient(TELEGRAM_TOKEN, http, TELEGRAM_API_URL)
+    delivery = Delivery(
+        bot.send_message, DELIVERY_WINDOW, CHAT_RATE, GLOBAL_RATE,
+        SENDER_WORKERS, OUTBOX_SIZE
+    )
+    log = OutboxLog(OUTBOX_FILE)
+    outbox = DurableOutbox(log, delivery)
+    outbox.replay()
+    if ALERT_CHAT_ID:
+        alerts = ErrorAlerts(partial(delivery.send_message, ALERT_CHAT_ID))
+    else:
+        alerts = ErrorAlerts(logging.warning)
+    tenants = get_tenants()
+    store = restore_cursors(tenants)
+    scheduler = Scheduler(
+        RETRY_TIME, REVIEWING_RETRY_TIME, MAX_RETRY_TIME,
+        requests_per_minute=REQUESTS_PER_MINUTE
+    )
+    cache = None
+    if RESPONSE_CACHE_SIZE:
+        cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_FILE).load()
+    history = open_history()
+    tasks = [delivery.run]
+    if CURSOR_SAVE_INTERVAL:
+        tasks.append(partial(
+            every, CURSOR_SAVE_INTERVAL, partial(save_cursors, store, tenants)
+        ))
+    if COMMANDS:
+        # Воркеру шарда команды пересылает супервизор через stdin
+        updates = bot if SHARD_INDEX is None else PipeUpdates(sys.stdin)
+        commands = CommandPoller(
+            updates, CommandHandler(tenants, HOMEWORK_STATUSES, history),
+            delivery.send_message
+        )
+        tasks.append(commands.run)
+    breaker = CircuitBreaker(
+        'practicum', BREAKER_FAILURES, BREAKER_RESET, probes=BREAKER_PROBES
+    )
+    profiler = make_profiler()
+    poll = profiler.wrap(partial(
+        poll_tenant, outbox, http=breaker.guard(practicum_client(http)),
+        streaming=STREAMING, cache=cache, budget=POLL_DEADLINE,
+        history=history
+    ))
+    engine = PollingEngine(
+        tenants, poll, RETRY_TIME, MAX_IN_FLIGHT,
+        after_round=partial(
+            finish_round, http, delivery, alerts, store, tenants, cache
+        ),
+        tasks=tasks, scheduler=scheduler, on_error=alerts.record,
+        on_success=alerts.success
+    )
+    if METRICS_PORT:
+        register_metrics(engine, delivery, log, cache, history)
+        metrics.serve_metrics(METRICS_PORT, METRICS_HOST)
+    # По SIGTERM движок доделывает начатые опросы и сохраняет состояние,
+    # а выход из main запускает закрытие истории, записи и логов
+    signal.signal(signal.SIGTERM, engine.stop)
+    engine.run_forever()
+    log.close()
 
 
 if __name__ == '__main__':
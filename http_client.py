@@ -0,0 +1,127 @@
+import threading
+import time
+
+import deadline
+from exceptions import DeadlineExceeded
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+POOL_SIZE = 64
+RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class HttpClient:
+    """Общая keep-alive сессия для апи Практикума и тг.
+
+    Пул соединений переиспользует TCP+TLS между циклами опроса,
+    у каждого запроса есть таймауты на соединение и чтение, а
+    временные ошибки повторяются адаптером с экспоненциальной паузой.
+    POST повторяется только при ошибке соединения, чтобы не отправить
+    сообщение дважды. GET внутри бюджета цикла опроса адаптер не
+    повторяет: попытки и паузы между ними укладываются в остаток
+    бюджета здесь же, иначе каждая получила бы его целиком.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, retries=RETRIES,
+                 backoff_factor=BACKOFF_FACTOR):
+        # requests и urllib3 - самый тяжёлый импорт бота: грузим их при
+        # создании клиента, а не при импорте модуля
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._transient = (requests.ConnectionError, requests.Timeout)
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({'GET'}),
+            raise_on_status=False,
+        )
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+        self._once = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size,
+            max_retries=0,
+        )
+        self._budgeted = requests.Session()
+        self._budgeted.headers['Accept-Encoding'] = 'gzip, deflate'
+        self._budgeted.mount('https://', self._once)
+        self._budgeted.mount('http://', self._once)
+        self._lock = threading.Lock()
+        self._requests = 0
+
+    def request(self, method, url, **kwargs):
+        if method == 'GET' and deadline.remaining() is not None:
+            return self._get_within_deadline(url, kwargs)
+        kwargs.setdefault('timeout', self.timeout)
+        with self._lock:
+            self._requests += 1
+        return self.session.request(method, url, **kwargs)
+
+    def _get_within_deadline(self, url, kwargs):
+        """GET с повторами, которые вместе уложены в бюджет цикла."""
+        timeout = kwargs.pop('timeout', self.timeout)
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        for attempt in range(self.retries + 1):
+            with self._lock:
+                self._requests += 1
+            try:
+                response = self._budgeted.get(
+                    url, timeout=deadline.bounded_timeout(*timeout),
+                    **kwargs
+                )
+            except self._transient as error:
+                if attempt == self.retries:
+                    raise
+                failure = error
+            else:
+                if (response.status_code not in RETRY_STATUSES
+                        or attempt == self.retries):
+                    return response
+                response.close()
+                failure = None
+            pause = self.backoff_factor * 2 ** attempt
+            if deadline.remaining() <= pause:
+                raise DeadlineExceeded(
+                    'Poll deadline exceeded at request'
+                ) from failure
+            time.sleep(pause)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """Счётчики запросов и новых соединений по всем пулам."""
+        connections = 0
+        for adapter in (self._adapter, self._once):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+        return {
+            'requests': self._requests,
+            'connections': connections,
+            'reused': max(self._requests - connections, 0),
+        }
+
+    def close(self):
+        self.session.close()
+        self._budgeted.close()
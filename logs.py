@@ -0,0 +1,142 @@
+import contextvars
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import (QueueHandler, QueueListener,
+                              TimedRotatingFileHandler)
+
+LOG_FILE = 'program.log'
+MAX_BYTES = 10 * 1024 * 1024
+ROTATE_WHEN = 'midnight'
+BACKUP_COUNT = 7
+DEBUG_SAMPLE = 10
+QUEUE_SIZE = 10000
+
+# Студент, которого сейчас опрашивает поток; движок ставит его перед
+# каждым опросом, фильтр добавляет в запись лога
+TENANT = contextvars.ContextVar('tenant', default=None)
+
+_STANDARD = frozenset(vars(logging.makeLogRecord({}))) | {'message'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой json со всеми полями из `extra`."""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        if not hasattr(record, 'tenant'):
+            tenant = TENANT.get()
+            if tenant is not None:
+                record.tenant = tenant
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает каждую `every`-ю DEBUG-запись одного шаблона."""
+
+    def __init__(self, every=DEBUG_SAMPLE):
+        super().__init__()
+        self.every = every
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.every <= 1:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._seen.get(key, 0)
+            self._seen[key] = count + 1
+        return count % self.every == 0
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Кладёт запись в очередь и никогда не ждёт: при переполнении
+    запись отбрасывается и считается в `dropped`.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RotatingFileHandler(TimedRotatingFileHandler):
+    """Ротация и по времени (`when`), и по размеру (`max_bytes`)."""
+
+    def __init__(self, filename, max_bytes=MAX_BYTES, when=ROTATE_WHEN,
+                 backup_count=BACKUP_COUNT):
+        super().__init__(
+            filename, when=when, backupCount=backup_count, encoding='utf-8'
+        )
+        self.max_bytes = max_bytes
+
+    def rotation_filename(self, default_name):
+        # По размеру можно ротироваться несколько раз за период: не
+        # затираем прошлый архив с тем же суффиксом времени
+        name = super().rotation_filename(default_name)
+        candidate, index = name, 0
+        while os.path.exists(candidate):
+            index += 1
+            candidate = f'{name}.{index}'
+        return candidate
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes and self.stream is not None:
+            message = self.format(record) + self.terminator
+            position = self.stream.tell()
+            return position + len(message.encode()) > self.max_bytes
+        return False
+
+
+def setup_logging(filename=LOG_FILE, level=logging.DEBUG,
+                  max_bytes=MAX_BYTES, when=ROTATE_WHEN,
+                  backup_count=BACKUP_COUNT, debug_sample=DEBUG_SAMPLE,
+                  queue_size=QUEUE_SIZE):
+    """Настраивает корневой логгер на запись через фоновый поток.
+
+    Возвращает запущенный QueueListener; `listener.stop()` дописывает
+    очередь на диск.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    os.makedirs(directory, exist_ok=True)
+    file_handler = RotatingFileHandler(
+        filename, max_bytes, when, backup_count
+    )
+    file_handler.setFormatter(JsonFormatter())
+    log_queue = queue.Queue(queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(debug_sample))
+    queue_handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+    return listener
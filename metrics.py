@@ -0,0 +1,250 @@
+import logging
+import threading
+import time
+from functools import wraps
+
+BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in pairs
+    )
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    """Метрика; с `callback` значения считаются в момент сбора.
+
+    `callback` возвращает число или, для метрики с метками, словарь
+    `кортеж значений меток -> число`.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        if self.callback is not None:
+            values = self.callback()
+            if not isinstance(values, dict):
+                values = {(): values}
+            return [
+                (self.name, key, (), value) for key, value in values.items()
+            ]
+        with self._lock:
+            return [
+                (self.name, key, (), value)
+                for key, value in self._values.items()
+            ]
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        for name, key, extra, value in self.samples():
+            labels = _format_labels(self.labelnames, key, extra)
+            lines.append(f'{name}{labels} {_format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = [
+                (key, list(counts), total, count)
+                for key, (counts, total, count) in self._values.items()
+            ]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((
+                    f'{self.name}_bucket', key,
+                    (('le', _format_value(bound)),), cumulative
+                ))
+            samples.append((f'{self.name}_sum', key, (), total))
+            samples.append((f'{self.name}_count', key, (), count))
+        return samples
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def unregister(self, name):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as error:
+                logging.error(f'Failed to collect {metric.name}: {error}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def _register(metric):
+    if metric.callback is not None:
+        # Колбэк ссылается на живой объект - подменяем прежний
+        REGISTRY.unregister(metric.name)
+    return REGISTRY.register(metric)
+
+
+def counter(name, documentation, labelnames=(), callback=None):
+    return _register(Counter(name, documentation, labelnames, callback))
+
+
+def gauge(name, documentation, labelnames=(), callback=None):
+    return _register(Gauge(name, documentation, labelnames, callback))
+
+
+def histogram(name, documentation, labelnames=(), buckets=BUCKETS):
+    return REGISTRY.register(
+        Histogram(name, documentation, labelnames, buckets)
+    )
+
+
+STAGE_SECONDS = histogram(
+    'homework_stage_seconds', 'Latency of pipeline stages', ('stage',)
+)
+STAGE_ERRORS = counter(
+    'homework_stage_errors_total', 'Pipeline stage errors by exception',
+    ('stage', 'exception')
+)
+
+
+def timed(stage):
+    """Декоратор: гистограмма времени шага и счётчик его ошибок."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                STAGE_ERRORS.inc(stage=stage, exception=type(error).__name__)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                STAGE_SECONDS.observe(elapsed, stage=stage)
+                logging.debug(
+                    '%s finished', stage,
+                    extra={'stage': stage, 'elapsed_ms': elapsed * 1000}
+                )
+        return wrapper
+    return decorator
+
+
+def _handler(registry):
+    # http.server нужен только с METRICS_PORT: не грузим его на старте
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return MetricsHandler
+
+
+def serve_metrics(port, host='127.0.0.1', registry=REGISTRY):
+    """Поднимает /metrics в фоновом потоке и возвращает сервер."""
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer((host, port), _handler(registry))
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    ).start()
+    logging.info(f'Serving metrics on http://{host}:{port}/metrics')
+    return server
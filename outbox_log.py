@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+COMMIT_INTERVAL = 0.05
+COMPACT_AFTER = 10000
+KEEP_ACKED = 100000
+
+
+class OutboxLog:
+    """Журнал неотправленных сообщений, переживающий падения.
+
+    Каждое сообщение пишется строкой `put` до постановки в очередь и
+    строкой `ack` после отправки. Записи копятся и сбрасываются одним
+    fsync раз в `commit_interval` (group commit): `put` возвращается,
+    только когда его группа на диске. При старте `open` отдаёт всё без
+    `ack`; ключи отправленных помнятся, поэтому повтор того же перехода
+    после перезапуска не уходит второй раз. Когда набирается
+    `compact_after` подтверждений, журнал переписывается заново.
+    """
+
+    def __init__(self, path, commit_interval=COMMIT_INTERVAL,
+                 compact_after=COMPACT_AFTER, keep_acked=KEEP_ACKED):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.compact_after = compact_after
+        self.keep_acked = keep_acked
+        self._pending = OrderedDict()
+        self._acked = OrderedDict()
+        self._buffer = []
+        self._seq = 0
+        self._durable = 0
+        self._acks_since_compact = 0
+        self._cond = threading.Condition()
+        self._file = None
+        self._thread = None
+        self._closed = False
+        self.fsyncs = 0
+        self.records = 0
+
+    def _remember_ack(self, key):
+        self._pending.pop(key, None)
+        self._acked[key] = None
+        self._acked.move_to_end(key)
+        if len(self._acked) > self.keep_acked:
+            self._acked.popitem(last=False)
+
+    def _replay(self):
+        try:
+            file = open(self.path, encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Недописанная строка от падения посреди записи
+                    logging.warning(f'Skipping broken outbox record: {line!r}')
+                    continue
+                if record['op'] == 'put':
+                    if record['key'] not in self._acked:
+                        self._pending[record['key']] = (
+                            record['chat_id'], record['text']
+                        )
+                else:
+                    self._remember_ack(record['key'])
+
+    def open(self):
+        """Читает журнал и возвращает неотправленные сообщения."""
+        self._replay()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._thread = threading.Thread(
+            target=self._run, name='outbox-log', daemon=True
+        )
+        self._thread.start()
+        return [
+            (key, chat_id, text)
+            for key, (chat_id, text) in self._pending.items()
+        ]
+
+    def seen(self, key):
+        with self._cond:
+            return key in self._pending or key in self._acked
+
+    def _append(self, record):
+        self._buffer.append(
+            json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+            + '\n'
+        )
+        self._seq += 1
+        self._cond.notify_all()
+        return self._seq
+
+    def put(self, key, chat_id, text):
+        """Пишет сообщение и ждёт fsync; False, если ключ уже был."""
+        with self._cond:
+            if key in self._pending or key in self._acked:
+                return False
+            self._pending[key] = (chat_id, text)
+            seq = self._append(
+                {'op': 'put', 'key': key, 'chat_id': chat_id, 'text': text}
+            )
+            while self._durable < seq and not self._closed:
+                self._cond.wait()
+        return True
+
+    def ack(self, keys):
+        """Отмечает сообщения отправленными, не дожидаясь fsync."""
+        with self._cond:
+            for key in keys:
+                self._remember_ack(key)
+                self._append({'op': 'ack', 'key': key})
+            self._acks_since_compact += len(keys)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._buffer:
+                    return
+            # Даём набраться группе записей под один fsync
+            time.sleep(self.commit_interval)
+            with self._cond:
+                buffer, self._buffer = self._buffer, []
+                seq = self._seq
+                compact = self._acks_since_compact >= self.compact_after
+            self._file.write(''.join(buffer))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if compact:
+                self._compact()
+            with self._cond:
+                self.fsyncs += 1
+                self.records += len(buffer)
+                self._durable = seq
+                self._cond.notify_all()
+
+    def _compact(self):
+        with self._cond:
+            lines = [
+                json.dumps({'op': 'ack', 'key': key}) + '\n'
+                for key in self._acked
+            ]
+            lines.extend(
+                json.dumps(
+                    {'op': 'put', 'key': key, 'chat_id': chat_id,
+                     'text': text},
+                    ensure_ascii=False
+                ) + '\n'
+                for key, (chat_id, text) in self._pending.items()
+            )
+            self._acks_since_compact = 0
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.writelines(lines)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+        self._file.close()
+        self._file = open(self.path, 'a', encoding='utf-8')
+        logging.info(f'Outbox log compacted to {len(lines)} records')
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if self._file is not None:
+            self._file.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pending': len(self._pending),
+                'fsyncs': self.fsyncs,
+                'records': self.records,
+            }
+
+
+class DurableOutbox:
+    """Ставит сообщение в доставку только после записи в журнал."""
+
+    def __init__(self, log, delivery):
+        self.log = log
+        self.delivery = delivery
+        delivery.on_delivered = log.ack
+
+    def replay(self):
+        """Возвращает в доставку всё, что не ушло до перезапуска."""
+        pending = self.log.open()
+        # Отправители ещё не запущены: ждать места в outbox некому
+        for key, chat_id, text in pending:
+            self.delivery.send_message(chat_id, text, key, block=False)
+        if pending:
+            logging.info(f'Replaying {len(pending)} pending messages')
+
+    def send_message(self, chat_id, text, key=None):
+        if key is None:
+            self.delivery.send_message(chat_id, text)
+        elif self.log.put(key, chat_id, text):
+            self.delivery.send_message(chat_id, text, key)
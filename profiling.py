@@ -0,0 +1,240 @@
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+CPROFILE = 'cprofile'
+SAMPLE = 'sample'
+MODES = (CPROFILE, SAMPLE)
+POLLS = 100
+KEEP = 20
+SAMPLE_INTERVAL = 0.005
+MALLOC_TOP = 30
+STATS_TOP = 40
+
+
+class Session:
+    """Один сеанс профилирования: `polls` опросов и отчёт по ним."""
+
+    def __init__(self, mode, polls, tenant, trace_malloc, interval):
+        self.mode = mode
+        self.polls = polls
+        self.tenant = tenant
+        self.done = 0
+        self.started = time.time()
+        self.stats = None
+        self.samples = Counter()
+        self.target = None
+        self._interval = interval
+        self._sampler = None
+        self._stopped = threading.Event()
+        self._malloc = None
+        self._own_malloc = False
+        if trace_malloc:
+            import tracemalloc
+            self._own_malloc = not tracemalloc.is_tracing()
+            if self._own_malloc:
+                tracemalloc.start(25)
+            self._malloc = tracemalloc.take_snapshot()
+        if mode == SAMPLE:
+            self._sampler = threading.Thread(
+                target=self._sample, name='profiler', daemon=True
+            )
+            self._sampler.start()
+
+    def _sample(self):
+        # Стек раз в `interval` и только у потока с профилируемым опросом
+        while not self._stopped.wait(self._interval):
+            target = self.target
+            frame = sys._current_frames().get(target) if target else None
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f'{code.co_name} ({os.path.basename(code.co_filename)}'
+                    f':{code.co_firstlineno})'
+                )
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def run(self, poll, tenant):
+        if self.mode == SAMPLE:
+            self.target = threading.get_ident()
+            try:
+                return poll(tenant)
+            finally:
+                self.target = None
+        import cProfile
+        import pstats
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(poll, tenant)
+        finally:
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+
+    def finish(self, prefix):
+        """Пишет отчёты с именами `prefix.*`; возвращает их пути."""
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        paths = []
+        header = (
+            f'# {self.done} polls in {time.time() - self.started:.1f}s, '
+            f'tenant: {self.tenant or "any"}\n'
+        )
+        if self.stats is not None:
+            import io
+            self.stats.dump_stats(f'{prefix}.prof')
+            paths.append(f'{prefix}.prof')
+            report = io.StringIO()
+            self.stats.stream = report
+            self.stats.sort_stats('cumulative').print_stats(STATS_TOP)
+            paths.append(self._write(f'{prefix}.txt',
+                                     header + report.getvalue()))
+        if self.mode == SAMPLE:
+            # Формат flamegraph.pl и speedscope: "стек;стек число"
+            paths.append(self._write(f'{prefix}.folded', header + ''.join(
+                f'{stack} {count}\n'
+                for stack, count in self.samples.most_common()
+            )))
+        if self._malloc is not None:
+            import tracemalloc
+            top = tracemalloc.take_snapshot().compare_to(
+                self._malloc, 'lineno'
+            )[:MALLOC_TOP]
+            if self._own_malloc:
+                tracemalloc.stop()
+            paths.append(self._write(f'{prefix}.malloc.txt', header + ''.join(
+                f'{line}\n' for line in top
+            )))
+        return paths
+
+    @staticmethod
+    def _write(path, text):
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return path
+
+
+class Profiler:
+    """Профилирование опросов по запросу, без перезапуска бота.
+
+    `wrap` оборачивает функцию опроса. Пока профилировщик не взведён,
+    обёртка только читает один атрибут и зовёт опрос напрямую. `arm`
+    (или сигнал после `install_signal`) запускает сеанс: следующие
+    `polls` опросов - всех студентов или только `tenant` - идут под
+    cProfile или под сэмплером стеков, по одному за раз, остальные
+    опросы не трогаются. По желанию снимаются снимки tracemalloc до и
+    после. Отчёты пишутся в `directory`, хранятся последние `keep`
+    сеансов.
+    """
+
+    def __init__(self, directory, mode=CPROFILE, polls=POLLS, tenant=None,
+                 trace_malloc=False, keep=KEEP, interval=SAMPLE_INTERVAL):
+        if mode not in MODES:
+            raise ValueError(f'Unknown profiling mode: {mode}')
+        self.directory = directory
+        self.mode = mode
+        self.polls = polls
+        self.tenant = tenant
+        self.trace_malloc = trace_malloc
+        self.keep = keep
+        self.interval = interval
+        self.active = False
+        self.sessions = 0
+        self.reports = []
+        self._session = None
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()
+
+    def arm(self, *signal_args):
+        """Взводит сеанс; безопасно звать из обработчика сигнала."""
+        self.active = True
+
+    def install_signal(self, signum=getattr(signal, 'SIGUSR2', None)):
+        """`kill -USR2 <pid>` запускает сеанс профилирования."""
+        if signum is not None:
+            signal.signal(signum, self.arm)
+
+    def wrap(self, poll):
+        def profiled(tenant):
+            if not self.active:
+                return poll(tenant)
+            return self._profile(poll, tenant)
+        return profiled
+
+    def _profile(self, poll, tenant):
+        if self.tenant is not None and tenant.key != self.tenant:
+            return poll(tenant)
+        # Под профилировщиком один опрос за раз, остальные как обычно
+        if not self._busy.acquire(blocking=False):
+            return poll(tenant)
+        try:
+            session = self._start()
+            if session is None:
+                return poll(tenant)
+            return session.run(poll, tenant)
+        finally:
+            self._busy.release()
+            self._count()
+
+    def _start(self):
+        with self._lock:
+            if self._session is None and self.active:
+                logging.info(
+                    f'Profiling {self.polls} polls with {self.mode}'
+                )
+                self._session = Session(
+                    self.mode, self.polls, self.tenant, self.trace_malloc,
+                    self.interval
+                )
+            return self._session
+
+    def _count(self):
+        with self._lock:
+            session = self._session
+            if session is None:
+                return
+            session.done += 1
+            if session.done < session.polls:
+                return
+            self._session = None
+            self.active = False
+        self._finish(session)
+
+    def _finish(self, session):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime())
+        prefix = os.path.join(
+            self.directory,
+            f'{stamp}-{os.getpid()}-{self.sessions + 1}-{session.mode}'
+        )
+        try:
+            paths = session.finish(prefix)
+        except OSError as error:
+            logging.error(f'Failed to write profile: {error}')
+            return
+        self.sessions += 1
+        self.reports = paths
+        logging.info(f'Profile written: {", ".join(paths)}')
+        self._rotate()
+
+    def _rotate(self):
+        """Удаляет отчёты всех сеансов, кроме последних `keep`."""
+        sessions = {}
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            sessions.setdefault(name.split('.', 1)[0], []).append(path)
+        for stem in sorted(sessions)[:-self.keep or None]:
+            for path in sessions[stem]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,463 @@
+"""Запись ответов апи Практикума и их прогон на виртуальных часах.
+
+Бот с `RECORD_FILE=record.jsonl.gz` пишет в файл каждый ответ апи.
+Прогон отдаёт записанные ответы через `poll_tenant` - с проверкой
+ответа, разбором статусов и отправкой - под `Scheduler` на
+виртуальных часах, так что недели опроса проходят за секунды:
+
+    python replay.py record.jsonl.gz
+    python replay.py record.jsonl.gz --reviewing-interval 120 --json
+    python replay.py record.jsonl.shard*.gz
+
+Апи в прогоне отвечает тем, что было записано последним к текущему
+виртуальному моменту. Уведомления сверяются с переходами, которые
+видны в записи: сколько пропущено, сколько лишних и с какой
+задержкой пришли остальные.
+"""
+import argparse
+import bisect
+import gzip
+import hashlib
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import zlib
+from functools import partial
+from http import HTTPStatus
+
+from diff import homework_key
+from engine import Tenant, tenant_key
+
+# Шаг виртуальных часов, меньше которого ожидание не дробится
+MIN_STEP = 0.001
+# Записи копятся и уходят на диск отдельным членом gzip
+FLUSH_INTERVAL = 5.0
+FLUSH_LINES = 1000
+
+
+def _token(headers):
+    return (headers or {}).get('Authorization', '').split(' ', 1)[-1]
+
+
+class Recorder:
+    """Пишет ответы апи в сжатый файл jsonl.
+
+    Строка - `[время, студент, код ответа, тело]`. Тело пишется, только
+    если отличается от прошлого ответа того же студента, иначе null; у
+    сетевой ошибки код null, а вместо тела - тип ошибки. Студент
+    записывается ключом, токен в файл не попадает; от прошлого тела
+    в памяти держится только хеш.
+
+    Строки копятся и раз в `flush_interval` секунд или по `flush_lines`
+    дописываются в файл законченным членом gzip: при падении или
+    SIGTERM теряется только последняя пачка, а `Recording.load`
+    пропускает недописанный хвост. Файл дописывается, так что запись
+    переживает перезапуски бота.
+    """
+
+    def __init__(self, path, clock=time.time, flush_interval=FLUSH_INTERVAL,
+                 flush_lines=FLUSH_LINES):
+        self.path = path
+        self.clock = clock
+        self.flush_interval = flush_interval
+        self.flush_lines = flush_lines
+        self.records = 0
+        self._last = {}
+        self._buffer = []
+        self._flushed = time.monotonic()
+        self._file = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        self._file = open(self.path, 'ab')
+        return self
+
+    def record(self, key, status, body=b'', error=None):
+        with self._lock:
+            if status is None:
+                payload = error
+            elif status == HTTPStatus.NOT_MODIFIED:
+                payload = None
+            else:
+                digest = hashlib.blake2b(body, digest_size=16).digest()
+                if digest == self._last.get(key):
+                    payload = None
+                else:
+                    self._last[key] = digest
+                    try:
+                        payload = json.loads(body)
+                    except ValueError:
+                        payload = body.decode('utf-8', 'replace')
+            self._buffer.append(json.dumps(
+                [round(self.clock(), 3), key, status, payload],
+                ensure_ascii=False, separators=(',', ':')
+            ) + '\n')
+            self.records += 1
+            if (len(self._buffer) >= self.flush_lines
+                    or time.monotonic() - self._flushed
+                    >= self.flush_interval):
+                self._flush()
+
+    def _flush(self):
+        if self._buffer and self._file is not None:
+            self._file.write(gzip.compress(''.join(self._buffer).encode()))
+            self._file.flush()
+        self._buffer = []
+        self._flushed = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def wrap(self, http):
+        """`http` с записью каждого ответа."""
+        return RecordingHttp(http, self)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._flush()
+                self._file.close()
+                self._file = None
+
+
+class RecordingHttp:
+
+    def __init__(self, http, recorder):
+        self.http = http
+        self.recorder = recorder
+
+    def get(self, url, headers=None, **kwargs):
+        key = tenant_key(_token(headers))
+        try:
+            response = self.http.get(url, headers=headers, **kwargs)
+        except Exception as error:
+            self.recorder.record(key, None, error=type(error).__name__)
+            raise
+        # С stream=True тело читается здесь целиком: только при записи
+        self.recorder.record(key, response.status_code, response.content)
+        return response
+
+
+class Recording:
+    """Записанные ответы: по каждому студенту моменты и ответы апи.
+
+    Ответ - `(код, тело)`; код None - сетевая ошибка, тогда вместо
+    тела её тип. 304 превращается в 200 с прошлым телом.
+    """
+
+    def __init__(self):
+        self.timelines = {}
+
+    @classmethod
+    def load(cls, *paths):
+        """Запись из одного или нескольких файлов (по файлу на шард)."""
+        recording = cls()
+        entries = {}
+        for path in paths:
+            cls._load_file(path, entries)
+        for key, timeline in entries.items():
+            timeline.sort(key=lambda entry: entry[0])
+            recording.timelines[key] = (
+                [at for at, _ in timeline], [state for _, state in timeline]
+            )
+        return recording
+
+    @staticmethod
+    def _load_file(path, entries):
+        # Прошлое тело помнит только процесс, писавший этот файл
+        last = {}
+        for line in _read_lines(path):
+            try:
+                at, key, status, payload = json.loads(line)
+            except ValueError:
+                continue
+            if status is None:
+                state = (None, payload)
+            else:
+                if status == HTTPStatus.NOT_MODIFIED:
+                    status = HTTPStatus.OK
+                elif payload is not None:
+                    if not isinstance(payload, str):
+                        payload = json.dumps(payload, ensure_ascii=False)
+                    last[key] = payload.encode()
+                state = (status, last.get(key, b''))
+            entries.setdefault(key, []).append((at, state))
+
+    def __len__(self):
+        return sum(len(times) for times, _ in self.timelines.values())
+
+    @property
+    def start(self):
+        return min(times[0] for times, _ in self.timelines.values())
+
+    @property
+    def end(self):
+        return max(times[-1] for times, _ in self.timelines.values())
+
+    def state_at(self, key, at):
+        """Ответ апи студенту на момент `at`; до записи - первый."""
+        times, states = self.timelines[key]
+        return states[max(bisect.bisect_right(times, at) - 1, 0)]
+
+    def transitions(self, check):
+        """Переходы, видимые в записи: `(момент, студент, работа, статус)`.
+
+        Считаются так же, как их видит бот: первый статус работы тоже
+        переход, записи, не прошедшие `check`, пропускаются.
+        """
+        result = []
+        for key, (times, states) in self.timelines.items():
+            seen = {}
+            previous = None
+            for at, (status, body) in zip(times, states):
+                if status != HTTPStatus.OK or body is previous:
+                    continue
+                previous = body
+                try:
+                    homeworks = json.loads(body).get('homeworks') or []
+                except (ValueError, AttributeError):
+                    continue
+                for homework in homeworks:
+                    if check(homework) is not None:
+                        continue
+                    work = homework_key(homework)
+                    if seen.get(work) != homework['status']:
+                        seen[work] = homework['status']
+                        result.append((at, key, work, homework['status']))
+        result.sort(key=lambda entry: entry[0])
+        return result
+
+
+def _read_lines(path):
+    """Строки файла записи; недописанный последний член gzip - конец."""
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        try:
+            yield from file
+        except (EOFError, gzip.BadGzipFile, zlib.error) as error:
+            logging.warning(f'Recording {path} is truncated: {error}')
+
+
+class ReplayResponse:
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {'Content-Length': str(len(content))}
+        self.encoding = 'utf-8'
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReplayHttp:
+    """Апи Практикума из записи: токен студента в прогоне - его ключ."""
+
+    def __init__(self, recording, clock):
+        self.recording = recording
+        self.clock = clock
+        self.requests = 0
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests += 1
+        status, body = self.recording.state_at(_token(headers), self.clock())
+        if status is None:
+            raise ConnectionError(f'Recorded {body}')
+        return ReplayResponse(status, body)
+
+
+class VirtualClock:
+    """Часы прогона: время идёт только через `sleep`."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0)
+
+
+class Notifications:
+    """Что отправил бот в прогоне, по виртуальным часам.
+
+    Годится и как бот (`send_message`), и как `history` для
+    `poll_tenant`: так видно, о каком переходе было сообщение.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.messages = []
+        self.transitions = []
+
+    def send_message(self, chat_id, text, key=None):
+        self.messages.append((self.clock(), chat_id, text))
+
+    def record(self, tenant, homework, seen_at=None):
+        self.transitions.append((
+            self.clock(), tenant, homework_key(homework),
+            homework.get('status')
+        ))
+
+
+def simulate(tenants, poll, scheduler, clock, until):
+    """Цикл опроса `PollingEngine.run` на виртуальных часах до `until`.
+
+    Опросы идут по одному: в виртуальном времени они мгновенны.
+    Возвращает число опросов и ошибок.
+    """
+    polls = errors = 0
+    for tenant in tenants:
+        scheduler.add(tenant)
+    while clock() < until:
+        tenant, wait = scheduler.next_due()
+        if tenant is None:
+            # Иначе пауза в доли ulp от бюджета запросов не двигает часы
+            clock.sleep(max(min(wait, until - clock()), MIN_STEP))
+            continue
+        polls += 1
+        try:
+            changed, failed = bool(poll(tenant)), False
+        except Exception as error:
+            logging.debug(f'Replayed poll failed: {error}')
+            changed, failed = False, True
+            errors += 1
+        scheduler.reschedule(tenant, changed, failed)
+    return polls, errors
+
+
+def compare(expected, notified, keys):
+    """Сверяет уведомления прогона с переходами из записи.
+
+    `keys` переводит ключ студента в прогоне в ключ из записи. Каждому
+    переходу записи ищется первое уведомление о нём не раньше его
+    появления.
+    """
+    pending = {}
+    for at, tenant, work, status in notified:
+        pending.setdefault((keys[tenant], work, status), []).append(at)
+    delays = []
+    missed = 0
+    for at, tenant, work, status in expected:
+        times = pending.get((tenant, work, status))
+        if not times:
+            missed += 1
+            continue
+        delays.append(max(times.pop(0) - at, 0.0))
+    delays.sort()
+    extra = sum(len(times) for times in pending.values())
+
+    def percentile(q):
+        return delays[int((len(delays) - 1) * q)] if delays else None
+
+    return {
+        'expected': len(expected),
+        'notified': len(notified),
+        'missed': missed,
+        'extra': extra,
+        'delay_p50': percentile(0.5),
+        'delay_p95': percentile(0.95),
+        'delay_max': delays[-1] if delays else None,
+    }
+
+
+def replay(recording, check, poll_tenant, scheduler_factory,
+           until=None):
+    """Прогоняет запись через `poll_tenant` и сверяет уведомления.
+
+    `poll_tenant(bot, tenant, http=..., history=...)` - функция опроса
+    бота, `check` - его проверка записи о работе,
+    `scheduler_factory(clock, rng)` строит проверяемый планировщик.
+    """
+    clock = VirtualClock(recording.start)
+    notifications = Notifications(clock)
+    http = ReplayHttp(recording, clock)
+    tenants = [Tenant(key, key) for key in recording.timelines]
+    keys = {tenant.key: tenant.practicum_token for tenant in tenants}
+    scheduler = scheduler_factory(clock, random.Random(0).random)
+    poll = partial(poll_tenant, notifications, http=http,
+                   history=notifications)
+    if until is None:
+        until = recording.end + scheduler.max_interval
+    started = time.perf_counter()
+    polls, errors = simulate(tenants, poll, scheduler, clock, until)
+    wall = time.perf_counter() - started
+    result = compare(
+        recording.transitions(check), notifications.transitions, keys
+    )
+    result.update(
+        tenants=len(tenants), responses=len(recording), polls=polls,
+        errors=errors, requests=http.requests,
+        virtual_seconds=round(clock() - recording.start, 3),
+        wall_seconds=round(wall, 3),
+    )
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recordings', nargs='+',
+                        help='файл RECORD_FILE или файлы всех шардов')
+    parser.add_argument('--base-interval', type=float, default=600)
+    parser.add_argument('--reviewing-interval', type=float, default=60)
+    parser.add_argument('--max-interval', type=float, default=3600)
+    parser.add_argument('--requests-per-minute', type=float, default=600)
+    parser.add_argument('--json', action='store_true',
+                        help='вывести результат в json')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    import homework
+    from scheduler import Scheduler
+
+    def scheduler_factory(clock, rng):
+        return Scheduler(
+            args.base_interval, args.reviewing_interval, args.max_interval,
+            requests_per_minute=args.requests_per_minute, clock=clock,
+            rng=rng
+        )
+
+    result = replay(
+        Recording.load(*args.recordings), homework.VALIDATOR.check,
+        homework.poll_tenant, scheduler_factory
+    )
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+        return
+    speedup = result['virtual_seconds'] / max(result['wall_seconds'], 1e-9)
+    print(f'{result["responses"]} recorded responses, '
+          f'{result["tenants"]} tenants')
+    print(f'replayed {result["virtual_seconds"] / 86400:.1f} days in '
+          f'{result["wall_seconds"]:.2f}s ({speedup:,.0f}x)')
+    print(f'polls: {result["polls"]}, errors: {result["errors"]}')
+    print(f'transitions: {result["expected"]}, '
+          f'notified: {result["notified"]}, missed: {result["missed"]}, '
+          f'extra: {result["extra"]}')
+    if result['delay_p50'] is not None:
+        print(f'notification delay: p50 {result["delay_p50"]:.0f}s, '
+              f'p95 {result["delay_p95"]:.0f}s, '
+              f'max {result["delay_max"]:.0f}s')
+
+
+if __name__ == '__main__':
+    main()
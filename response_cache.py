@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+
+MAX_ENTRIES = 100000
+
+# Апи кладёт в каждый ответ текущее время: при сравнении тел его нет
+_CURRENT_DATE = re.compile(rb'"current_date"\s*:\s*(-?\d+)')
+
+
+def _current_date(body):
+    # Ключ верхнего уровня - последний в теле; rfind быстрее regex по
+    # всему телу
+    at = body.rfind(b'"current_date"')
+    return None if at < 0 else _CURRENT_DATE.match(body, at)
+
+
+def body_digest(body):
+    """Хеш тела без значения current_date."""
+    found = _current_date(body)
+    digest = hashlib.blake2b(digest_size=16)
+    if found is None:
+        digest.update(body)
+    else:
+        digest.update(memoryview(body)[:found.start(1)])
+        digest.update(memoryview(body)[found.end(1):])
+    return digest.hexdigest()
+
+
+def current_date(body, default=None):
+    """current_date из тела без разбора json."""
+    found = _current_date(body)
+    return default if found is None else int(found.group(1))
+
+
+class CacheEntry:
+    __slots__ = ('etag', 'last_modified', 'digest', 'size')
+
+    def __init__(self, etag=None, last_modified=None, digest=None, size=0):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.size = size
+
+
+class ResponseCache:
+    """Валидаторы последнего ответа апи по каждому студенту.
+
+    Хранит ETag, Last-Modified и хеш тела последнего обработанного
+    ответа. `conditional` даёт заголовки условного запроса, `match`
+    отвечает, изменился ли ответ: 304 или то же тело (без
+    `current_date`, он новый в каждом ответе) означают, что разбирать
+    и сравнивать нечего. Запись обновляется через `store`
+    только после успешной обработки, чтобы сбой посередине не
+    спрятал изменения. Записей не больше `max_size`, самые давние
+    вытесняются; с `path` кеш переживает перезапуск.
+    """
+
+    def __init__(self, max_size=MAX_ENTRIES, path=None):
+        self.max_size = max_size
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.bytes_saved = 0
+        self.bytes_skipped = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def conditional(self, key):
+        """Заголовки If-None-Match / If-Modified-Since для студента."""
+        entry = self._get(key)
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def match(self, key, response, body=None):
+        """None, если ответ не изменился, иначе новая запись для `store`.
+
+        Без `body` (потоковый ответ) сравниваются только валидаторы.
+        """
+        entry = self._get(key)
+        with self._lock:
+            self.lookups += 1
+            if response.status_code == HTTPStatus.NOT_MODIFIED:
+                self.not_modified += 1
+                if entry is not None:
+                    self.bytes_saved += entry.size
+                    self.bytes_skipped += entry.size
+                return None
+        digest = None if body is None else body_digest(body)
+        if (digest is not None and entry is not None
+                and entry.digest == digest):
+            with self._lock:
+                self.unchanged += 1
+                self.bytes_skipped += len(body)
+            return None
+        return CacheEntry(
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            digest, 0 if body is None else len(body)
+        )
+
+    def store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            hits = self.not_modified + self.unchanged
+            return {
+                'lookups': self.lookups,
+                'not_modified': self.not_modified,
+                'unchanged': self.unchanged,
+                'hit_ratio': hits / self.lookups if self.lookups else 0.0,
+                'bytes_saved': self.bytes_saved,
+                'bytes_skipped': self.bytes_skipped,
+                'entries': len(self._entries),
+            }
+
+    def load(self):
+        if not self.path:
+            return self
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                rows = json.load(file)
+        except FileNotFoundError:
+            return self
+        except ValueError as error:
+            logging.error(f'Cache file {self.path} is corrupted: {error}')
+            return self
+        with self._lock:
+            self._entries.clear()
+            for key, etag, last_modified, digest, size in rows:
+                self._entries[key] = CacheEntry(
+                    etag, last_modified, digest, size
+                )
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return self
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            rows = [
+                [key, e.etag, e.last_modified, e.digest, e.size]
+                for key, e in self._entries.items()
+            ]
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(rows, file, separators=(',', ':'))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
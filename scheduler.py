@@ -0,0 +1,119 @@
+import heapq
+import itertools
+import random
+import time
+
+from delivery import TokenBucket
+
+BASE_INTERVAL = 600
+REVIEWING_INTERVAL = 60
+MAX_INTERVAL = 3600
+JITTER = 0.1
+REQUESTS_PER_MINUTE = 600
+
+
+class Scheduler:
+    """Очередь студентов по времени следующего опроса.
+
+    Пока работа на ревью, студент опрашивается чаще; без изменений
+    интервал удваивается до `max_interval`, после ошибки - тоже, но от
+    интервала по состоянию студента. К каждому интервалу
+    добавляется джиттер, а общий темп запросов ограничен token bucket
+    на `requests_per_minute`.
+    """
+
+    def __init__(self, base_interval=BASE_INTERVAL,
+                 reviewing_interval=REVIEWING_INTERVAL,
+                 max_interval=MAX_INTERVAL, jitter=JITTER,
+                 requests_per_minute=REQUESTS_PER_MINUTE,
+                 clock=time.monotonic, rng=random.random):
+        self.base_interval = base_interval
+        self.reviewing_interval = reviewing_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.clock = clock
+        self.rng = rng
+        rate = requests_per_minute / 60
+        self._budget = TokenBucket(rate, max(rate, 1), clock=clock)
+        self._heap = []
+        self._seq = itertools.count()
+        self._idle = {}
+        self._failures = {}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _push(self, tenant, due):
+        heapq.heappush(self._heap, (due, next(self._seq), tenant))
+
+    def add(self, tenant):
+        """Ставит студента в очередь, размазывая первые опросы.
+
+        Окно растёт с числом студентов - столько, сколько пропускает
+        бюджет запросов, но не больше `jitter * base_interval`: первый
+        студент опрашивается сразу после старта.
+        """
+        spread = self.jitter * self.base_interval
+        if self._budget.rate:
+            spread = min(spread, len(self._heap) / self._budget.rate)
+        self._push(tenant, self.clock() + spread * self.rng())
+
+    def _state_interval(self, tenant, idle):
+        if tenant.statuses.has('reviewing'):
+            return self.reviewing_interval
+        return min(self.base_interval * 2 ** min(idle, 16), self.max_interval)
+
+    def interval(self, tenant, changed=False, failed=False):
+        """Пауза до следующего опроса по состоянию студента.
+
+        Ошибки подряд удваивают паузу от интервала, положенного студенту
+        по состоянию, и не сдвигают счётчик опросов без изменений.
+        """
+        key = tenant.key
+        if failed:
+            failures = self._failures.get(key, 0) + 1
+            self._failures[key] = failures
+            interval = min(
+                self._state_interval(tenant, self._idle.get(key, 0))
+                * 2 ** min(failures - 1, 16),
+                self.max_interval
+            )
+        else:
+            self._failures.pop(key, None)
+            if tenant.statuses.has('reviewing'):
+                self._idle[key] = 0
+                interval = self.reviewing_interval
+            elif changed:
+                self._idle[key] = 0
+                interval = self.base_interval
+            else:
+                idle = self._idle.get(key, 0) + 1
+                self._idle[key] = idle
+                interval = self._state_interval(tenant, idle)
+        return interval * (1 + self.jitter * (2 * self.rng() - 1))
+
+    def reschedule(self, tenant, changed=False, failed=False):
+        self._push(
+            tenant, self.clock() + self.interval(tenant, changed, failed)
+        )
+
+    def defer(self, tenant, delay):
+        """Откладывает опрос на `delay` секунд, не трогая счётчики студента.
+
+        Джиттер только прибавляется: раньше `delay` вызов всё равно не
+        пройдёт, а отложенные разом студенты не должны разом вернуться.
+        """
+        spread = self.jitter * max(delay, 1.0) * self.rng()
+        self._push(tenant, self.clock() + delay + spread)
+
+    def next_due(self):
+        """Следующий студент к опросу или `(None, сколько ждать)`."""
+        if not self._heap:
+            return None, self.base_interval
+        wait = self._heap[0][0] - self.clock()
+        if wait > 0:
+            return None, wait
+        wait = self._budget.try_acquire()
+        if wait > 0:
+            return None, wait
+        return heapq.heappop(self._heap)[2], 0.0
@@ -0,0 +1,278 @@
+import bisect
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+from urllib.request import urlopen
+
+import metrics
+
+REPLICAS = 128
+CHECK_INTERVAL = 1.0
+MIN_RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 60.0
+# Проработавший дольше воркер считается здоровым, пауза сбрасывается
+STABLE_AFTER = 60.0
+STOP_TIMEOUT = 10.0
+SCRAPE_TIMEOUT = 2.0
+
+_SHARD_SUFFIX = re.compile(r'\.shard\d+(?=\.[^.]*$|$)')
+
+
+def _hash(value):
+    digest = hashlib.md5(str(value).encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+class HashRing:
+    """Консистентное хеширование с виртуальными узлами.
+
+    У каждого узла `replicas` точек на кольце; ключ достаётся узлу
+    первой точки после хеша ключа. Новый узел забирает себе около
+    1/N ключей, остальные остаются на своих местах.
+    """
+
+    def __init__(self, nodes=(), replicas=REPLICAS):
+        self.replicas = replicas
+        self._ring = []
+        self._hashes = []
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(self._ring) // self.replicas if self.replicas else 0
+
+    def add(self, node):
+        for replica in range(self.replicas):
+            bisect.insort(self._ring, (_hash(f'{node}#{replica}'), node))
+        self._hashes = [point for point, _ in self._ring]
+
+    def remove(self, node):
+        self._ring = [item for item in self._ring if item[1] != node]
+        self._hashes = [point for point, _ in self._ring]
+
+    def node_for(self, key):
+        if not self._ring:
+            raise LookupError('Hash ring is empty')
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+def shard_path(path, index):
+    """cursors.json -> cursors.shard3.json."""
+    root, ext = os.path.splitext(path)
+    return f'{root}.shard{index}{ext}'
+
+
+def sibling_paths(path, count=0):
+    """Файлы остальных шардов рядом с файлом шарда `path`.
+
+    С `count` в список попадают и файлы всех `count` шардов, даже если
+    их ещё нет на диске.
+    """
+    base = _SHARD_SUFFIX.sub('', path)
+    pattern = glob.escape(_SHARD_SUFFIX.sub('.shard', path))
+    root, ext = os.path.splitext(pattern)
+    found = {
+        candidate for candidate in glob.glob(f'{root}*{ext}')
+        if _SHARD_SUFFIX.search(candidate)
+    }
+    found.update(shard_path(base, index) for index in range(count))
+    found.discard(path)
+    return sorted(found)
+
+
+def _with_label(line, name, value):
+    if '{' in line.split(' ', 1)[0]:
+        index = line.index('{') + 1
+        return f'{line[:index]}{name}="{value}",{line[index:]}'
+    metric, _, sample = line.partition(' ')
+    return f'{metric}{{{name}="{value}"}} {sample}'
+
+
+def merge_metrics(texts):
+    """Склеивает /metrics воркеров, помечая каждую точку меткой `shard`.
+
+    `texts` - пары `(шард, текст)`; сэмплы одной метрики из разных
+    воркеров идут подряд под одним HELP/TYPE, как требует формат.
+    """
+    families = {}
+    for shard, text in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith(('# HELP ', '# TYPE ')):
+                _, kind, name = line.split(' ', 3)[:3]
+                family = families.setdefault(name, ({}, []))
+                family[0].setdefault(kind, line)
+            elif line and family is not None:
+                family[1].append(_with_label(line, 'shard', shard))
+    lines = []
+    for meta, samples in families.values():
+        lines.extend(meta[kind] for kind in ('HELP', 'TYPE') if kind in meta)
+        lines.extend(samples)
+    return '\n'.join(lines) + '\n'
+
+
+class AggregatedRegistry:
+    """Реестр для /metrics супервизора: метрики всех воркеров и свои."""
+
+    def __init__(self, urls, registry=metrics.REGISTRY,
+                 timeout=SCRAPE_TIMEOUT):
+        self.urls = urls
+        self.registry = registry
+        self.timeout = timeout
+
+    def render(self):
+        texts = []
+        for shard, url in enumerate(self.urls):
+            try:
+                with urlopen(url, timeout=self.timeout) as response:
+                    texts.append((shard, response.read().decode()))
+            except Exception as error:
+                logging.warning(f'Failed to scrape shard {shard}: {error}')
+        return merge_metrics(texts) + self.registry.render()
+
+
+class Worker:
+    __slots__ = ('index', 'env', 'process', 'started', 'delay', 'restart_at')
+
+    def __init__(self, index, env):
+        self.index = index
+        self.env = env
+        self.process = None
+        self.started = 0.0
+        self.delay = MIN_RESTART_DELAY
+        self.restart_at = 0.0
+
+
+class Supervisor:
+    """Запускает воркеры-шарды отдельными процессами и следит за ними.
+
+    Упавший воркер перезапускается с паузой, которая растёт, пока он
+    падает сразу после старта. Входящие команды тг супервизор получает
+    сам (getUpdates допускает одного читателя) и передаёт построчно
+    в stdin воркеров, которым `route` отдаёт чат.
+    """
+
+    def __init__(self, command, envs, route=None, clock=time.monotonic):
+        self.command = command
+        self.workers = [Worker(index, env) for index, env in enumerate(envs)]
+        self.route = route
+        self.clock = clock
+        self.restarts = metrics.counter(
+            'homework_worker_restarts_total', 'Worker process restarts',
+            ('shard',)
+        )
+        metrics.gauge(
+            'homework_workers_alive', 'Worker processes running',
+            callback=self.alive
+        )
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def alive(self):
+        return sum(
+            worker.process is not None and worker.process.poll() is None
+            for worker in self.workers
+        )
+
+    def _spawn(self, worker):
+        worker.process = subprocess.Popen(
+            self.command, env=worker.env, stdin=subprocess.PIPE
+        )
+        worker.started = self.clock()
+        logging.info(
+            f'Started shard {worker.index}, pid {worker.process.pid}'
+        )
+
+    def start(self):
+        for worker in self.workers:
+            self._spawn(worker)
+
+    def check(self):
+        """Перезапускает завершившиеся воркеры, когда выйдет их пауза."""
+        now = self.clock()
+        with self._lock:
+            for worker in self.workers:
+                code = worker.process.poll()
+                if code is None or self._stopping.is_set():
+                    continue
+                if not worker.restart_at:
+                    if now - worker.started >= STABLE_AFTER:
+                        worker.delay = MIN_RESTART_DELAY
+                    worker.restart_at = now + worker.delay
+                    logging.error(
+                        f'Shard {worker.index} exited with code {code}, '
+                        f'restarting in {worker.delay:.0f}s'
+                    )
+                    worker.delay = min(worker.delay * 2, MAX_RESTART_DELAY)
+                elif now >= worker.restart_at:
+                    worker.restart_at = 0.0
+                    self.restarts.inc(shard=worker.index)
+                    self._spawn(worker)
+
+    def forward(self, update):
+        """Передаёт входящее сообщение воркерам, чьи это студенты."""
+        chat_id = (update.get('message') or {}).get('chat', {}).get('id')
+        if chat_id is None or self.route is None:
+            return
+        line = (json.dumps(update, ensure_ascii=False) + '\n').encode()
+        for index in self.route(chat_id):
+            with self._lock:
+                process = self.workers[index].process
+            try:
+                process.stdin.write(line)
+                process.stdin.flush()
+            except (OSError, ValueError) as error:
+                logging.warning(f'Update for shard {index} lost: {error}')
+
+    def relay_updates(self, client, timeout=30):
+        """Long polling getUpdates с пересылкой воркерам; в своём потоке."""
+        offset = None
+        while not self._stopping.is_set():
+            try:
+                updates = client.get_updates(offset, timeout)
+            except Exception as error:
+                logging.error(f'Failed to get Telegram updates: {error}')
+                self._stopping.wait(5)
+                continue
+            for update in updates:
+                offset = update['update_id'] + 1
+                self.forward(update)
+
+    def broadcast(self, signum, frame=None):
+        """Передаёт сигнал живым воркерам: годится как обработчик."""
+        for worker in self.workers:
+            if worker.process is not None and worker.process.poll() is None:
+                worker.process.send_signal(signum)
+
+    def stop(self, *args):
+        self._stopping.set()
+        for worker in self.workers:
+            if worker.process is not None and worker.process.poll() is None:
+                worker.process.terminate()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            try:
+                worker.process.wait(max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        self.start()
+        try:
+            while not self._stopping.wait(CHECK_INTERVAL):
+                self.check()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
@@ -0,0 +1,141 @@
+import codecs
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CHUNK_SIZE = 64 * 1024
+# Ответ меньше этого читается целиком: так быстрее, а память не важна
+STREAM_THRESHOLD = 256 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+def loads(data):
+    """json.loads на самом быстром доступном бэкенде."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class HomeworkStream:
+    """Итератор по `homeworks` из ответа апи, читаемого кусками.
+
+    Разбирает верхний объект ответа по мере прихода данных: работы
+    отдаются по одной, как только объект работы пришёл целиком, а
+    остальные ключи (`current_date`) доступны в `fields` после того,
+    как итерация закончилась.
+    """
+
+    def __init__(self, chunks, encoding='utf-8'):
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder(encoding)()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self.fields = {}
+
+    def _more(self):
+        """Дочитывает следующий кусок; False, если данных больше нет."""
+        if self._eof:
+            return False
+        for chunk in self._chunks:
+            text = self._text.decode(chunk)
+            if text:
+                self._buffer = self._buffer[self._pos:] + text
+                self._pos = 0
+                return True
+        self._buffer = self._buffer[self._pos:] + self._text.decode(
+            b'', final=True
+        )
+        self._pos = 0
+        self._eof = True
+        return False
+
+    def _peek(self):
+        """Первый непробельный символ, дочитывая при необходимости."""
+        while True:
+            while (self._pos < len(self._buffer)
+                   and self._buffer[self._pos] in _WHITESPACE):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._more():
+                raise ValueError('Unexpected end of API response')
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f'Expected {char!r} in API response')
+        self._pos += 1
+
+    def _value(self):
+        """Следующее json-значение целиком."""
+        while True:
+            self._peek()
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Значение оборвано на границе куска - читаем дальше
+                if not self._more():
+                    raise
+                continue
+            # Число в конце буфера могло оборваться на середине
+            if end == len(self._buffer) and self._more():
+                continue
+            self._pos = end
+            return value
+
+    def _array(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect(']')
+            return
+
+    def __iter__(self):
+        if self._peek() != '{':
+            # Не объект: разбираем как есть, пусть проверка решает
+            self.fields = self._value()
+            return
+        self._pos += 1
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key == 'homeworks' and self._peek() == '[':
+                self.fields[key] = []
+                yield from self._array()
+            else:
+                self.fields[key] = self._value()
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+            self._expect('}')
+            return
+
+
+def iter_response(response, chunk_size=CHUNK_SIZE):
+    """Работы из ответа requests: потоком для больших тел."""
+    length = response.headers.get('Content-Length')
+    if length is not None and int(length) < STREAM_THRESHOLD:
+        data = loads(response.content)
+        stream = HomeworkStream(())
+        stream.fields = data
+        if isinstance(data, dict) and isinstance(data.get('homeworks'), list):
+            return stream, iter(data['homeworks'])
+        return stream, iter(())
+    stream = HomeworkStream(
+        response.iter_content(chunk_size), response.encoding or 'utf-8'
+    )
+    return stream, iter(stream)
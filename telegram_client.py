@@ -0,0 +1,42 @@
+from exceptions import FloodControlException, HTTPStatusException
+
+TELEGRAM_API_URL = 'https://api.telegram.org'
+
+
+class TelegramClient:
+    """Минимальный клиент Bot API поверх общей http-сессии."""
+
+    def __init__(self, token, http, base_url=TELEGRAM_API_URL):
+        self.http = http
+        self._url = f'{base_url.rstrip("/")}/bot{token}'
+
+    def _call(self, method, payload, **kwargs):
+        response = self.http.post(
+            f'{self._url}/{method}', json=payload, **kwargs
+        )
+        data = response.json()
+        retry_after = data.get('parameters', {}).get('retry_after')
+        if retry_after is not None:
+            raise FloodControlException(
+                f'Telegram {method} flood control', retry_after
+            )
+        if not data.get('ok'):
+            raise HTTPStatusException(
+                f'Telegram {method} failed: {data.get("description")}',
+                data.get('error_code')
+            )
+        return data['result']
+
+    def send_message(self, chat_id, text):
+        return self._call('sendMessage', {'chat_id': chat_id, 'text': text})
+
+    def get_updates(self, offset=None, timeout=0):
+        """Long polling: ждёт входящие сообщения до `timeout` секунд."""
+        payload = {'timeout': timeout, 'allowed_updates': ['message']}
+        if offset is not None:
+            payload['offset'] = offset
+        connect_timeout, read_timeout = self.http.timeout
+        return self._call(
+            'getUpdates', payload,
+            timeout=(connect_timeout, timeout + read_timeout)
+        )
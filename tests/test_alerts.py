@@ -0,0 +1,87 @@
+from alerts import ErrorAlerts
+from engine import Tenant
+from exceptions import HTTPStatusException, MessageNotSent
+from scheduler import Scheduler
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestErrorAlerts:
+
+    def test_dedup_and_rollup(self):
+        clock = FakeClock()
+        sent = []
+        alerts = ErrorAlerts(sent.append, window=100, clear_after=50,
+                             clock=clock)
+        alerts.record(HTTPStatusException('Endpoint not responding: 502'))
+        for second in range(1, 10):
+            clock.now = second
+            alerts.record(HTTPStatusException('Endpoint not responding: 503'))
+        assert len(sent) == 1, (
+            'Проверьте, что повторная ошибка не отправляется в окне'
+        )
+        clock.now = 101
+        alerts.record(HTTPStatusException('Endpoint not responding: 500'))
+        assert sent[-1].startswith('Still failing, 10 occurrences')
+
+    def test_recovery_notice(self):
+        clock = FakeClock()
+        sent = []
+        alerts = ErrorAlerts(sent.append, clear_after=50, clock=clock)
+        alerts.record(KeyError('homeworks'))
+        clock.now = 49
+        alerts.sweep()
+        assert len(sent) == 1
+        clock.now = 60
+        alerts.sweep()
+        alerts.sweep()
+        assert len(sent) == 2 and sent[1].startswith('Recovered'), (
+            'Проверьте, что о восстановлении сообщается один раз'
+        )
+
+    def test_bounded_and_message_not_sent_ignored(self):
+        sent = []
+        alerts = ErrorAlerts(sent.append, max_size=2)
+        alerts.record(MessageNotSent('Failed to send message'))
+        assert sent == []
+        for name in ('a', 'b', 'c'):
+            alerts.record(KeyError(name))
+        assert len(alerts) == 2
+
+    def test_no_recovery_while_backoff_hides_failure(self):
+        clock = FakeClock()
+        sent = []
+        alerts = ErrorAlerts(sent.append, clock=clock)
+        scheduler = Scheduler(600, 60, 3600, clock=clock, rng=lambda: 0.5)
+        tenant = Tenant('token', 1)
+        scheduler.add(tenant)
+        failing_until = 5 * 3600
+        while clock.now < 8 * 3600:
+            due, wait = scheduler.next_due()
+            if due is None:
+                # Раунд движка: sweep раз в 600 секунд
+                clock.now += min(wait, 600)
+                alerts.sweep()
+                continue
+            failed = clock.now < failing_until
+            if failed:
+                alerts.record(HTTPStatusException('Bad gateway'), tenant.key)
+            else:
+                alerts.success(tenant.key)
+            scheduler.reschedule(tenant, failed=failed)
+        recovered = [text for text in sent if text.startswith('Recovered')]
+        assert len(recovered) == 1, (
+            'Проверьте, что ошибка не закрывается, пока студент не опрошен '
+            'успешно, даже если из-за паузы она давно не повторялась'
+        )
+        assert sent.index(recovered[0]) == len(sent) - 1
+        assert any(text.startswith('Still failing') for text in sent), (
+            'Проверьте, что при долгом сбое приходит сводка'
+        )
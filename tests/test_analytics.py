@@ -0,0 +1,88 @@
+import pytest
+
+import analytics
+from history import HistoryStore
+
+HOUR = 3600
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'history.db')
+    store = HistoryStore(path).open()
+    # Работа 1: ревью 2 часа, возврат, ещё ревью 1 час, принята
+    # Работа 2: ревью 5 часов, принята; работа 3 ещё на ревью
+    transitions = [
+        ('a', 1, 'reviewing', 0), ('a', 1, 'rejected', 2 * HOUR),
+        ('a', 1, 'reviewing', 3 * HOUR), ('a', 1, 'approved', 4 * HOUR),
+        ('b', 2, 'reviewing', 0), ('b', 2, 'approved', 5 * HOUR),
+        ('b', 3, 'reviewing', HOUR),
+    ]
+    for tenant, key, status, seen_at in transitions:
+        store.record(tenant, {
+            'id': key, 'homework_name': f'hw{key}', 'status': status,
+        }, seen_at=seen_at)
+    store.close()
+    return path
+
+
+class TestAnalytics:
+
+    def test_review_latency(self, database, monkeypatch):
+        monkeypatch.setattr(analytics, 'np', None)
+        result = analytics.report(analytics.load(database), by='all')
+        assert result['transitions'] == 7
+        [row] = result['review_latency']
+        assert row['count'] == 3, (
+            'Проверьте, что незаконченное ревью не попадает в отчёт'
+        )
+        assert row['p50'] == 2 * HOUR and row['p99'] == 2 * HOUR
+        assert row['rejection_rate'] == pytest.approx(1 / 3)
+        states = {row['key']: row for row in result['time_in_state']}
+        assert states['rejected']['mean'] == HOUR
+
+    def test_cohorts(self, database, monkeypatch):
+        monkeypatch.setattr(analytics, 'np', None)
+        result = analytics.report(analytics.load(database), by='homework')
+        rows = {row['key']: row for row in result['review_latency']}
+        assert rows['hw1']['count'] == 2 and rows['hw2']['p50'] == 5 * HOUR
+        assert rows['hw2']['rejection_rate'] == 0
+        result = analytics.report(analytics.load(database), by='week')
+        assert [row['key'] for row in result['review_latency']] == [
+            '1970-01-01'
+        ]
+
+    def test_numpy_matches_fallback(self, database, monkeypatch):
+        pytest.importorskip('numpy')
+        for by in ('all', 'homework', 'tenant', 'day'):
+            vectorized = analytics.report(analytics.load(database), by)
+            with monkeypatch.context() as patch:
+                patch.setattr(analytics, 'np', None)
+                plain = analytics.report(analytics.load(database), by)
+            assert vectorized == plain, (
+                'Проверьте, что расчёт на numpy совпадает с запасным'
+            )
+
+    def test_empty_history(self, tmp_path):
+        path = str(tmp_path / 'history.db')
+        HistoryStore(path).open().close()
+        result = analytics.report(analytics.load(path))
+        assert result['review_latency'] == []
+
+    def test_merges_shards(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(analytics, 'np', None)
+        paths = [str(tmp_path / f'history.shard{i}.db') for i in range(2)]
+        # Студент переехал в другой шард посреди ревью
+        for path, status, seen_at in zip(
+            paths, ('reviewing', 'approved'), (0, 2 * HOUR)
+        ):
+            store = HistoryStore(path).open()
+            store.record('a', {
+                'id': 1, 'homework_name': 'hw1', 'status': status,
+            }, seen_at=seen_at)
+            store.close()
+        result = analytics.report(analytics.load(paths), by='all')
+        [row] = result['review_latency']
+        assert row['count'] == 1 and row['p50'] == 2 * HOUR, (
+            'Проверьте, что переходы одной работы из разных шардов сливаются'
+        )
@@ -0,0 +1,108 @@
+from http import HTTPStatus
+
+import pytest
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from exceptions import CircuitOpenException
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeHttp:
+
+    def __init__(self, status_code=HTTPStatus.OK):
+        self.status_code = status_code
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        return FakeResponse(self.status_code)
+
+
+def make_breaker(clock):
+    return CircuitBreaker('test', failure_threshold=3, reset_timeout=10,
+                          max_reset_timeout=40, probes=1, clock=clock)
+
+
+class TestCircuitBreaker:
+
+    def test_opens_and_skips_calls(self):
+        breaker = make_breaker(FakeClock())
+        http = FakeHttp(HTTPStatus.SERVICE_UNAVAILABLE)
+        guarded = breaker.guard(http)
+        for _ in range(3):
+            guarded.get('url')
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenException):
+            guarded.get('url')
+        assert http.calls == 3, (
+            'Проверьте, что разомкнутая цепь не ходит в апи'
+        )
+
+    def test_tenant_errors_do_not_open(self):
+        breaker = make_breaker(FakeClock())
+        guarded = breaker.guard(FakeHttp(HTTPStatus.UNAUTHORIZED))
+        for _ in range(10):
+            guarded.get('url')
+        assert breaker.state == CLOSED, (
+            'Проверьте, что чужой токен не размыкает цепь для всех'
+        )
+
+    def test_half_open_probe(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(3):
+            breaker.record(False)
+        clock.now = 10
+        assert breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow(), 'Проверьте число пробных запросов'
+        breaker.record(False)
+        assert breaker.state == OPEN
+        clock.now = 25
+        assert not breaker.allow(), (
+            'Проверьте, что после неудачной пробы пауза удваивается'
+        )
+        clock.now = 30
+        assert breaker.allow()
+        breaker.record(True)
+        assert breaker.state == CLOSED
+
+    def test_connection_errors_count(self):
+        breaker = make_breaker(FakeClock())
+
+        class BrokenHttp:
+            def get(self, url, **kwargs):
+                raise ConnectionError('refused')
+
+        guarded = breaker.guard(BrokenHttp())
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                guarded.get('url')
+        assert breaker.state == OPEN
+
+    def test_rejection_carries_retry_after(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        guarded = breaker.guard(FakeHttp(HTTPStatus.SERVICE_UNAVAILABLE))
+        for _ in range(3):
+            guarded.get('url')
+        clock.now = 4
+        with pytest.raises(CircuitOpenException) as error:
+            guarded.get('url')
+        assert error.value.retry_after == 6, (
+            'Проверьте, что отказ сообщает, когда цепь пропустит вызов'
+        )
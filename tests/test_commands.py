@@ -0,0 +1,80 @@
+from commands import CommandHandler, CommandPoller
+from cursors import CursorStore
+from engine import Tenant
+
+VERDICTS = {
+    'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
+    'reviewing': 'Работа взята на проверку ревьюером.',
+}
+
+
+def make_tenant():
+    tenant = Tenant('token', 42)
+    for seen_at, status in ((100, 'reviewing'), (200, 'approved')):
+        record = {'id': 1, 'homework_name': 'hw1.zip', 'status': status}
+        tenant.statuses.load([[1, status]])
+        tenant.remember(record, seen_at)
+    return tenant
+
+
+class FakeClient:
+
+    def __init__(self, updates):
+        self.updates = updates
+        self.offsets = []
+
+    def get_updates(self, offset=None, timeout=0):
+        self.offsets.append(offset)
+        updates, self.updates = self.updates, []
+        return updates
+
+
+class TestCommands:
+
+    def test_answers_from_state(self):
+        handler = CommandHandler([make_tenant()], VERDICTS)
+        status = handler.handle(42, '/status')
+        assert '"hw1.zip"' in status and VERDICTS['approved'] in status, (
+            'Проверьте, что /status отвечает из состояния в памяти'
+        )
+        history = handler.handle('42', '/history 5').splitlines()
+        assert len(history) == 2
+        assert VERDICTS['approved'] in history[0], (
+            'Проверьте, что /history начинается с последнего перехода'
+        )
+        assert VERDICTS['approved'] in handler.handle(42, '/last@bot')
+        assert handler.handle(42, '/unknown').startswith('Неизвестная')
+
+    def test_unknown_chat_is_ignored(self):
+        handler = CommandHandler([make_tenant()], VERDICTS)
+        assert handler.handle(7, '/status') is None
+        assert handler.handle(42, 'hello') is None
+
+    def test_poller_replies_and_advances_offset(self):
+        replies = []
+        client = FakeClient([
+            {'update_id': 10, 'message': {
+                'chat': {'id': 42}, 'text': '/last'}},
+            {'update_id': 11, 'edited_message': {}},
+        ])
+        poller = CommandPoller(
+            client, CommandHandler([make_tenant()], VERDICTS),
+            lambda chat_id, text: replies.append(chat_id)
+        )
+        assert poller.poll() == 2
+        poller.poll()
+        assert replies == [42]
+        assert client.offsets == [None, 12], (
+            'Проверьте, что обработанные сообщения подтверждаются offset'
+        )
+
+    def test_history_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'cursors.json')
+        store = CursorStore(path)
+        store.update(make_tenant())
+        store.save()
+        restored = Tenant('token', 42)
+        CursorStore(path).load().restore(restored)
+        assert [entry[3] for entry in restored.recent()] == [
+            'reviewing', 'approved'
+        ]
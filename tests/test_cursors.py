@@ -0,0 +1,45 @@
+from cursors import CursorStore
+from engine import Tenant
+
+
+class TestCursorStore:
+
+    def test_roundtrip(self, tmp_path):
+        path = tmp_path / 'cursors.json'
+        tenant = Tenant('token', 1, timestamp=100)
+        tenant.statuses.load([[42, 'reviewing']])
+        store = CursorStore(str(path)).load()
+        store.update(tenant)
+        store.save()
+
+        restored = Tenant('token', 1)
+        CursorStore(str(path)).load().restore(restored)
+        assert restored.timestamp == 100, (
+            'Проверьте, что курсор from_date переживает перезапуск'
+        )
+        assert restored.statuses.get(42) == 'reviewing'
+        assert list(tmp_path.iterdir()) == [path], (
+            'Проверьте, что временный файл не остаётся на диске'
+        )
+
+    def test_missing_or_corrupted_file(self, tmp_path):
+        path = tmp_path / 'cursors.json'
+        tenant = Tenant('token', 1, timestamp=5)
+        CursorStore(str(path)).load().restore(tenant)
+        path.write_text('{broken')
+        CursorStore(str(path)).load().restore(tenant)
+        assert tenant.timestamp == 5
+
+    def test_dirty_only_when_cursor_moves(self, tmp_path):
+        store = CursorStore(str(tmp_path / 'cursors.json')).load()
+        tenant = Tenant('token', 1, timestamp=100)
+        store.update(tenant)
+        assert store.dirty
+        store.save()
+        store.update(tenant)
+        assert not store.dirty, (
+            'Проверьте, что без сдвига курсора файл не переписывается'
+        )
+        tenant.timestamp = 200
+        store.update(tenant)
+        assert store.dirty
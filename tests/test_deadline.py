@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+import deadline
+import homework
+from engine import Tenant
+from exceptions import DeadlineExceeded
+from hedging import HedgedHttp, LatencyTracker
+
+
+class FakeResponse:
+
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class SlowOnceHttp:
+    """Первый запрос зависает, остальные отвечают сразу."""
+
+    def __init__(self, hang=1.0):
+        self.hang = hang
+        self.calls = 0
+        self.responses = []
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if call == 1:
+            time.sleep(self.hang)
+        response = FakeResponse(call)
+        self.responses.append(response)
+        return response
+
+
+def warm_tracker(seconds=0.01):
+    tracker = LatencyTracker(min_samples=5)
+    for _ in range(5):
+        tracker.observe(seconds)
+    return tracker
+
+
+class TestDeadline:
+
+    def test_timeouts_bounded_by_budget(self):
+        assert deadline.bounded_timeout(3, 10) == (3, 10)
+        with deadline.deadline_scope(0.5):
+            connect, read = deadline.bounded_timeout(3, 10)
+        assert connect <= 0.5 and read <= 0.5, (
+            'Проверьте, что таймаут запроса не выходит за бюджет цикла'
+        )
+        with deadline.deadline_scope(0.01):
+            time.sleep(0.02)
+            with pytest.raises(DeadlineExceeded):
+                deadline.bounded_timeout(3, 10)
+
+    def test_expired_budget_stops_sending(self):
+        clock = [0.0]
+        tenant = Tenant('token', 1)
+        records = [
+            {'id': i, 'homework_name': f'hw{i}', 'status': 'approved'}
+            for i in range(3)
+        ]
+        sent = []
+
+        class Bot:
+            def send_message(self, chat_id, text, key=None):
+                sent.append(text)
+                clock[0] += 1
+
+        with deadline.deadline_scope(1.5, clock=lambda: clock[0]):
+            with pytest.raises(DeadlineExceeded):
+                homework.notify_changes(Bot(), tenant, records)
+        assert len(sent) == 2
+        assert len(tenant.statuses) == 2, (
+            'Проверьте, что неотправленный переход ждёт следующего опроса'
+        )
+
+
+class TestHedging:
+
+    def test_slow_request_is_hedged(self):
+        http = SlowOnceHttp()
+        hedged = HedgedHttp(http, 4, warm_tracker(), max_ratio=1.0,
+                            min_delay=0.01)
+        started = time.monotonic()
+        response = hedged.get('url')
+        assert time.monotonic() - started < 0.5, (
+            'Проверьте, что медленный запрос дублируется после p95'
+        )
+        assert response.name == 2 and hedged.wins == 1
+        time.sleep(1.1)
+        assert http.responses[-1].closed, (
+            'Проверьте, что ответ проигравшего запроса закрывается'
+        )
+
+    def test_hedge_ratio_limits_load(self):
+        http = SlowOnceHttp(hang=0.1)
+        hedged = HedgedHttp(http, 4, warm_tracker(), max_ratio=0.0001,
+                            min_delay=0.01)
+        assert hedged.get('url').name == 1
+        assert http.calls == 1 and hedged.hedged == 0
+
+    def test_hedged_request_sees_deadline(self):
+        seen = []
+
+        class RecordingHttp:
+            def get(self, url, **kwargs):
+                seen.append(deadline.remaining())
+                return FakeResponse(len(seen))
+
+        hedged = HedgedHttp(RecordingHttp(), 2, warm_tracker(),
+                            max_ratio=1.0)
+        with deadline.deadline_scope(5):
+            hedged.get('url')
+        assert seen and seen[0] is not None, (
+            'Проверьте, что запрос в пуле потоков видит бюджет цикла'
+        )
@@ -0,0 +1,193 @@
+import asyncio
+import time
+
+from delivery import Delivery, TokenBucket, pack_messages
+from exceptions import FloodControlException, HTTPStatusException
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+
+    def test_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, 2, clock=clock)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0.5, (
+            'Проверьте, что пустое ведро возвращает паузу до токена'
+        )
+        clock.now = 10
+        assert bucket.reserve() == 0
+
+
+class TestDelivery:
+
+    def test_coalesces_messages_per_chat(self):
+        sent = []
+        delivery = Delivery(lambda chat_id, text: sent.append((chat_id, text)),
+                            chat_rate=100, global_rate=100)
+        delivery.send_message(1, 'a')
+        delivery.send_message(1, 'b')
+        delivery.send_message(2, 'c')
+        assert delivery.queue_depth == 3
+        asyncio.run(delivery.flush())
+        assert sorted(sent) == [(1, 'a\n\nb'), (2, 'c')], (
+            'Проверьте, что сообщения одного чата склеиваются'
+        )
+        assert delivery.stats()['sent'] == 2
+
+    def test_retry_after(self):
+        calls = []
+
+        def send(chat_id, text):
+            calls.append(text)
+            if len(calls) == 1:
+                raise FloodControlException('flood', 0.01)
+
+        delivery = Delivery(send, chat_rate=1000, global_rate=1000)
+        delivery.send_message(1, 'a')
+        asyncio.run(delivery.flush())
+        assert calls == ['a', 'a'], (
+            'Проверьте, что после flood control сообщение отправляется снова'
+        )
+        assert delivery.throttle_wait > 0
+
+    def test_failed_send_is_retried_with_backoff(self):
+        calls = []
+        delivered = []
+
+        def send(chat_id, text):
+            calls.append((time.monotonic(), text))
+            if len(calls) == 1:
+                raise ConnectionError('reset by peer')
+
+        delivery = Delivery(send, window=0.01, chat_rate=1000,
+                            global_rate=1000, on_delivered=delivered.extend,
+                            retry_delay=0.1)
+        delivery.send_message(1, 'alert')
+        delivery.send_message(1, 'status', 'key')
+
+        async def scenario():
+            worker = asyncio.create_task(delivery.run())
+            while not delivered:
+                await asyncio.sleep(0.01)
+            worker.cancel()
+
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+        assert [text for _, text in calls] == ['alert\n\nstatus', 'status'], (
+            'Проверьте, что после ошибки отправки сообщение с ключом '
+            'уходит снова, а оповещение без ключа нет'
+        )
+        assert calls[1][0] - calls[0][0] >= 0.1, (
+            'Проверьте, что повтор ждёт паузу retry_delay'
+        )
+        assert delivered == ['key']
+        assert delivery.queue_depth == 0
+        assert delivery.stats()['retried'] == 1
+
+    def test_sent_chunks_are_not_repeated(self):
+        calls = []
+
+        def send(chat_id, text):
+            calls.append(text)
+            if len(calls) == 2:
+                raise ConnectionError('reset by peer')
+
+        delivered = []
+        delivery = Delivery(send, chat_rate=1000, global_rate=1000,
+                            on_delivered=delivered.extend)
+        delivery.send_message(1, 'x' * 3000, 'first')
+        delivery.send_message(1, 'y' * 3000, 'second')
+        asyncio.run(delivery.flush())
+        assert delivered == ['first'], (
+            'Проверьте, что ушедшая часть пачки подтверждается сразу'
+        )
+        assert delivery.queue_depth == 1
+        asyncio.run(delivery.flush())
+        assert calls == ['x' * 3000, 'y' * 3000, 'y' * 3000]
+        assert delivered == ['first', 'second']
+
+    def test_permanent_rejection_is_not_retried(self):
+        calls = []
+
+        def send(chat_id, text):
+            calls.append(text)
+            raise HTTPStatusException(
+                'Forbidden: bot was blocked by the user', 403
+            )
+
+        delivered = []
+        delivery = Delivery(send, chat_rate=1000, global_rate=1000,
+                            on_delivered=delivered.extend)
+        delivery.send_message(1, 'status', 'key')
+        asyncio.run(delivery.flush())
+        assert delivery.queue_depth == 0, (
+            'Проверьте, что отказ тг 4xx не повторяется'
+        )
+        assert delivered == ['key'], (
+            'Проверьте, что отвергнутое сообщение не остаётся в журнале'
+        )
+        assert delivery.stats()['rejected'] == 1
+        assert delivery.stats()['retried'] == 0
+
+    def test_transient_retries_are_capped(self):
+        def send(chat_id, text):
+            raise HTTPStatusException('Bad Gateway', 502)
+
+        delivered = []
+        delivery = Delivery(send, chat_rate=1000, global_rate=1000,
+                            on_delivered=delivered.extend, max_retries=3)
+        delivery.send_message(1, 'status', 'key')
+        for _ in range(3):
+            asyncio.run(delivery.flush())
+        assert delivery.queue_depth == 0, (
+            'Проверьте, что число повторов ограничено'
+        )
+        assert delivered == [], (
+            'Проверьте, что брошенное сообщение остаётся в журнале'
+        )
+        stats = delivery.stats()
+        assert stats['retried'] == 2 and stats['abandoned'] == 1
+
+    def test_pack_messages_limit(self):
+        chunks = pack_messages(['x' * 3000, 'y' * 3000], limit=4096)
+        assert chunks == ['x' * 3000, 'y' * 3000]
+        assert pack_messages(['z' * 5000], limit=4096) == [
+            'z' * 4096, 'z' * 904
+        ]
+
+    def test_workers_drain_bounded_outbox(self):
+        sent = []
+
+        def send(chat_id, text):
+            time.sleep(0.02)
+            sent.append(chat_id)
+
+        delivery = Delivery(send, window=0.01, chat_rate=1000,
+                            global_rate=1000, workers=2, capacity=2)
+
+        async def scenario():
+            worker = asyncio.create_task(delivery.run())
+            await asyncio.sleep(0)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, lambda: [
+                delivery.send_message(chat_id, 'text') for chat_id in range(6)
+            ])
+            while len(sent) < 6 or delivery.queue_depth:
+                await asyncio.sleep(0.01)
+            worker.cancel()
+
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+        assert sorted(sent) == list(range(6))
+        assert delivery.backpressure_wait > 0, (
+            'Проверьте, что при полном outbox опрос ждёт отправителей'
+        )
+        assert delivery.queue_depth == 0
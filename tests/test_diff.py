@@ -0,0 +1,56 @@
+import sys
+
+from diff import StatusTable
+
+
+def apply(table, homeworks):
+    changes = table.diff(homeworks)
+    for key, code, _ in changes:
+        table.commit(key, code)
+    return [record for _, _, record in changes]
+
+
+class TestStatusTable:
+
+    def test_only_transitions(self):
+        table = StatusTable()
+        first = [
+            {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'},
+            {'id': 2, 'homework_name': 'hw2', 'status': 'approved'},
+        ]
+        assert apply(table, first) == first
+        assert apply(table, first) == [], (
+            'Проверьте, что повторный статус не отправляется'
+        )
+        second = [
+            {'id': 1, 'homework_name': 'hw1', 'status': 'rejected'},
+            {'id': 2, 'homework_name': 'hw2', 'status': 'approved'},
+        ]
+        assert apply(table, second) == second[:1]
+
+    def test_uncommitted_change_is_repeated(self):
+        table = StatusTable()
+        homeworks = [{'homework_name': 'hw', 'status': 'reviewing'}]
+        assert len(table.diff(homeworks)) == 1
+        assert len(table.diff(homeworks)) == 1, (
+            'Проверьте, что неотправленный переход не теряется'
+        )
+
+    def test_snapshot_roundtrip(self):
+        table = StatusTable()
+        apply(table, [{'id': 7, 'status': 'approved'}])
+        restored = StatusTable()
+        restored.load(table.snapshot())
+        assert restored.get(7) == 'approved'
+        assert apply(restored, [{'id': 7, 'status': 'approved'}]) == []
+
+    def test_memory_per_homework(self):
+        table = StatusTable()
+        count = 100_000
+        apply(table, (
+            {'id': 10 ** 6 + i, 'status': 'reviewing'} for i in range(count)
+        ))
+        per_item = (sys.getsizeof(table._codes) + 28 * count) / count
+        assert per_item < 100, (
+            'Проверьте, что на одну работу уходят десятки байт'
+        )
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+
+from engine import PollingEngine, Tenant
+from exceptions import CircuitOpenException
+
+
+class TestPollingEngine:
+
+    def test_poll_once_visits_every_tenant(self):
+        tenants = [Tenant(f'token{i}', i) for i in range(50)]
+        seen = []
+        engine = PollingEngine(tenants, seen.append, interval=0)
+        asyncio.run(engine.poll_once())
+        assert sorted(t.chat_id for t in seen) == list(range(50)), (
+            'Проверьте, что движок опрашивает каждого студента'
+        )
+
+    def test_max_in_flight(self):
+        lock = threading.Lock()
+        state = {'now': 0, 'peak': 0}
+
+        def poll(tenant):
+            with lock:
+                state['now'] += 1
+                state['peak'] = max(state['peak'], state['now'])
+            time.sleep(0.01)
+            with lock:
+                state['now'] -= 1
+
+        tenants = [Tenant(f'token{i}', i) for i in range(20)]
+        engine = PollingEngine(tenants, poll, interval=0, max_in_flight=4)
+        asyncio.run(engine.poll_once())
+        assert state['peak'] <= 4, (
+            'Проверьте, что движок ограничивает число запросов в полёте'
+        )
+
+    def test_in_flight(self):
+        release = threading.Event()
+        tenants = [Tenant(f'token{i}', i) for i in range(3)]
+        engine = PollingEngine(tenants, lambda tenant: release.wait(5),
+                               interval=60)
+
+        async def scenario():
+            task = asyncio.create_task(engine.run())
+            while engine.in_flight < 3:
+                await asyncio.sleep(0.01)
+            release.set()
+            while engine.in_flight:
+                await asyncio.sleep(0.01)
+            task.cancel()
+
+        assert engine.in_flight == 0
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+
+    def test_tenant_error_does_not_stop_others(self):
+        seen = []
+
+        def poll(tenant):
+            if tenant.chat_id == 0:
+                raise RuntimeError('boom')
+            seen.append(tenant.chat_id)
+
+        tenants = [Tenant(f'token{i}', i) for i in range(3)]
+        errors = []
+        successes = []
+        asyncio.run(PollingEngine(
+            tenants, poll, interval=0,
+            on_error=lambda error, key: errors.append(key),
+            on_success=successes.append
+        ).poll_once())
+        assert sorted(seen) == [1, 2]
+        assert errors == [tenants[0].key], (
+            'Проверьте, что ошибка передаётся вместе с ключом студента'
+        )
+        assert sorted(successes) == sorted(t.key for t in tenants[1:])
+
+    def test_circuit_open_is_deferred(self):
+        calls = []
+
+        class RecordingScheduler:
+            def reschedule(self, tenant, changed=False, failed=False):
+                calls.append(('reschedule', failed))
+
+            def defer(self, tenant, delay):
+                calls.append(('defer', delay))
+
+        def poll(tenant):
+            raise CircuitOpenException('Circuit open', 30)
+
+        errors = []
+        tenant = Tenant('token', 1)
+        engine = PollingEngine(
+            [tenant], poll, interval=0, scheduler=RecordingScheduler(),
+            on_error=lambda error, key: errors.append(key)
+        )
+        engine._start()
+        asyncio.run(engine._dispatch(tenant))
+        assert calls == [('defer', 30)], (
+            'Проверьте, что отклонённый цепью опрос ждёт её сброса, '
+            'а не считается ошибкой студента'
+        )
+        assert errors == []
+
+    def test_stop_runs_final_round(self):
+        rounds = []
+        tenants = [Tenant(f'token{i}', i) for i in range(3)]
+        engine = PollingEngine(tenants, lambda tenant: None, interval=60,
+                               after_round=lambda: rounds.append(1))
+
+        async def scenario():
+            task = asyncio.create_task(engine.run())
+            while engine.polls < 3:
+                await asyncio.sleep(0.01)
+            engine.stop()
+            await task
+
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+        assert rounds == [1], (
+            'Проверьте, что при остановке состояние сохраняется напоследок'
+        )
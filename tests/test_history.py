@@ -0,0 +1,131 @@
+import threading
+
+from commands import CommandHandler
+from engine import Tenant
+from history import HistoryStore
+
+
+class FakeClock:
+
+    def __init__(self, now=1000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def transition(key, status='approved'):
+    return {'id': key, 'homework_name': f'hw{key}', 'status': status}
+
+
+class TestHistoryStore:
+
+    def test_batched_write_and_last(self, tmp_path):
+        store = HistoryStore(str(tmp_path / 'history.db'),
+                             flush_interval=60).open()
+        for i in range(5):
+            store.record('a', transition(i), seen_at=i)
+        store.record('b', transition(9), seen_at=10)
+        assert store.last('a') == [], (
+            'Проверьте, что запись идёт пачками, а не на каждый переход'
+        )
+        assert store.flush() == 6
+        assert [row[1] for row in store.last('a', 3)] == [4, 3, 2], (
+            'Проверьте, что последние переходы отдаются от новых к старым'
+        )
+        store.record('a', transition(1, 'reviewing'), seen_at=20)
+        store.close()
+
+        store = HistoryStore(str(tmp_path / 'history.db')).open()
+        assert store.homework('a', 1) == [
+            (1, 1, 'hw1', 'approved'), (20, 1, 'hw1', 'reviewing'),
+        ], 'Проверьте, что при закрытии дописывается весь буфер'
+        store.close()
+
+    def test_prune_by_retention(self, tmp_path):
+        clock = FakeClock()
+        store = HistoryStore(str(tmp_path / 'history.db'), retention_days=1,
+                             clock=clock).open()
+        store.record('a', transition(1), seen_at=clock.now - 2 * 86400)
+        store.record('a', transition(2), seen_at=clock.now)
+        store.flush()
+        assert store.prune() == 1
+        assert [row[1] for row in store.last('a')] == [2]
+        store.close()
+
+    def test_prune_shrinks_file(self, tmp_path):
+        path = tmp_path / 'history.db'
+        clock = FakeClock()
+        store = HistoryStore(str(path), retention_days=1, clock=clock,
+                             batch_size=100000, flush_interval=60).open()
+        assert store._writer.execute('PRAGMA auto_vacuum').fetchone() == (
+            2,
+        ), 'Проверьте, что новая база создаётся с auto_vacuum=INCREMENTAL'
+        for i in range(20000):
+            store.record(f'tenant{i}', transition(i),
+                         seen_at=clock.now - 2 * 86400)
+        store.flush()
+        store._writer.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        size = path.stat().st_size
+        assert store.prune() == 20000
+        assert path.stat().st_size < size / 2, (
+            'Проверьте, что после удаления старых строк файл уменьшается'
+        )
+        store.close()
+
+    def test_reads_while_writing(self, tmp_path):
+        store = HistoryStore(str(tmp_path / 'history.db'), batch_size=50,
+                             flush_interval=0.01).open()
+        errors = []
+
+        def read():
+            try:
+                for _ in range(200):
+                    store.last('a', 5)
+            except Exception as error:
+                errors.append(error)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        for i in range(2000):
+            store.record('a', transition(i), seen_at=i)
+        reader.join()
+        store.close()
+        assert not errors, 'Проверьте, что чтение не мешает записи'
+        assert store.stats()['written'] == 2000
+
+    def test_reads_sibling_shards(self, tmp_path):
+        paths = [str(tmp_path / f'history.shard{i}.db') for i in range(3)]
+        old = HistoryStore(paths[1]).open()
+        old.record('a', transition(1, 'reviewing'), seen_at=1)
+        old.close()
+        store = HistoryStore(paths[0], siblings=paths[1:]).open()
+        store.record('a', transition(1), seen_at=2)
+        store.flush()
+        assert [row[3] for row in store.last('a')] == [
+            'approved', 'reviewing'
+        ], 'Проверьте, что история переехавшего студента читается из шардов'
+        assert len(store.homework('a', 1)) == 2
+        store.close()
+
+    def test_full_buffer_drops(self, tmp_path):
+        store = HistoryStore(str(tmp_path / 'history.db'), max_buffer=2)
+        for i in range(3):
+            store.record('a', transition(i))
+        assert store.stats()['dropped'] == 1, (
+            'Проверьте, что переполненный буфер не растёт без предела'
+        )
+
+    def test_history_command_reads_store(self, tmp_path):
+        store = HistoryStore(str(tmp_path / 'history.db')).open()
+        tenant = Tenant('token', 7)
+        for i in range(30):
+            store.record(tenant.key, transition(i), seen_at=i)
+        store.flush()
+        handler = CommandHandler([tenant], {'approved': 'принято'}, store)
+        lines = handler.handle(7, '/history 25').splitlines()
+        store.close()
+        assert len(lines) == 25, (
+            'Проверьте, что /history видит переходы глубже буфера в памяти'
+        )
+        assert '"hw29"' in lines[0]
@@ -0,0 +1,109 @@
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from deadline import deadline_scope
+from exceptions import DeadlineExceeded
+from http_client import HttpClient
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = self.headers.get('Accept-Encoding', '').encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    calls = 0
+
+    def do_GET(self):
+        FlakyHandler.calls += 1
+        status = 503 if FlakyHandler.calls == 1 else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def flaky_server():
+    FlakyHandler.calls = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def hung_server():
+    # Соединение принимается ядром, но ответа не будет никогда
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(16)
+    yield f'http://127.0.0.1:{listener.getsockname()[1]}/'
+    listener.close()
+
+
+class TestHttpClient:
+
+    def test_connection_reused(self, local_server):
+        http = HttpClient(pool_size=2)
+        for _ in range(10):
+            response = http.get(local_server)
+            assert 'gzip' in response.text, (
+                'Проверьте, что клиент запрашивает сжатый ответ'
+            )
+        stats = http.stats()
+        http.close()
+        assert stats['requests'] == 10
+        assert stats['connections'] == 1, (
+            'Проверьте, что клиент переиспользует соединение'
+        )
+        assert stats['reused'] == 9
+
+    def test_hung_endpoint_respects_deadline(self, hung_server):
+        http = HttpClient(pool_size=1)
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            with deadline_scope(1):
+                http.get(hung_server, timeout=(3.05, 10))
+        elapsed = time.monotonic() - started
+        http.close()
+        assert elapsed < 2, (
+            'Проверьте, что повторы запроса укладываются в бюджет цикла'
+        )
+
+    def test_retries_within_deadline(self, flaky_server):
+        http = HttpClient(pool_size=1, backoff_factor=0.01)
+        with deadline_scope(5):
+            response = http.get(flaky_server)
+        http.close()
+        assert response.status_code == 200, (
+            'Проверьте, что временная ошибка повторяется внутри бюджета'
+        )
@@ -0,0 +1,69 @@
+import json
+import logging
+import queue
+
+import pytest
+
+from logs import (TENANT, DroppingQueueHandler, RotatingFileHandler,
+                  SamplingFilter, setup_logging)
+
+
+@pytest.fixture
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+class TestLogs:
+
+    def test_json_records_with_context(self, tmp_path, restore_root_logger):
+        path = tmp_path / 'program.log'
+        listener = setup_logging(str(path), debug_sample=1)
+        token = TENANT.set('abc')
+        try:
+            logging.info('Status changed', extra={'homework_id': 42})
+        finally:
+            TENANT.reset(token)
+        listener.stop()
+        record = json.loads(path.read_text().splitlines()[-1])
+        assert record['message'] == 'Status changed'
+        assert record['homework_id'] == 42
+        assert record['tenant'] == 'abc', (
+            'Проверьте, что в запись попадает студент из контекста'
+        )
+
+    def test_debug_sampling(self):
+        sampler = SamplingFilter(every=10)
+        records = [
+            logging.makeLogRecord({'levelno': logging.DEBUG, 'lineno': 1})
+            for _ in range(100)
+        ]
+        assert sum(map(sampler.filter, records)) == 10
+        error = logging.makeLogRecord({'levelno': logging.ERROR})
+        assert sampler.filter(error)
+
+    def test_full_queue_drops(self):
+        handler = DroppingQueueHandler(queue.Queue(1))
+        for _ in range(3):
+            handler.emit(logging.makeLogRecord({'msg': 'x'}))
+        assert handler.dropped == 2, (
+            'Проверьте, что при полной очереди лог не блокирует опрос'
+        )
+
+    def test_size_rotation(self, tmp_path):
+        path = tmp_path / 'program.log'
+        handler = RotatingFileHandler(str(path), max_bytes=200,
+                                      backup_count=0)
+        for _ in range(20):
+            handler.emit(logging.makeLogRecord({'msg': 'x' * 50}))
+        handler.close()
+        assert len(list(tmp_path.iterdir())) > 2, (
+            'Проверьте, что архивы одного периода не затирают друг друга'
+        )
+        assert path.stat().st_size <= 200
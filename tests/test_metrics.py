@@ -0,0 +1,60 @@
+from urllib.request import urlopen
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def registry():
+    return metrics.Registry()
+
+
+class TestMetrics:
+
+    def test_histogram_render(self, registry):
+        latency = registry.register(
+            metrics.Histogram('stage_seconds', 'Latency', ('stage',),
+                              buckets=(0.1, 1))
+        )
+        latency.observe(0.05, stage='parse')
+        latency.observe(0.5, stage='parse')
+        text = registry.render()
+        assert '# TYPE stage_seconds histogram' in text
+        assert 'stage_seconds_bucket{stage="parse",le="0.1"} 1.0' in text
+        assert 'stage_seconds_bucket{stage="parse",le="+Inf"} 2.0' in text
+        assert 'stage_seconds_count{stage="parse"} 2.0' in text
+
+    def test_callback_gauge(self, registry):
+        registry.register(metrics.Gauge(
+            'age_seconds', 'Age', ('tenant',),
+            callback=lambda: {('abc',): 5}
+        ))
+        assert 'age_seconds{tenant="abc"} 5.0' in registry.render()
+
+    def test_timed_counts_errors(self):
+        @metrics.timed('test_stage')
+        def fail(value):
+            raise KeyError(value)
+
+        before = metrics.STAGE_ERRORS.value(
+            stage='test_stage', exception='KeyError'
+        )
+        with pytest.raises(KeyError):
+            fail('x')
+        assert metrics.STAGE_ERRORS.value(
+            stage='test_stage', exception='KeyError'
+        ) == before + 1, (
+            'Проверьте, что ошибки шага считаются по типу исключения'
+        )
+
+    def test_endpoint(self, registry):
+        registry.register(metrics.Counter('events_total', 'Events')).inc()
+        server = metrics.serve_metrics(0, registry=registry)
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/metrics'
+            body = urlopen(url, timeout=5).read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert 'events_total 1.0' in body
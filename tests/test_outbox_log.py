@@ -0,0 +1,145 @@
+import asyncio
+import threading
+
+from delivery import Delivery
+from outbox_log import DurableOutbox, OutboxLog
+
+
+class RecordingDelivery:
+
+    def __init__(self):
+        self.on_delivered = None
+        self.messages = []
+
+    def send_message(self, chat_id, text, key=None, block=True):
+        self.messages.append((chat_id, text, key))
+
+
+class TestOutboxLog:
+
+    def test_replay_pending_after_restart(self, tmp_path):
+        path = str(tmp_path / 'outbox.log')
+        log = OutboxLog(path, commit_interval=0)
+        assert log.open() == []
+        log.put('a', 1, 'first')
+        log.put('b', 2, 'second')
+        log.ack(['a'])
+        log.close()
+
+        log = OutboxLog(path, commit_interval=0)
+        assert log.open() == [('b', 2, 'second')], (
+            'Проверьте, что после перезапуска отдаются только неотправленные'
+        )
+        assert not log.put('a', 1, 'first'), (
+            'Проверьте, что отправленный переход не уходит второй раз'
+        )
+        log.close()
+
+    def test_group_commit(self, tmp_path):
+        log = OutboxLog(str(tmp_path / 'outbox.log'), commit_interval=0.05)
+        log.open()
+        threads = [
+            threading.Thread(target=log.put, args=(str(i), i, 'text'))
+            for i in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = log.stats()
+        log.close()
+        assert stats['records'] == 20
+        assert stats['fsyncs'] < 20, (
+            'Проверьте, что записи сбрасываются на диск группами'
+        )
+
+    def test_compaction(self, tmp_path):
+        path = tmp_path / 'outbox.log'
+        log = OutboxLog(str(path), commit_interval=0, compact_after=5,
+                        keep_acked=3)
+        log.open()
+        for i in range(10):
+            log.put(str(i), i, 'text')
+            log.ack([str(i)])
+        log.put('last', 0, 'text')
+        log.close()
+        assert len(path.read_text().splitlines()) < 20
+        log = OutboxLog(str(path))
+        assert log.open() == [('last', 0, 'text')]
+        log.close()
+
+
+class TestDurableOutbox:
+
+    def test_acks_after_delivery(self, tmp_path):
+        log = OutboxLog(str(tmp_path / 'outbox.log'), commit_interval=0)
+        delivery = RecordingDelivery()
+        outbox = DurableOutbox(log, delivery)
+        outbox.replay()
+        outbox.send_message(1, 'text', 'key')
+        outbox.send_message(1, 'text', 'key')
+        assert delivery.messages == [(1, 'text', 'key')]
+        delivery.on_delivered(['key'])
+        log.close()
+        assert log.stats()['pending'] == 0
+
+    def test_transient_error_is_retried_without_restart(self, tmp_path):
+        log = OutboxLog(str(tmp_path / 'outbox.log'), commit_interval=0)
+        calls = []
+
+        def send(chat_id, text):
+            calls.append(text)
+            if len(calls) == 1:
+                raise ConnectionError('Bad Gateway')
+
+        delivery = Delivery(send, window=0.01, chat_rate=1000,
+                            global_rate=1000, retry_delay=0.01)
+        outbox = DurableOutbox(log, delivery)
+        outbox.replay()
+
+        async def scenario():
+            worker = asyncio.create_task(delivery.run())
+            await asyncio.get_running_loop().run_in_executor(
+                None, outbox.send_message, 1, 'text', 'key'
+            )
+            while log.stats()['pending']:
+                await asyncio.sleep(0.01)
+            worker.cancel()
+
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+        log.close()
+        assert calls == ['text', 'text'], (
+            'Проверьте, что после временной ошибки тг сообщение из журнала '
+            'отправляется снова без перезапуска'
+        )
+
+    def test_replay_more_than_capacity(self, tmp_path):
+        path = str(tmp_path / 'outbox.log')
+        log = OutboxLog(path, commit_interval=0)
+        log.open()
+        for i in range(5):
+            log.put(str(i), i, 'text')
+        log.close()
+
+        sent = []
+        delivery = Delivery(lambda chat_id, text: sent.append(chat_id),
+                            window=0.01, chat_rate=1000, global_rate=1000,
+                            capacity=3)
+        outbox = DurableOutbox(OutboxLog(path, commit_interval=0), delivery)
+        replay = threading.Thread(target=outbox.replay, daemon=True)
+        replay.start()
+        replay.join(3)
+        assert not replay.is_alive(), (
+            'Проверьте, что повтор журнала при старте не ждёт места в outbox'
+        )
+        assert delivery.queue_depth == 5
+
+        async def scenario():
+            worker = asyncio.create_task(delivery.run())
+            while outbox.log.stats()['pending']:
+                await asyncio.sleep(0.01)
+            worker.cancel()
+
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+        outbox.log.close()
+        assert sorted(sent) == list(range(5))
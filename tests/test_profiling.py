@@ -0,0 +1,85 @@
+import os
+import signal
+import time
+
+import pytest
+
+from engine import Tenant
+from profiling import SAMPLE, Profiler
+
+
+def hot_loop(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+def poll(tenant):
+    hot_loop(0.03)
+    return tenant.key
+
+
+class TestProfiler:
+
+    def test_off_by_default(self, tmp_path):
+        profiler = Profiler(str(tmp_path / 'profiles'))
+        wrapped = profiler.wrap(poll)
+        tenant = Tenant('token', 1)
+        assert wrapped(tenant) == tenant.key
+        assert not os.path.exists(tmp_path / 'profiles'), (
+            'Проверьте, что без arm профилировщик ничего не делает'
+        )
+
+    def test_cprofile_session(self, tmp_path):
+        profiler = Profiler(str(tmp_path), polls=2, trace_malloc=True)
+        wrapped = profiler.wrap(poll)
+        profiler.arm()
+        for _ in range(3):
+            wrapped(Tenant('token', 1))
+        assert not profiler.active, 'Проверьте, что сеанс заканчивается сам'
+        suffixes = sorted(path.split('.', 1)[1] for path in profiler.reports)
+        assert suffixes == ['malloc.txt', 'prof', 'txt']
+        with open(tmp_path / os.path.basename(profiler.reports[1])) as file:
+            report = file.read()
+        assert '# 2 polls' in report and 'hot_loop' in report
+
+    def test_sampling_session(self, tmp_path):
+        profiler = Profiler(str(tmp_path), SAMPLE, polls=1, interval=0.001)
+        profiler.arm()
+        profiler.wrap(poll)(Tenant('token', 1))
+        [path] = profiler.reports
+        with open(path) as file:
+            stacks = file.read()
+        assert 'hot_loop' in stacks, (
+            'Проверьте, что сэмплер видит стек профилируемого опроса'
+        )
+
+    def test_selected_tenant(self, tmp_path):
+        target = Tenant('target', 1)
+        profiler = Profiler(str(tmp_path), polls=1, tenant=target.key)
+        wrapped = profiler.wrap(poll)
+        profiler.arm()
+        wrapped(Tenant('other', 2))
+        assert profiler.active and profiler.sessions == 0
+        wrapped(target)
+        assert profiler.sessions == 1
+
+    def test_keeps_last_sessions(self, tmp_path):
+        profiler = Profiler(str(tmp_path), polls=1, keep=2)
+        wrapped = profiler.wrap(poll)
+        for _ in range(3):
+            profiler.arm()
+            wrapped(Tenant('token', 1))
+        stems = {name.split('.', 1)[0] for name in os.listdir(tmp_path)}
+        assert len(stems) == 2, 'Проверьте ротацию каталога отчётов'
+
+    @pytest.mark.skipif(not hasattr(signal, 'SIGUSR2'), reason='no SIGUSR2')
+    def test_signal_arms(self, tmp_path):
+        profiler = Profiler(str(tmp_path))
+        previous = signal.getsignal(signal.SIGUSR2)
+        try:
+            profiler.install_signal()
+            os.kill(os.getpid(), signal.SIGUSR2)
+            assert profiler.active
+        finally:
+            signal.signal(signal.SIGUSR2, previous)
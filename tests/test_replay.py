@@ -0,0 +1,182 @@
+import gzip
+import json
+import random
+import time
+
+import pytest
+
+import homework
+from engine import tenant_key
+from replay import Recorder, Recording, replay
+from scheduler import Scheduler
+
+DAY = 86400
+STATUSES = ('reviewing', 'rejected', 'reviewing', 'approved')
+
+
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, content=b''):
+        self.status_code = status_code
+        self.content = content
+
+
+class ScriptedHttp:
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+
+    def get(self, url, **kwargs):
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def body(*homeworks):
+    return json.dumps({'homeworks': list(homeworks), 'current_date': 0})
+
+
+def make_recording(path, tenants=5, days=7, step=600, gap=4 * 3600,
+                   seed=0):
+    """Запись, как если бы бот опрашивал апи раз в `step` секунд.
+
+    Статус работы каждого студента меняется раз в `gap` секунд,
+    начиная со случайного момента первой половины записи.
+    """
+    rng = random.Random(seed)
+    clock = FakeClock(0.0)
+    recorder = Recorder(path, clock=clock).open()
+    plans = {}
+    for i in range(tenants):
+        start = rng.uniform(0, days * DAY / 2)
+        plans[f'token{i}'] = [start + k * gap for k in range(len(STATUSES))]
+    for now in range(0, days * DAY, step):
+        clock.now = now
+        for token, plan in plans.items():
+            done = sum(1 for at in plan if at <= now)
+            homeworks = [] if not done else [{
+                'id': 1, 'homework_name': 'hw1', 'status': STATUSES[done - 1],
+            }]
+            recorder.record(tenant_key(token), 200, body(*homeworks).encode())
+    recorder.close()
+
+
+class TestRecorder:
+
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / 'record.jsonl.gz')
+        clock = FakeClock()
+        first = body({'id': 1, 'homework_name': 'hw', 'status': 'reviewing'})
+        answers = [
+            FakeResponse(200, first.encode()),
+            FakeResponse(200, first.encode()),
+            FakeResponse(304),
+            FakeResponse(500, b'oops'),
+            ConnectionError('refused'),
+        ]
+        recorder = Recorder(path, clock=clock).open()
+        http = recorder.wrap(ScriptedHttp(answers))
+        for _ in range(4):
+            http.get('url', headers={'Authorization': 'OAuth token'})
+            clock.now += 10
+        with pytest.raises(ConnectionError):
+            http.get('url', headers={'Authorization': 'OAuth token'})
+        recorder.close()
+
+        with gzip.open(path, 'rt') as file:
+            lines = [json.loads(line) for line in file]
+        assert [line[3] for line in lines[1:3]] == [None, None], (
+            'Проверьте, что повторное тело не пишется в файл'
+        )
+        assert 'token' not in json.dumps(lines), (
+            'Проверьте, что токен не попадает в запись'
+        )
+        recording = Recording.load(path)
+        key = tenant_key('token')
+        assert recording.state_at(key, 0) == (200, first.encode())
+        assert recording.state_at(key, 1025) == (200, first.encode())
+        assert recording.state_at(key, 1035) == (500, b'oops')
+        assert recording.state_at(key, 1045) == (None, 'ConnectionError')
+
+
+    def test_truncated_tail_is_skipped(self, tmp_path):
+        path = tmp_path / 'record.jsonl.gz'
+        clock = FakeClock()
+        recorder = Recorder(str(path), clock=clock, flush_interval=0).open()
+        for i in range(3):
+            clock.now += 10
+            recorder.record('key', 200, body({'id': i}).encode())
+        assert path.stat().st_size > 0, (
+            'Проверьте, что записи уходят на диск до закрытия'
+        )
+        size = path.stat().st_size
+        clock.now += 10
+        recorder.record('key', 200, body({'id': 3}).encode())
+        recorder.close()
+        # Процесс убит посреди записи последней пачки
+        data = path.read_bytes()
+        path.write_bytes(data[:size + (len(data) - size) // 2])
+
+        recording = Recording.load(str(path))
+        assert len(recording) == 3, (
+            'Проверьте, что недописанный хвост не ломает весь файл'
+        )
+
+    def test_load_shards(self, tmp_path):
+        paths = [str(tmp_path / f'record.shard{i}.gz') for i in range(2)]
+        for i, path in enumerate(paths):
+            recorder = Recorder(path, clock=FakeClock(i)).open()
+            recorder.record(f'key{i}', 200, body().encode())
+            recorder.close()
+        recording = Recording.load(*paths)
+        assert sorted(recording.timelines) == ['key0', 'key1']
+        assert recording.start == 0 and recording.end == 1
+
+
+class TestReplay:
+
+    def test_weeks_replay_in_seconds(self, tmp_path):
+        path = str(tmp_path / 'record.jsonl.gz')
+        make_recording(path)
+        recording = Recording.load(path)
+
+        def scheduler(clock, rng):
+            return Scheduler(600, 60, 3600, clock=clock, rng=rng)
+
+        started = time.monotonic()
+        result = replay(recording, homework.VALIDATOR.check,
+                        homework.poll_tenant, scheduler)
+        assert time.monotonic() - started < 30
+        assert result['virtual_seconds'] >= 7 * DAY
+        assert result['expected'] == 5 * len(STATUSES)
+        assert result['missed'] == 0 and result['extra'] == 0, (
+            'Проверьте, что прогон сообщает о каждом переходе из записи'
+        )
+        assert result['delay_max'] <= 3600 * 1.1
+        assert result['polls'] == result['requests']
+
+    def test_slow_scheduler_misses_transitions(self, tmp_path):
+        path = str(tmp_path / 'record.jsonl.gz')
+        make_recording(path, tenants=3, gap=3600)
+        recording = Recording.load(path)
+
+        def scheduler(clock, rng):
+            return Scheduler(6 * 3600, 6 * 3600, 6 * 3600, clock=clock,
+                             rng=rng)
+
+        result = replay(recording, homework.VALIDATOR.check,
+                        homework.poll_tenant, scheduler)
+        assert result['missed'] > 0, (
+            'Проверьте, что редкий опрос теряет короткие статусы'
+        )
+        assert result['extra'] == 0
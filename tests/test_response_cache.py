@@ -0,0 +1,126 @@
+import json
+from http import HTTPStatus
+
+import pytest
+
+import homework
+from engine import Tenant
+from response_cache import ResponseCache
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.content = b'' if payload is None else json.dumps(payload).encode()
+        self.headers = headers or {}
+
+
+class FakeHttp:
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent_headers = []
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        self.sent_headers.append(headers)
+        return self.responses.pop(0)
+
+
+class FakeBot:
+
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text, key=None):
+        self.sent.append(text)
+
+
+PAYLOAD = {
+    'homeworks': [{'id': 1, 'homework_name': 'hw', 'status': 'approved'}],
+    'current_date': 100,
+}
+
+
+class TestResponseCache:
+
+    def test_not_modified_skips_parsing(self):
+        cache = ResponseCache()
+        tenant = Tenant('token', 1)
+        http = FakeHttp([
+            FakeResponse(HTTPStatus.OK, PAYLOAD, {'ETag': '"v1"'}),
+            FakeResponse(HTTPStatus.NOT_MODIFIED),
+        ])
+        bot = FakeBot()
+        assert homework.poll_tenant(bot, tenant, http, cache=cache) == 1
+        assert homework.poll_tenant(bot, tenant, http, cache=cache) == 0
+        assert http.sent_headers[1]['If-None-Match'] == '"v1"', (
+            'Проверьте, что повторный запрос к апи условный'
+        )
+        stats = cache.stats()
+        assert stats['not_modified'] == 1
+        assert stats['bytes_saved'] == len(json.dumps(PAYLOAD))
+        assert stats['hit_ratio'] == 0.5
+
+    def test_same_body_is_not_parsed(self, monkeypatch):
+        cache = ResponseCache()
+        tenant = Tenant('token', 1)
+        http = FakeHttp([FakeResponse(HTTPStatus.OK, PAYLOAD)] * 2)
+        homework.poll_tenant(FakeBot(), tenant, http, cache=cache)
+
+        def fail(response):
+            raise AssertionError('response parsed')
+
+        monkeypatch.setattr(homework, 'check_response', fail)
+        assert homework.poll_tenant(FakeBot(), tenant, http, cache=cache) == 0
+        assert cache.stats()['unchanged'] == 1
+
+    def test_new_current_date_is_not_a_change(self, monkeypatch):
+        cache = ResponseCache()
+        tenant = Tenant('token', 1)
+        later = {**PAYLOAD, 'current_date': 200}
+        http = FakeHttp([
+            FakeResponse(HTTPStatus.OK, PAYLOAD),
+            FakeResponse(HTTPStatus.OK, later),
+        ])
+        homework.poll_tenant(FakeBot(), tenant, http, cache=cache)
+
+        def fail(response):
+            raise AssertionError('response parsed')
+
+        monkeypatch.setattr(homework, 'check_response', fail)
+        assert homework.poll_tenant(FakeBot(), tenant, http, cache=cache) == 0
+        assert cache.stats()['unchanged'] == 1, (
+            'Проверьте, что новое current_date не считается изменением ответа'
+        )
+        assert tenant.timestamp == 200
+
+    def test_failed_poll_is_not_cached(self):
+        cache = ResponseCache()
+        tenant = Tenant('token', 1)
+
+        class BrokenBot:
+            def send_message(self, chat_id, text, key=None):
+                raise RuntimeError('telegram is down')
+
+        http = FakeHttp([FakeResponse(HTTPStatus.OK, PAYLOAD)] * 2)
+        with pytest.raises(Exception):
+            homework.poll_tenant(BrokenBot(), tenant, http, cache=cache)
+        bot = FakeBot()
+        assert homework.poll_tenant(bot, tenant, http, cache=cache) == 1, (
+            'Проверьте, что ответ попадает в кеш только после обработки'
+        )
+
+    def test_bounded_and_persistent(self, tmp_path):
+        path = tmp_path / 'cache.json'
+        cache = ResponseCache(max_size=2, path=str(path))
+        for key in 'abc':
+            entry = cache.match(
+                key, FakeResponse(HTTPStatus.OK, headers={'ETag': key}), b'x'
+            )
+            cache.store(key, entry)
+        assert len(cache) == 2
+        assert cache.conditional('a') == {}
+        cache.save()
+        restored = ResponseCache(path=str(path)).load()
+        assert restored.conditional('c') == {'If-None-Match': 'c'}
@@ -0,0 +1,112 @@
+from engine import Tenant
+from scheduler import Scheduler
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(clock, **kwargs):
+    kwargs.setdefault('jitter', 0)
+    return Scheduler(base_interval=600, reviewing_interval=60,
+                     max_interval=3600, clock=clock, rng=lambda: 0.5,
+                     **kwargs)
+
+
+class TestScheduler:
+
+    def test_reviewing_polled_more_often(self):
+        scheduler = make_scheduler(FakeClock())
+        tenant = Tenant('token', 1)
+        tenant.statuses.load([[1, 'reviewing']])
+        assert scheduler.interval(tenant) == 60, (
+            'Проверьте, что работу на ревью опрашиваем чаще'
+        )
+
+    def test_idle_backoff(self):
+        scheduler = make_scheduler(FakeClock())
+        tenant = Tenant('token', 1)
+        intervals = [scheduler.interval(tenant) for _ in range(4)]
+        assert intervals == [1200, 2400, 3600, 3600], (
+            'Проверьте, что без изменений интервал растёт до максимума'
+        )
+        assert scheduler.interval(tenant, changed=True) == 600
+
+    def test_jitter_bounds(self):
+        scheduler = Scheduler(base_interval=600, jitter=0.1,
+                              rng=lambda: 1.0)
+        tenant = Tenant('token', 1)
+        assert scheduler.interval(tenant, changed=True) == 660
+
+    def test_next_due_and_budget(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock, requests_per_minute=60)
+        tenants = [Tenant(f'token{i}', i) for i in range(3)]
+        for tenant in tenants:
+            scheduler.add(tenant)
+        first, wait = scheduler.next_due()
+        assert first is not None and wait == 0
+        second, wait = scheduler.next_due()
+        assert second is None and wait == 1.0, (
+            'Проверьте, что соблюдается общий лимит запросов в минуту'
+        )
+        clock.now = 1.0
+        second, _ = scheduler.next_due()
+        assert second is not None
+        scheduler.reschedule(first, changed=True)
+        clock.now = 2.0
+        scheduler.next_due()
+        assert scheduler.next_due() == (None, 599.0)
+
+    def test_first_poll_is_not_delayed(self):
+        clock = FakeClock()
+        scheduler = Scheduler(base_interval=600, jitter=0.1,
+                              requests_per_minute=60, clock=clock,
+                              rng=lambda: 1.0)
+        tenants = [Tenant(f'token{i}', i) for i in range(100)]
+        for tenant in tenants:
+            scheduler.add(tenant)
+        first, wait = scheduler.next_due()
+        assert first is tenants[0] and wait == 0, (
+            'Проверьте, что первый опрос не ждёт окна размазывания'
+        )
+        due = sorted(item[0] for item in scheduler._heap)
+        assert due[0] == 1.0 and due[-1] == 60.0
+
+    def test_failure_backoff_from_state_interval(self):
+        scheduler = make_scheduler(FakeClock())
+        tenant = Tenant('token', 1)
+        tenant.statuses.load([[1, 'reviewing']])
+        intervals = [
+            scheduler.interval(tenant, failed=True) for _ in range(3)
+        ]
+        assert intervals == [60, 120, 240], (
+            'Проверьте, что после ошибки пауза растёт от интервала ревью'
+        )
+        assert scheduler.interval(tenant) == 60
+        assert scheduler.interval(tenant, failed=True) == 60, (
+            'Проверьте, что успешный опрос сбрасывает счётчик ошибок'
+        )
+
+    def test_failure_keeps_idle_backoff(self):
+        scheduler = make_scheduler(FakeClock())
+        tenant = Tenant('token', 1)
+        assert scheduler.interval(tenant, failed=True) == 600
+        assert scheduler.interval(tenant) == 1200, (
+            'Проверьте, что ошибка не сдвигает паузу без изменений'
+        )
+
+    def test_defer_until_circuit_reset(self):
+        clock = FakeClock()
+        scheduler = make_scheduler(clock)
+        tenant = Tenant('token', 1)
+        scheduler.defer(tenant, 30)
+        assert scheduler.next_due() == (None, 30), (
+            'Проверьте, что отклонённый цепью опрос ждёт её сброса'
+        )
+        assert scheduler.interval(tenant, failed=True) == 600
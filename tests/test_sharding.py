@@ -0,0 +1,112 @@
+import sys
+
+import homework
+from cursors import CursorStore
+from engine import Tenant
+from sharding import (HashRing, Supervisor, merge_metrics, shard_path,
+                      sibling_paths)
+
+
+class TestHashRing:
+
+    def test_adding_node_moves_few_keys(self):
+        keys = [f'tenant{i}' for i in range(10000)]
+        ring = HashRing(range(4))
+        before = {key: ring.node_for(key) for key in keys}
+        ring.add(4)
+        moved = sum(ring.node_for(key) != before[key] for key in keys)
+        assert moved < len(keys) * 0.3, (
+            'Проверьте, что новый шард забирает около 1/N студентов'
+        )
+        assert all(
+            ring.node_for(key) in (before[key], 4) for key in keys
+        ), 'Проверьте, что студенты переезжают только на новый шард'
+
+    def test_balance(self):
+        ring = HashRing(range(4))
+        counts = [0] * 4
+        for i in range(10000):
+            counts[ring.node_for(f'tenant{i}')] += 1
+        assert min(counts) > 1500
+
+
+class TestShardFiles:
+
+    def test_paths(self, tmp_path):
+        base = str(tmp_path / 'cursors.json')
+        paths = [shard_path(base, index) for index in range(3)]
+        assert paths[1].endswith('cursors.shard1.json')
+        for path in paths:
+            open(path, 'w').close()
+        assert sibling_paths(paths[1]) == [paths[0], paths[2]]
+        assert sibling_paths(paths[0], 5)[-1].endswith('cursors.shard4.json')
+
+    def test_worker_files(self, monkeypatch):
+        monkeypatch.setattr(homework, 'HISTORY_FILE', 'history.db')
+        monkeypatch.setattr(homework, 'RECORD_FILE', 'record.jsonl.gz')
+        env = homework.worker_env(1, 2)
+        assert env['HISTORY_FILE'] == 'history.shard1.db'
+        assert env['RECORD_FILE'] == 'record.jsonl.shard1.gz', (
+            'Проверьте, что воркеры не пишут ответы в один файл'
+        )
+
+    def test_restore_newest_cursor(self, tmp_path, monkeypatch):
+        base = str(tmp_path / 'cursors.json')
+        own, other = shard_path(base, 0), shard_path(base, 1)
+        moved, gone = Tenant('moved', 1), Tenant('gone', 2)
+        store = CursorStore(own)
+        for tenant, timestamp in ((moved, 100), (gone, 100)):
+            tenant.timestamp = timestamp
+            store.update(tenant)
+        store.save()
+        moved.timestamp = 200
+        store = CursorStore(other)
+        store.update(moved)
+        store.save()
+        monkeypatch.setattr(homework, 'CURSOR_FILE', own)
+        monkeypatch.setattr(homework, 'SHARD_COUNT', 2)
+
+        tenant = Tenant('moved', 1, timestamp=0)
+        homework.restore_cursors([tenant]).save()
+        assert tenant.timestamp == 200, (
+            'Проверьте, что берётся самый свежий курсор из всех шардов'
+        )
+        assert CursorStore(own).load().current_date(gone.key) is None, (
+            'Проверьте, что шард не пишет обратно чужих студентов'
+        )
+
+
+class TestMergeMetrics:
+
+    def test_samples_grouped_with_shard_label(self):
+        text = (
+            '# HELP polls Polls\n# TYPE polls counter\n'
+            'polls 3.0\n# TYPE stage gauge\nstage{stage="send"} 1.0\n'
+        )
+        merged = merge_metrics([(0, text), (1, text)]).splitlines()
+        assert merged.count('# TYPE polls counter') == 1
+        assert merged[2:4] == ['polls{shard="0"} 3.0', 'polls{shard="1"} 3.0']
+        assert 'stage{shard="1",stage="send"} 1.0' in merged
+
+
+class TestSupervisor:
+
+    def test_restarts_crashed_worker(self):
+        now = [0.0]
+        supervisor = Supervisor(
+            [sys.executable, '-c', 'import sys; sys.exit(3)'], [None],
+            clock=lambda: now[0]
+        )
+        supervisor.start()
+        worker = supervisor.workers[0]
+        first = worker.process
+        first.wait()
+        supervisor.check()
+        assert worker.process is first, (
+            'Проверьте, что перезапуск выжидает паузу'
+        )
+        now[0] += 1
+        supervisor.check()
+        assert worker.process is not first
+        worker.process.wait()
+        assert supervisor.restarts.value(shard=0) == 1
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from streaming import HomeworkStream
+
+
+def chunked(payload, size):
+    data = json.dumps(payload, ensure_ascii=False).encode()
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestHomeworkStream:
+
+    @pytest.mark.parametrize('size', [1, 3, 7, 64, 10 ** 6])
+    def test_any_chunking(self, size):
+        payload = {
+            'homeworks': [
+                {'id': i, 'status': 'approved', 'homework_name': f'Работа {i}'}
+                for i in range(20)
+            ],
+            'current_date': 1581604970,
+        }
+        stream = HomeworkStream(chunked(payload, size))
+        assert list(stream) == payload['homeworks'], (
+            'Проверьте, что работы не зависят от разбиения тела на куски'
+        )
+        assert stream.fields['current_date'] == 1581604970
+
+    def test_records_are_lazy(self):
+        chunks = chunked({'homeworks': [{'id': 1}, {'id': 2}]}, 5)
+        consumed = []
+
+        def source():
+            for chunk in chunks:
+                consumed.append(chunk)
+                yield chunk
+
+        records = iter(HomeworkStream(source()))
+        assert next(records) == {'id': 1}
+        assert len(consumed) < len(chunks), (
+            'Проверьте, что первая работа отдаётся до конца тела'
+        )
+
+    def test_not_object_and_truncated(self):
+        stream = HomeworkStream(chunked([1, 2], 2))
+        assert list(stream) == []
+        assert stream.fields == [1, 2]
+        with pytest.raises(ValueError):
+            list(HomeworkStream([b'{"homeworks": [{"id": 1}']))
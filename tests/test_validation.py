@@ -0,0 +1,45 @@
+from validation import HomeworkValidator
+
+STATUSES = ('approved', 'reviewing', 'rejected')
+
+
+class TestHomeworkValidator:
+
+    def test_split_good_and_bad(self):
+        validator = HomeworkValidator(STATUSES)
+        good_record = {
+            'id': 1, 'homework_name': 'hw1', 'status': 'approved',
+            'date_updated': '2020-02-13T14:40:57Z',
+        }
+        records = [
+            good_record,
+            {'homework_name': 'hw2', 'status': 'unknown'},
+            {'status': 'approved'},
+            {'id': '3', 'homework_name': 'hw3', 'status': 'approved'},
+            {'homework_name': 'hw4', 'status': 'approved',
+             'date_updated': 'yesterday'},
+            'not a record',
+            {'homework_name': 'hw5', 'status': 'reviewing'},
+        ]
+        good, bad = validator.split(records)
+        assert good == [good_record, records[-1]], (
+            'Проверьте, что одна плохая запись не мешает остальным'
+        )
+        reasons = [reason for _, reason in bad]
+        assert reasons[0].startswith('invalid status')
+        assert reasons[1] == 'missing homework_name'
+        assert reasons[2].startswith('invalid id')
+        assert reasons[3].startswith('invalid date_updated')
+        assert reasons[4] == 'record is not an object'
+
+    def test_iter_valid_is_lazy(self):
+        validator = HomeworkValidator(STATUSES)
+        bad = []
+        records = iter([
+            {'homework_name': 'hw', 'status': 'approved'},
+            {'homework_name': 'hw'},
+        ])
+        valid = validator.iter_valid(records, bad)
+        assert next(valid)['homework_name'] == 'hw'
+        assert bad == []
+        assert list(valid) == [] and len(bad) == 1
@@ -0,0 +1,73 @@
+import re
+
+# Дата в ответе апи: 2020-02-13T14:40:57Z
+_DATE = re.compile(
+    r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:?\d{2})?$'
+)
+
+
+def _is_str(value):
+    return type(value) is str and value != ''
+
+
+def _is_id(value):
+    return type(value) is int
+
+
+def _is_date(value):
+    if type(value) is int:
+        return True
+    return type(value) is str and _DATE.match(value) is not None
+
+
+class HomeworkValidator:
+    """Проверка записей `homeworks` по схеме, собранной один раз.
+
+    Схема - кортеж `(поле, обязательное, проверка)`; статус сверяется
+    с переданным набором. `split` за один проход делит записи на
+    корректные и `(запись, причина)` для остальных.
+    """
+
+    def __init__(self, statuses):
+        statuses = frozenset(statuses)
+        self.schema = (
+            ('homework_name', True, _is_str),
+            ('status', True, statuses.__contains__),
+            ('id', False, _is_id),
+            ('date_updated', False, _is_date),
+        )
+
+    def check(self, record):
+        """Причина, по которой запись не подходит, или None."""
+        if type(record) is not dict:
+            return 'record is not an object'
+        for field, required, valid in self.schema:
+            value = record.get(field)
+            if value is None:
+                if required:
+                    return f'missing {field}'
+            elif not valid(value):
+                return f'invalid {field}: {value!r}'
+        return None
+
+    def split(self, records):
+        good = []
+        bad = []
+        check = self.check
+        for record in records:
+            reason = check(record)
+            if reason is None:
+                good.append(record)
+            else:
+                bad.append((record, reason))
+        return good, bad
+
+    def iter_valid(self, records, bad):
+        """Лениво отдаёт корректные записи, остальные копит в `bad`."""
+        check = self.check
+        for record in records:
+            reason = check(record)
+            if reason is None:
+                yield record
+            else:
+                bad.append((record, reason))